@@ -1,7 +1,7 @@
 import os
 import json
 import logging
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from pathlib import Path
 
 # 尝试导入python-dotenv
@@ -24,12 +24,59 @@ class ConfigManager:
         'tmdb_api_key': '',
         'douban_cookies': '',
         'fallback_enabled': True,
+        'tmdb_language': 'zh-CN',
+        # TMDB精简模式：直接使用搜索结果，不再单独请求详情
+        'tmdb_lean_mode': True,
+        # 非精简模式下随详情一起获取的附加数据（append_to_response，逗号分隔）
+        'tmdb_append_to_response': '',
+        # API地址（留空使用官方地址），可指向代理或本地替身服务（tests/fixtures/stub_server.py）
+        'tmdb_base_url': '',
+        'douban_base_url': '',
         'cache_dir': '/data',
+        # 元数据缓存：过期时间（秒，0为永不过期）和容量上限（0为不限制）
+        'cache_ttl': 30 * 24 * 3600,
+        # 未找到结果的否定缓存过期时间（秒，0为不缓存）
+        'negative_cache_ttl': 24 * 3600,
+        'cache_max_entries': 100000,
+        'cache_max_bytes': 256 * 1024 * 1024,
+        # 内存缓存层容量（条目数/字节数，0为不限制该项，均为0时禁用）
+        'memory_cache_entries': 2000,
+        'memory_cache_bytes': 0,
+        # 超过该字节数的缓存值使用zlib压缩（0为不压缩）
+        'cache_compress_threshold': 1024,
+        # 过期条目的宽限期（秒）：期间仍返回旧值，并在后台用条件请求重新验证；0为过期即删除
+        'cache_stale_grace': 7 * 24 * 3600,
+        # 后台重新验证的线程数
+        'revalidate_workers': 2,
+        # TMDB导出文件的本地标题索引位置（留空则使用 cache_dir/tmdb_offline_index.db）
+        'offline_index_path': '',
+        # 离线模式：只使用缓存和本地索引，不发送网络请求
+        'offline_mode': False,
+        # 元数据查询策略：sequential / parallel / hedged（TMDB超过hedge_delay秒未返回时同时查询豆瓣）
+        'lookup_strategy': 'sequential',
+        'hedge_delay': 1.0,
+        # 并发查询时等待首选源（TMDB）的最长时间（秒）
+        'lookup_deadline': 10.0,
+        # 元数据源限速（每秒请求数，0为不限速）和失败重试（指数退避，遵循Retry-After）
+        'rate_limits': {'tmdb': 40, 'douban': 2},
+        'max_retries': 3,
+        'retry_base_delay': 1.0,
+        'retry_max_delay': 60.0,
+        # 搜索结果匹配得分（标题相似度、年份、类型和热度）低于此值时不处理文件，等待人工确认
+        'match_confidence_threshold': 0.5,
+        # 熔断：连续失败多少次后跳过该数据源（0为不熔断），多少秒后放行探测请求
+        'circuit_failure_threshold': 5,
+        'circuit_reset_timeout': 60.0,
+        # 批量异步查询：最大并发数、连接池大小和每个主机的连接上限
+        'async_concurrency': 50,
+        'http_pool_size': 100,
+        'http_per_host_limit': 20,
         'redo_dir': '/redo',
         'default_dest_dir': '/dest',
         'ignore_patterns': ['.tmp', '.part', '.DS_Store', 'Thumbs.db'],
         'directory_configs': [
             # 示例配置
+            # media_type 之外还可设置可选的 year、language（TMDB查询语言，如 en-US）提示
             {
                 'name': '电影',
                 'source_dir': '/source/movies',
@@ -44,13 +91,25 @@ class ConfigManager:
             }
         ],
         'monitor_enabled': False,
-        'log_level': 'INFO'
+        'log_level': 'INFO',
+        # 复用目标库中已存在的剧集/电影文件夹
+        'library_index_enabled': True,
+        # 比较模式的目录快照存放位置，留空则使用 cache_dir/snapshots
+        'snapshot_dir': '',
+        # 多实例协调：共享卷上的工作队列数据库
+        'work_queue_enabled': False,
+        'work_queue_path': '/data/work_queue.db',
+        'work_queue_lease_ttl': 600,
+        'instance_id': ''
     }
     
     def __init__(self, config_file: str = '/config/config.json'):
         """初始化配置管理器"""
         self.config_file = Path(config_file)
         self.config = self.DEFAULT_CONFIG.copy()
+        # 配置更新后的回调和变更标记（监控循环据此重新加载）
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._changed = False
         
         # 加载.env文件
         load_dotenv()
@@ -119,11 +178,35 @@ class ConfigManager:
             self.save_config()
             
             logger.info("配置已更新")
-            return True
             
         except Exception as e:
             logger.error(f"更新配置失败: {str(e)}")
             return False
+        
+        self._changed = True
+        self._notify_listeners()
+        return True
+    
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """注册配置更新后的回调，参数为更新后的完整配置"""
+        self._listeners.append(callback)
+    
+    def _notify_listeners(self):
+        """通知配置已更新"""
+        config = self.get_config()
+        for callback in self._listeners:
+            try:
+                callback(config)
+            except Exception as e:
+                logger.error(f"应用配置更新失败: {str(e)}")
+    
+    def has_changed(self) -> bool:
+        """上次重置后配置是否更新过"""
+        return self._changed
+    
+    def reset_changed_flag(self):
+        """重置配置变更标记"""
+        self._changed = False
     
     def get_config(self) -> Dict:
         """获取当前配置"""
@@ -162,18 +245,23 @@ class ConfigManager:
         """从环境变量加载配置"""
         env_mapping = {
             'TMDB_API_KEY': 'tmdb_api_key',
+            'TMDB_BASE_URL': 'tmdb_base_url',
+            'DOUBAN_BASE_URL': 'douban_base_url',
             'DOUBAN_COOKIES': 'douban_cookies',
             'LOG_LEVEL': 'log_level',
             'CACHE_DIR': 'cache_dir',
             'REDO_DIR': 'redo_dir',
-            'DEFAULT_DEST_DIR': 'default_dest_dir'
+            'DEFAULT_DEST_DIR': 'default_dest_dir',
+            'WORK_QUEUE_ENABLED': 'work_queue_enabled',
+            'WORK_QUEUE_PATH': 'work_queue_path',
+            'INSTANCE_ID': 'instance_id'
         }
         
         for env_key, config_key in env_mapping.items():
             if env_key in os.environ:
                 env_value = os.environ[env_key]
                 # 特殊处理布尔值
-                if config_key == 'fallback_enabled' or config_key == 'monitor_enabled':
+                if config_key in ('fallback_enabled', 'monitor_enabled', 'work_queue_enabled'):
                     env_value = env_value.lower() in ('true', '1', 'yes')
                 self.config[config_key] = env_value
                 logger.debug(f"从环境变量加载: {config_key} = {env_value}")
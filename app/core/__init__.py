@@ -1,4 +1,8 @@
 from .file_processor import FileProcessor
 from .pattern_parser import PatternParser
+from .process_result import ProcessResult, ProcessOutcome
+from .library_index import LibraryIndex
+from .work_queue import WorkQueue
+from .cache_warmer import CacheWarmer
 
-__all__ = ['FileProcessor', 'PatternParser']
\ No newline at end of file
+__all__ = ['FileProcessor', 'PatternParser', 'ProcessResult', 'ProcessOutcome', 'LibraryIndex', 'WorkQueue', 'CacheWarmer']
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Callable, Dict, List
+
+from .title_normalizer import normalize_title
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """元数据缓存预热
+
+    遍历directory_configs中的源目录，按批量处理相同的方式解析文件名并补全目录提示，
+    去重后通过MetadataManager.get_metadata_many并发查询，使元数据提前写入缓存。
+    已能复用目标库中已有文件夹的标题不需要元数据，不会查询。
+    """
+
+    def __init__(self, file_processor, metadata_manager, concurrency: int = None):
+        """初始化，concurrency为同时进行的查询数（默认使用async_concurrency配置）"""
+        self.file_processor = file_processor
+        self.metadata_manager = metadata_manager
+        self.concurrency = concurrency
+        self._lock = threading.Lock()
+        self.status = {'running': False, 'files': 0, 'titles': 0, 'done': 0,
+                       'found': 0, 'missing': 0, 'elapsed': 0.0}
+
+    def collect_titles(self, directory_configs: List[Dict] = None) -> List[Dict]:
+        """遍历源目录，返回去重后的查询参数列表"""
+        if directory_configs is None:
+            directory_configs = self.file_processor.config.get('directory_configs', [])
+
+        items = {}
+        files = 0
+        for dir_config in directory_configs:
+            source_dir = (dir_config.get('source_dir') or '').strip()
+            dest_dir = dir_config.get('dest_dir') or self.file_processor.config.get('default_dest_dir', '')
+            if not source_dir or not os.path.isdir(source_dir):
+                logger.warning(f"预热跳过不存在的源目录: {source_dir}")
+                continue
+
+            for root, dirs, filenames in os.walk(source_dir):
+                for filename in filenames:
+                    if os.path.splitext(filename)[1].lower() not in self.file_processor.VIDEO_EXTENSIONS:
+                        continue
+                    files += 1
+                    hints = self.file_processor.get_directory_hints(os.path.join(root, filename))
+                    try:
+                        parsed_info = self.file_processor.parse_with_hints(filename, hints)
+                    except Exception as e:
+                        logger.error(f"预热解析文件名失败: {filename}, 错误: {str(e)}")
+                        continue
+
+                    title = parsed_info.get('title')
+                    if not title or self.file_processor._resolve_library_folder(dest_dir, title):
+                        continue
+                    item = {
+                        'title': title,
+                        'media_type': parsed_info.get('type'),
+                        'year': parsed_info.get('year'),
+                        'language': hints.get('language')
+                    }
+                    key = (normalize_title(title), item['media_type'], str(item['year'] or ''), item['language'])
+                    items.setdefault(key, item)
+
+        with self._lock:
+            self.status['files'] = files
+        return list(items.values())
+
+    def warm(self, directory_configs: List[Dict] = None,
+             progress: Callable[[int, int], None] = None) -> Dict:
+        """预热缓存，返回统计信息（已有预热在进行时直接返回当前状态）"""
+        with self._lock:
+            if self.status['running']:
+                return dict(self.status)
+            self.status = {'running': True, 'files': 0, 'titles': 0, 'done': 0,
+                           'found': 0, 'missing': 0, 'elapsed': 0.0}
+
+        start = time.monotonic()
+        try:
+            items = self.collect_titles(directory_configs)
+            with self._lock:
+                self.status['titles'] = len(items)
+            logger.info(f"开始预热元数据缓存: {self.status['files']} 个文件, {len(items)} 个标题")
+
+            def on_progress(done, total):
+                with self._lock:
+                    self.status['done'] = done
+                if progress:
+                    progress(done, total)
+
+            results = asyncio.run(
+                self.metadata_manager.get_metadata_many(items, self.concurrency, progress=on_progress)
+            )
+            found = sum(1 for result in results if result)
+            with self._lock:
+                self.status.update({'found': found, 'missing': len(results) - found})
+        except Exception as e:
+            logger.error(f"预热元数据缓存失败: {str(e)}")
+            with self._lock:
+                self.status['error'] = str(e)
+        finally:
+            with self._lock:
+                self.status['running'] = False
+                self.status['elapsed'] = round(time.monotonic() - start, 2)
+
+        logger.info(f"元数据缓存预热完成: 找到 {self.status['found']}, 未找到 {self.status['missing']}, "
+                    f"耗时 {self.status['elapsed']} 秒")
+        return self.get_status()
+
+    def get_status(self) -> Dict:
+        """获取预热进度"""
+        with self._lock:
+            return dict(self.status)
@@ -1,8 +1,12 @@
 import os
+import shlex
 import logging
 from typing import List, Dict, Optional
 from pathlib import Path
 from .pattern_parser import PatternParser
+from .library_index import LibraryIndex
+from .tree_snapshot import TreeSnapshot
+from .process_result import ProcessResult, ProcessOutcome
 
 logger = logging.getLogger(__name__)
 
@@ -10,16 +14,61 @@ logger = logging.getLogger(__name__)
 class FileProcessor:
     """文件处理器，负责硬链接创建和文件重命名"""
     
+    # 批量处理默认的视频文件扩展名
+    VIDEO_EXTENSIONS = ['.mkv', '.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']
+    
+    # 目录配置中media_type的取值
+    MEDIA_TYPE_ALIASES = {'movie': 'movie', '电影': 'movie', 'tv': 'tv', '电视剧': 'tv'}
+    
     def __init__(self, config: Dict):
         """初始化文件处理器"""
         self.config = config
         self.metadata_client = None  # 稍后注入
+        self.work_queue = None  # 多实例协调（可选）
         self.pattern_parser = PatternParser()
+        # 目标媒体库中已有文件夹的索引
+        self.library_index = LibraryIndex() if config.get('library_index_enabled', True) else None
+        # 比较模式使用的目录快照
+        self._snapshots: Dict[str, TreeSnapshot] = {}
+        self.snapshot_dir = self._snapshot_dir(config)
+    
+    @staticmethod
+    def _snapshot_dir(config: Dict) -> Optional[str]:
+        """快照保存目录，未配置时使用缓存目录下的snapshots"""
+        if config.get('snapshot_dir'):
+            return config['snapshot_dir']
+        if config.get('cache_dir'):
+            return os.path.join(config['cache_dir'], 'snapshots')
+        return None
+    
+    def update_config(self, config: Dict):
+        """更新配置（共享实例就地更新）
+
+        目标目录可能已改变，媒体库索引清空后按新的目录树重新扫描；
+        快照目录改变时丢弃已加载的快照，之后从新目录加载。
+        """
+        self.config = config
+        
+        if not config.get('library_index_enabled', True):
+            self.library_index = None
+        elif self.library_index:
+            self.library_index.invalidate()
+        else:
+            self.library_index = LibraryIndex()
+        
+        snapshot_dir = self._snapshot_dir(config)
+        if snapshot_dir != self.snapshot_dir:
+            self.snapshot_dir = snapshot_dir
+            self._snapshots.clear()
     
     def set_metadata_client(self, client):
         """设置元数据客户端"""
         self.metadata_client = client
     
+    def set_work_queue(self, work_queue):
+        """设置共享工作队列"""
+        self.work_queue = work_queue
+    
     def create_hardlink(self, source_path: str, dest_path: str) -> bool:
         """创建硬链接"""
         try:
@@ -39,29 +88,60 @@ class FileProcessor:
             logger.error(f"创建硬链接失败: {source_path} -> {dest_path}, 错误: {str(e)}")
             return False
     
-    def process_file(self, source_file: str, dest_dir: str) -> Dict:
-        """处理单个文件：解析、获取元数据、重命名、创建硬链接"""
-        result = {
-            'success': False,
-            'source': source_file,
-            'destination': None,
-            'message': None,
-            'redo_command': None
-        }
+    def process_file(self, source_file: str, dest_dir: str, force: bool = False,
+                     hints: Dict = None, confirmed: bool = False) -> ProcessResult:
+        """处理单个文件：解析、获取元数据、重命名、创建硬链接
+
+        hints为目录提示（media_type/year/language），未指定时根据目录配置查找。
+        confirmed为True时接受置信度低的元数据匹配（人工确认后的重做）。
+        """
+        result = ProcessResult(source_file, dest_dir)
         
+        # 多实例模式下先申请租约，避免重复处理
+        if self.work_queue and not self.work_queue.claim(source_file, force=force):
+            result.set_outcome(ProcessOutcome.SKIPPED)
+            return result
+        
+        try:
+            if hints is None:
+                hints = self.get_directory_hints(source_file)
+            self._process_file(source_file, dest_dir, result, hints, confirmed)
+        finally:
+            if self.work_queue:
+                self.work_queue.complete(source_file, result.success)
+        
+        return result
+    
+    def _process_file(self, source_file: str, dest_dir: str, result: ProcessResult, hints: Dict,
+                      confirmed: bool = False):
+        """执行文件处理，结果写入result"""
         try:
             # 解析文件名模式
             filename = os.path.basename(source_file)
-            parsed_info = self.pattern_parser.parse(filename)
+            parsed_info = self.parse_with_hints(filename, hints)
+            
+            # 标题与目标库中已有文件夹匹配时直接复用，无需查询元数据
+            existing_folder = self._resolve_library_folder(dest_dir, parsed_info['title'])
+            if existing_folder:
+                parsed_info['title'] = existing_folder
             
             # 获取元数据（如果有客户端）
             metadata = None
-            if self.metadata_client:
+            if self.metadata_client and not existing_folder:
                 metadata = self.metadata_client.get_metadata(
                     parsed_info['title'],
                     parsed_info['type'],
-                    year=parsed_info.get('year')
+                    year=parsed_info.get('year'),
+                    language=hints.get('language')
+                )
+            
+            # 匹配置信度低的结果不自动处理，等待人工确认（执行重做命令即确认）
+            if metadata and metadata.get('low_confidence') and not confirmed:
+                result.set_outcome(
+                    ProcessOutcome.NEEDS_REVIEW,
+                    error=f"{metadata.get('title')} ({metadata.get('year')}), 得分 {metadata.get('match_confidence')}"
                 )
+                return
             
             # 使用元数据增强信息（如果有）
             if metadata:
@@ -72,6 +152,11 @@ class FileProcessor:
                     parsed_info['title'] = metadata['title']
                 if 'year' in metadata:
                     parsed_info['year'] = metadata['year']
+                
+                # 元数据标题与已有文件夹仅拼写不同时，沿用已有文件夹
+                existing_folder = self._resolve_library_folder(dest_dir, parsed_info['title'])
+                if existing_folder:
+                    parsed_info['title'] = existing_folder
             
             # 生成Plex格式的新文件名
             new_filename = self.pattern_parser.format_plex_name(parsed_info, filename)
@@ -85,28 +170,71 @@ class FileProcessor:
             
             # 创建硬链接
             if self.create_hardlink(source_file, dest_path):
-                result['success'] = True
-                result['destination'] = dest_path
-                result['message'] = f"成功处理文件: {filename} -> {new_filename}"
+                result.set_outcome(ProcessOutcome.SUCCESS, destination=dest_path)
+                if self.library_index:
+                    self.library_index.add(dest_dir, parsed_info['title'])
             else:
-                result['message'] = "创建硬链接失败"
-                # 生成重做命令
-                result['redo_command'] = f"/redo {source_file} {dest_dir}"
+                # 失败结果会生成重做命令
+                result.set_outcome(ProcessOutcome.LINK_FAILED)
         
         except Exception as e:
             logger.error(f"处理文件失败: {source_file}, 错误: {str(e)}")
-            result['message'] = f"处理失败: {str(e)}"
-            result['redo_command'] = f"/redo {source_file} {dest_dir}"
+            result.set_outcome(ProcessOutcome.PROCESS_ERROR, error=str(e))
+    
+    def parse_with_hints(self, filename: str, hints: Dict) -> Dict:
+        """解析文件名，并用目录提示补全类型和年份"""
+        parsed_info = self.pattern_parser.parse(filename)
         
-        return result
+        # 文件名无法判断类型时使用目录声明的类型，缺少年份时使用目录的年份提示
+        if parsed_info['type'] in (None, 'unknown') and hints.get('media_type'):
+            parsed_info['type'] = hints['media_type']
+        if not parsed_info.get('year') and hints.get('year'):
+            parsed_info['year'] = hints['year']
+        return parsed_info
     
-    def batch_process(self, source_dir: str, dest_dir: str, extensions: List[str] = None) -> List[Dict]:
+    def get_directory_hints(self, source_file: str) -> Dict:
+        """根据目录配置获取文件所在源目录的媒体类型、年份和语言提示"""
+        source_path = os.path.abspath(source_file)
+        matched = None
+        matched_len = -1
+        
+        # 按最长前缀匹配源目录
+        for dir_config in self.config.get('directory_configs', []):
+            source_dir = (dir_config.get('source_dir') or '').strip()
+            if not source_dir:
+                continue
+            source_dir = os.path.abspath(source_dir)
+            if (source_path == source_dir or source_path.startswith(source_dir.rstrip(os.sep) + os.sep)) \
+                    and len(source_dir) > matched_len:
+                matched = dir_config
+                matched_len = len(source_dir)
+        
+        if not matched:
+            return {}
+        
+        hints = {}
+        media_type = self.MEDIA_TYPE_ALIASES.get(matched.get('media_type'))
+        if media_type:
+            hints['media_type'] = media_type
+        if matched.get('year'):
+            hints['year'] = str(matched['year'])
+        if matched.get('language'):
+            hints['language'] = matched['language']
+        return hints
+    
+    def _resolve_library_folder(self, dest_dir: str, title: str) -> Optional[str]:
+        """在目标媒体库索引中查找与标题匹配的文件夹"""
+        if not self.library_index or not title:
+            return None
+        return self.library_index.resolve(dest_dir, title)
+    
+    def batch_process(self, source_dir: str, dest_dir: str, extensions: List[str] = None) -> List[ProcessResult]:
         """批量处理目录中的文件"""
         results = []
         
         # 默认处理视频文件
         if extensions is None:
-            extensions = ['.mkv', '.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']
+            extensions = self.VIDEO_EXTENSIONS
         
         try:
             # 遍历源目录中的所有文件
@@ -121,77 +249,67 @@ class FileProcessor:
         
         except Exception as e:
             logger.error(f"批量处理失败: {str(e)}")
-            results.append({
-                'success': False,
-                'source': source_dir,
-                'destination': None,
-                'message': f"批量处理异常: {str(e)}",
-                'redo_command': None
-            })
+            results.append(ProcessResult(source_dir, dest_dir, ProcessOutcome.BATCH_ERROR, error=str(e)))
         
         return results
     
-    def compare_and_process(self, source_dir: str, dest_dir: str) -> List[Dict]:
+    def compare_and_process(self, source_dir: str, dest_dir: str) -> List[ProcessResult]:
         """比较源目录和目标目录，处理缺失的文件"""
         results = []
         
         try:
-            # 获取源目录中所有文件的相对路径
-            source_files = {}
-            for root, _, files in os.walk(source_dir):
-                for file in files:
-                    source_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(source_path, source_dir)
-                    source_files[relative_path] = source_path
+            # 获取源目录和目标目录的文件列表（未变化的目录直接复用快照）
+            source_snapshot = self._get_snapshot(source_dir)
+            dest_snapshot = self._get_snapshot(dest_dir)
+            source_files = source_snapshot.refresh()
+            dest_files = dest_snapshot.refresh()
             
-            # 获取目标目录中所有文件的相对路径
-            dest_files = set()
-            for root, _, files in os.walk(dest_dir):
-                for file in files:
-                    dest_path = os.path.join(root, file)
-                    # 只考虑硬链接目标
-                    if os.path.exists(dest_path):
-                        dest_files.add(file)
+            dest_names = {os.path.basename(path) for path in dest_files}
+            # 同一文件系统上，硬链接目标与源文件共享inode，重命名后也能识别
+            same_device = source_snapshot.device is not None and source_snapshot.device == dest_snapshot.device
+            dest_inodes = set(dest_files.values()) if same_device else set()
             
             # 处理缺失的文件
-            for relative_path, source_path in source_files.items():
-                source_filename = os.path.basename(source_path)
-                # 检查文件名（不包括路径）是否在目标中
-                if source_filename not in dest_files:
-                    result = self.process_file(source_path, dest_dir)
-                    results.append(result)
+            for relative_path, inode in source_files.items():
+                source_filename = os.path.basename(relative_path)
+                # 检查文件名（不包括路径）或硬链接是否已在目标中
+                if source_filename in dest_names or inode in dest_inodes:
+                    continue
+                result = self.process_file(os.path.join(source_dir, relative_path), dest_dir)
+                results.append(result)
+            
+            source_snapshot.save()
+            dest_snapshot.save()
         
         except Exception as e:
             logger.error(f"比较处理失败: {str(e)}")
-            results.append({
-                'success': False,
-                'source': source_dir,
-                'destination': dest_dir,
-                'message': f"比较处理异常: {str(e)}",
-                'redo_command': None
-            })
+            results.append(ProcessResult(source_dir, dest_dir, ProcessOutcome.COMPARE_ERROR,
+                                         destination=dest_dir, error=str(e)))
         
         return results
     
-    def process_redo_command(self, redo_command: str) -> Dict:
+    def _get_snapshot(self, root: str) -> TreeSnapshot:
+        """获取目录的快照（进程内缓存，配置了快照目录时持久化）"""
+        key = os.path.abspath(root)
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot_file = TreeSnapshot.snapshot_path(self.snapshot_dir, key) if self.snapshot_dir else None
+            snapshot = TreeSnapshot(key, snapshot_file)
+            self._snapshots[key] = snapshot
+        return snapshot
+    
+    def process_redo_command(self, redo_command: str) -> ProcessResult:
         """处理重做命令"""
         try:
             # 解析重做命令
-            parts = redo_command.strip().split(' ')
-            if len(parts) >= 3 and parts[0] == '/redo':
-                source_file = parts[1]
-                dest_dir = ' '.join(parts[2:])
+            parts = shlex.split(redo_command)
+            if len(parts) == 3 and parts[0] == '/redo':
+                source_file, dest_dir = parts[1], parts[2]
                 
-                # 重新处理文件
-                return self.process_file(source_file, dest_dir)
+                # 重新处理文件（忽略工作队列中的已完成状态，接受待确认的元数据匹配）
+                return self.process_file(source_file, dest_dir, force=True, confirmed=True)
             else:
-                return {
-                    'success': False,
-                    'message': '重做命令格式错误'
-                }
+                return ProcessResult(redo_command, outcome=ProcessOutcome.REDO_INVALID)
         except Exception as e:
             logger.error(f"处理重做命令失败: {redo_command}, 错误: {str(e)}")
-            return {
-                'success': False,
-                'message': f"重做命令处理失败: {str(e)}"
-            }
\ No newline at end of file
+            return ProcessResult(redo_command, outcome=ProcessOutcome.REDO_ERROR, error=str(e))
\ No newline at end of file
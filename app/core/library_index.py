@@ -0,0 +1,72 @@
+import os
+import logging
+import threading
+from typing import Dict, Optional
+from .title_normalizer import normalize_title
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryIndex:
+    """目标媒体库索引
+
+    记录每个目标目录下已存在的剧集/电影文件夹（标准化名称 -> 实际文件夹名），
+    首次访问时扫描一次，之后随新建文件夹增量更新。解析出的标题与已有文件夹
+    匹配时直接复用该文件夹，避免标题拼写差异产生重复的文件夹。
+    """
+
+    def __init__(self):
+        """初始化媒体库索引"""
+        self._indexes: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self, dest_dir: str) -> Dict[str, str]:
+        """获取目标目录的索引，不存在时扫描构建"""
+        key = os.path.abspath(dest_dir)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._scan(key)
+                self._indexes[key] = index
+            return index
+
+    def _scan(self, dest_dir: str) -> Dict[str, str]:
+        """扫描目标目录的一级子文件夹"""
+        index = {}
+        try:
+            with os.scandir(dest_dir) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        normalized = normalize_title(entry.name)
+                        if normalized:
+                            index.setdefault(normalized, entry.name)
+            logger.info(f"媒体库索引已构建: {dest_dir}, 文件夹数: {len(index)}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"扫描媒体库失败: {dest_dir}, 错误: {str(e)}")
+        return index
+
+    def resolve(self, dest_dir: str, title: str) -> Optional[str]:
+        """查找与标题匹配的已有文件夹名"""
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        return self._get_index(dest_dir).get(normalized)
+
+    def add(self, dest_dir: str, folder_name: str):
+        """记录新建的文件夹"""
+        normalized = normalize_title(folder_name)
+        if not normalized:
+            return
+        index = self._get_index(dest_dir)
+        with self._lock:
+            index.setdefault(normalized, folder_name)
+
+    def invalidate(self, dest_dir: str = None):
+        """清除索引，下次访问时重新扫描"""
+        with self._lock:
+            if dest_dir is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(os.path.abspath(dest_dir), None)
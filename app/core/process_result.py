@@ -0,0 +1,120 @@
+import os
+import shlex
+from enum import Enum
+from typing import Dict, Optional
+
+
+class ProcessOutcome(Enum):
+    """文件处理结果类型"""
+
+    SUCCESS = 'success'
+    SKIPPED = 'skipped'
+    NEEDS_REVIEW = 'needs_review'
+    LINK_FAILED = 'link_failed'
+    PROCESS_ERROR = 'process_error'
+    BATCH_ERROR = 'batch_error'
+    COMPARE_ERROR = 'compare_error'
+    REDO_INVALID = 'redo_invalid'
+    REDO_ERROR = 'redo_error'
+
+
+# 需要生成重做命令的结果类型（待确认的结果执行重做命令即表示接受匹配）
+_REDO_OUTCOMES = frozenset((ProcessOutcome.NEEDS_REVIEW, ProcessOutcome.LINK_FAILED, ProcessOutcome.PROCESS_ERROR))
+
+
+class ProcessResult:
+    """文件处理结果
+
+    只保存结果类型、路径和错误码，消息文本和重做命令在序列化时才生成，
+    大批量处理时比每个文件一个五键字典更省内存。同时兼容原有的字典式访问
+    （result['success']、result.get('message')）。
+    """
+
+    __slots__ = ('outcome', 'source', 'dest_dir', 'destination', 'error')
+
+    def __init__(self, source: str, dest_dir: Optional[str] = None,
+                 outcome: ProcessOutcome = ProcessOutcome.PROCESS_ERROR,
+                 destination: Optional[str] = None, error: Optional[str] = None):
+        self.source = source
+        self.dest_dir = dest_dir
+        self.outcome = outcome
+        self.destination = destination
+        self.error = error or None
+
+    def set_outcome(self, outcome: ProcessOutcome, destination: Optional[str] = None, error: Optional[str] = None):
+        """设置处理结果，错误分类由结果类型表示，错误信息（通常包含路径）按原样保存"""
+        self.outcome = outcome
+        self.destination = destination
+        self.error = error or None
+
+    @property
+    def success(self) -> bool:
+        return self.outcome is ProcessOutcome.SUCCESS
+
+    @property
+    def skipped(self) -> bool:
+        return self.outcome is ProcessOutcome.SKIPPED
+
+    @property
+    def needs_review(self) -> bool:
+        return self.outcome is ProcessOutcome.NEEDS_REVIEW
+
+    @property
+    def redo_command(self) -> Optional[str]:
+        if self.outcome in _REDO_OUTCOMES:
+            # 路径按shell规则加引号，包含空格时也能正确解析
+            return f"/redo {shlex.quote(self.source)} {shlex.quote(self.dest_dir)}"
+        return None
+
+    @property
+    def message(self) -> str:
+        """按结果类型生成消息文本"""
+        outcome = self.outcome
+        if outcome is ProcessOutcome.SUCCESS:
+            return f"成功处理文件: {os.path.basename(self.source)} -> {os.path.basename(self.destination)}"
+        if outcome is ProcessOutcome.SKIPPED:
+            return f"文件已由其他实例处理: {os.path.basename(self.source)}"
+        if outcome is ProcessOutcome.NEEDS_REVIEW:
+            return f"元数据匹配置信度低，需要人工确认: {os.path.basename(self.source)} -> {self.error}"
+        if outcome is ProcessOutcome.LINK_FAILED:
+            return "创建硬链接失败"
+        if outcome is ProcessOutcome.BATCH_ERROR:
+            return f"批量处理异常: {self.error}"
+        if outcome is ProcessOutcome.COMPARE_ERROR:
+            return f"比较处理异常: {self.error}"
+        if outcome is ProcessOutcome.REDO_INVALID:
+            return '重做命令格式错误'
+        if outcome is ProcessOutcome.REDO_ERROR:
+            return f"重做命令处理失败: {self.error}"
+        return f"处理失败: {self.error}"
+
+    def to_dict(self) -> Dict:
+        """转换为字典（用于JSON序列化和消息中心）"""
+        data = {
+            'success': self.success,
+            'source': self.source,
+            'destination': self.destination,
+            'message': self.message,
+            'redo_command': self.redo_command
+        }
+        if self.skipped:
+            data['skipped'] = True
+        if self.needs_review:
+            data['needs_review'] = True
+        return data
+
+    # 兼容字典式访问
+    def __getitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in ('success', 'source', 'destination', 'message', 'redo_command') or (
+            (key == 'skipped' and self.skipped) or (key == 'needs_review' and self.needs_review))
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self else default
+
+    def __repr__(self) -> str:
+        return f"ProcessResult({self.outcome.value}, {self.source!r})"
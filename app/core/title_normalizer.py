@@ -0,0 +1,70 @@
+import re
+import unicodedata
+
+# 繁简转换优先使用OpenCC（可选依赖），未安装时使用内置的常用字对照表
+try:
+    from opencc import OpenCC
+    _opencc = OpenCC('t2s')
+except Exception:
+    _opencc = None
+
+# 标题中被忽略的字符：标点、空白和下划线
+_IGNORED_CHARS = re.compile(r'[\W_]+', re.UNICODE)
+
+# 影视标题中常见的繁体字及对应的简体字（逐字对应）
+_TRADITIONAL = (
+    '萬與醜專業東絲丟兩嚴喪個豐臨為麗舉義烏樂喬習鄉書買亂爭於虧雲亞產親億僅從倉儀們價'
+    '眾優會傘偉傳傷倫偽體餘俠侶偵側僑倆儉債傾償儲兒黨蘭關興養獸岡冊寫軍農馮沖決況凍淨'
+    '涼減幾鳳憑凱擊劃劉則剛創刪別劍劇勸辦務勵勁勞勢動區醫華協單賣盧臥衛卻廠廳歷厲壓參'
+    '雙發變敘疊號嘆嚇聽啟吳嗎員響問啞喚團園圍圖圓聖場壞塊堅壇墳墜執報壺夢夾奪奮獎婦媽'
+    '孫學寧寶實寵審憲宮寬賓對尋導壽將爾塵嘗堯屍盡層屬歲豈島嶺嶼崗幣師帳帶幫廣莊慶庫應'
+    '廟龐廢開異棄張彌彎歸當錄徹徑後憶懷態總戀惡悶愛慘慣戰戲戶撲擴掃揚擾撫搶護擔擬擁攔'
+    '撥擇掛擋擠揮損換據擺搖攝數敵斬斷無舊時晝顯晉曉暈暫曆術機殺雜權條來楊極構槍櫃標樹'
+    '樣橋檢樓歐殘毀氣漢湯溝沒滅淚潑澤潔灑濁測濟濃濤漁漸溫灣濕滿灘潛瀟滾災燈靈爐點煉爛'
+    '熱燒營爺牆狀獨獄獵貓獻環現瑪瓊電畫暢療瘋癡皺盤監瞞礦碼確禮禍離種積穩窮竊競筆築簡'
+    '籃類糧緊紅約級紀紛純紙納線練組細織終經結給絕統繼續維綠網緣編罰羅聞聯聰職聲肅脫腦'
+    '臉膽艦艱藝節蘇蘋範葉蟲蝦蠻補裝製複襲見規視覺覽觀觸計訂認討讓訓記講許論設訪證評識'
+    '詩話誠誤說請讀誰調談謎謝謀譯貝負財貢貨質貴貸費賀資賊賭賽贏趕趙躍蹤車軌轉輪軟輕載'
+    '輸轟辭邊遼達遷過邁運還這進遠違連遲適選遺鄧鄭醬釋裡鑒針釣鐵鈴銀鋼錢錯鍋鎖鏡鐘長門'
+    '閃閉閒間閱闖隊陽陰陣階際陸陳險隨隱難雞雖霧靜韓頁頂項順須預頑頓領頭題顏願顧風飛飯'
+    '飲餓館馬駕騎驗驚髮鬥鬧魚鮮鳥鳴鴨鷹鹽麥黃齊齒龍龜殭淵滄穌閣齡遊傑歡衝隻週鋒獅瀏夥'
+    '嚮捨鍾麼麵衆猶豬滷饑彙鬱臺檯颱鑰錦繡驅擄緝諜誘謊憤誕殞剎紳瑣鎮樁墻禦斃蠍髒臟艷豔'
+    '籤簽釘鑽鏢槳襪撈盜竅贖懼驢鸚鵡鶴鷗紐'
+)
+_SIMPLIFIED = (
+    '万与丑专业东丝丢两严丧个丰临为丽举义乌乐乔习乡书买乱争于亏云亚产亲亿仅从仓仪们价'
+    '众优会伞伟传伤伦伪体余侠侣侦侧侨俩俭债倾偿储儿党兰关兴养兽冈册写军农冯冲决况冻净'
+    '凉减几凤凭凯击划刘则刚创删别剑剧劝办务励劲劳势动区医华协单卖卢卧卫却厂厅历厉压参'
+    '双发变叙叠号叹吓听启吴吗员响问哑唤团园围图圆圣场坏块坚坛坟坠执报壶梦夹夺奋奖妇妈'
+    '孙学宁宝实宠审宪宫宽宾对寻导寿将尔尘尝尧尸尽层属岁岂岛岭屿岗币师帐带帮广庄庆库应'
+    '庙庞废开异弃张弥弯归当录彻径后忆怀态总恋恶闷爱惨惯战戏户扑扩扫扬扰抚抢护担拟拥拦'
+    '拨择挂挡挤挥损换据摆摇摄数敌斩断无旧时昼显晋晓晕暂历术机杀杂权条来杨极构枪柜标树'
+    '样桥检楼欧残毁气汉汤沟没灭泪泼泽洁洒浊测济浓涛渔渐温湾湿满滩潜潇滚灾灯灵炉点炼烂'
+    '热烧营爷墙状独狱猎猫献环现玛琼电画畅疗疯痴皱盘监瞒矿码确礼祸离种积稳穷窃竞笔筑简'
+    '篮类粮紧红约级纪纷纯纸纳线练组细织终经结给绝统继续维绿网缘编罚罗闻联聪职声肃脱脑'
+    '脸胆舰艰艺节苏苹范叶虫虾蛮补装制复袭见规视觉览观触计订认讨让训记讲许论设访证评识'
+    '诗话诚误说请读谁调谈谜谢谋译贝负财贡货质贵贷费贺资贼赌赛赢赶赵跃踪车轨转轮软轻载'
+    '输轰辞边辽达迁过迈运还这进远违连迟适选遗邓郑酱释里鉴针钓铁铃银钢钱错锅锁镜钟长门'
+    '闪闭闲间阅闯队阳阴阵阶际陆陈险随隐难鸡虽雾静韩页顶项顺须预顽顿领头题颜愿顾风飞饭'
+    '饮饿馆马驾骑验惊发斗闹鱼鲜鸟鸣鸭鹰盐麦黄齐齿龙龟僵渊沧稣阁龄游杰欢冲只周锋狮浏伙'
+    '向舍钟么面众犹猪卤饥汇郁台台台钥锦绣驱掳缉谍诱谎愤诞殒刹绅琐镇桩墙御毙蝎脏脏艳艳'
+    '签签钉钻镖桨袜捞盗窍赎惧驴鹦鹉鹤鸥纽'
+)
+_T2S_TABLE = str.maketrans(_TRADITIONAL, _SIMPLIFIED)
+
+
+def normalize_title(title: str) -> str:
+    """标准化标题用于比较：全角转半角、忽略大小写、去除标点和空白"""
+    if not title:
+        return ''
+    title = unicodedata.normalize('NFKC', title).casefold()
+    return _IGNORED_CHARS.sub('', title)
+
+
+def to_simplified(text: str) -> str:
+    """繁体转简体（用于比较，不保证词汇级转换的准确性）"""
+    if not text:
+        return ''
+    if _opencc is not None:
+        return _opencc.convert(text)
+    return text.translate(_T2S_TABLE)
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Optional
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class TreeSnapshot:
+    """目录树快照
+
+    为每个目录记录修改时间、链接数、文件列表（文件名 -> inode）和子目录列表。
+    再次遍历时只需 stat 每个目录：修改时间未变的目录直接复用上次的列表，
+    只有发生变化的目录才会重新列出。快照可持久化到文件，跨运行复用。
+    """
+
+    VERSION = 1
+    # 修改时间距离列出时刻太近的目录不可信（同一时间粒度内可能再次修改），下次重新列出
+    RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+    def __init__(self, root: str, snapshot_file: Optional[str] = None):
+        """初始化目录树快照"""
+        self.root = os.path.abspath(root)
+        self.snapshot_file = Path(snapshot_file) if snapshot_file else None
+        self.device = None
+        # 相对目录 -> [mtime_ns, nlink, {文件名: inode}, [子目录名]]
+        self.dirs: Dict[str, list] = {}
+        self.last_stats = {'listed': 0, 'reused': 0}
+
+        self.load()
+
+    @staticmethod
+    def snapshot_path(snapshot_dir: str, root: str) -> Path:
+        """根据目录路径生成快照文件路径"""
+        digest = hashlib.sha1(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+        return Path(snapshot_dir) / f"snapshot_{digest}.json"
+
+    def load(self):
+        """从文件加载快照"""
+        if not self.snapshot_file or not self.snapshot_file.exists():
+            return
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION and data.get('root') == self.root:
+                self.device = data.get('device')
+                self.dirs = data.get('dirs', {})
+                logger.debug(f"加载目录快照: {self.root}, 目录数: {len(self.dirs)}")
+        except Exception as e:
+            logger.error(f"加载目录快照失败: {self.snapshot_file}, 错误: {str(e)}")
+            self.dirs = {}
+
+    def save(self):
+        """保存快照到文件（先写临时文件再替换，避免中断时损坏）"""
+        if not self.snapshot_file:
+            return
+        try:
+            self.snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.snapshot_file.with_suffix('.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': self.VERSION,
+                    'root': self.root,
+                    'device': self.device,
+                    'dirs': self.dirs
+                }, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_file, self.snapshot_file)
+        except Exception as e:
+            logger.error(f"保存目录快照失败: {self.snapshot_file}, 错误: {str(e)}")
+
+    def _list_dir(self, path: str, stat: os.stat_result) -> list:
+        """列出目录内容"""
+        files = {}
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif not entry.is_dir():
+                        # DirEntry.inode() 在POSIX上无需额外的stat调用
+                        files[entry.name] = entry.inode()
+                except OSError:
+                    continue
+
+        mtime = stat.st_mtime_ns
+        if time.time_ns() - mtime < self.RACY_WINDOW_NS:
+            mtime = None
+        return [mtime, stat.st_nlink, files, subdirs]
+
+    def refresh(self) -> Dict[str, int]:
+        """遍历目录树，返回所有文件的相对路径 -> inode"""
+        files = {}
+        new_dirs = {}
+        listed = reused = 0
+
+        try:
+            self.device = os.stat(self.root).st_dev
+        except OSError as e:
+            logger.error(f"无法访问目录: {self.root}, 错误: {str(e)}")
+            self.dirs = {}
+            return files
+
+        stack = ['']
+        while stack:
+            relative_dir = stack.pop()
+            path = os.path.join(self.root, relative_dir) if relative_dir else self.root
+            try:
+                stat = os.stat(path)
+                cached = self.dirs.get(relative_dir)
+                if cached and cached[0] is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_nlink:
+                    entry = cached
+                    reused += 1
+                else:
+                    entry = self._list_dir(path, stat)
+                    listed += 1
+            except OSError as e:
+                logger.warning(f"读取目录失败: {path}, 错误: {str(e)}")
+                continue
+
+            new_dirs[relative_dir] = entry
+            for name, inode in entry[2].items():
+                files[os.path.join(relative_dir, name) if relative_dir else name] = inode
+            for name in entry[3]:
+                stack.append(os.path.join(relative_dir, name) if relative_dir else name)
+
+        self.dirs = new_dirs
+        self.last_stats = {'listed': listed, 'reused': reused}
+        logger.info(f"目录快照已更新: {self.root}, 重新列出 {listed} 个目录, 复用 {reused} 个目录")
+        return files
@@ -0,0 +1,182 @@
+import os
+import socket
+import sqlite3
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class WorkQueue:
+    """多实例共享工作队列，通过SQLite租约表协调文件处理
+
+    多个实例指向同一个数据库文件（共享卷上），处理文件前先原子地申请租约，
+    持有未过期租约或已处理完成的文件会被其他实例跳过。实例崩溃后其租约在
+    lease_ttl 秒后自动失效，可被其他实例重新申请。
+    """
+
+    STATUS_LEASED = 'leased'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, db_path: str = '/data/work_queue.db', instance_id: str = None,
+                 lease_ttl: int = 600):
+        """初始化工作队列"""
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+
+        self._lock = threading.Lock()
+        # 使用默认的回滚日志模式（而非WAL），依赖文件锁，可在共享卷上工作
+        self._conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._init_db()
+
+    def _init_db(self):
+        """创建租约表"""
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS leases ('
+                ' file_key TEXT PRIMARY KEY,'
+                ' owner TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' signature TEXT,'
+                ' expires_at REAL,'
+                ' updated_at REAL NOT NULL'
+                ')'
+            )
+
+    def _file_key(self, file_path: str) -> str:
+        """生成文件的唯一键（解析符号链接后的绝对路径）"""
+        return os.path.realpath(file_path)
+
+    def _signature(self, file_path: str) -> Optional[str]:
+        """文件签名（大小+修改时间），文件变化后允许重新处理"""
+        try:
+            stat = os.stat(file_path)
+            return f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            return None
+
+    def claim(self, file_path: str, force: bool = False) -> bool:
+        """申请文件的处理租约，成功返回True
+
+        force为True时忽略已完成状态（用于重做命令），但仍尊重其他实例的有效租约。
+        """
+        key = self._file_key(file_path)
+        signature = self._signature(file_path)
+        now = time.time()
+
+        with self._lock:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    row = self._conn.execute(
+                        'SELECT owner, status, signature, expires_at FROM leases WHERE file_key = ?',
+                        (key,)
+                    ).fetchone()
+
+                    if row:
+                        owner, status, old_signature, expires_at = row
+                        if status == self.STATUS_LEASED and owner != self.instance_id and (expires_at or 0) > now:
+                            self._conn.execute('ROLLBACK')
+                            logger.info(f"文件正由实例 {owner} 处理，跳过: {file_path}")
+                            return False
+                        if status == self.STATUS_DONE and old_signature == signature and not force:
+                            self._conn.execute('ROLLBACK')
+                            logger.info(f"文件已由实例 {owner} 处理完成，跳过: {file_path}")
+                            return False
+
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO leases (file_key, owner, status, signature, expires_at, updated_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (key, self.instance_id, self.STATUS_LEASED, signature, now + self.lease_ttl, now)
+                    )
+                    self._conn.execute('COMMIT')
+                    return True
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+            except sqlite3.Error as e:
+                # 队列不可用时不阻塞处理，退化为单实例行为
+                logger.error(f"申请文件租约失败: {file_path}, 错误: {str(e)}")
+                return True
+
+    def complete(self, file_path: str, success: bool = True):
+        """结束租约并记录处理结果"""
+        status = self.STATUS_DONE if success else self.STATUS_FAILED
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'UPDATE leases SET status = ?, expires_at = NULL, updated_at = ? '
+                    'WHERE file_key = ? AND owner = ?',
+                    (status, time.time(), self._file_key(file_path), self.instance_id)
+                )
+            except sqlite3.Error as e:
+                logger.error(f"更新文件租约失败: {file_path}, 错误: {str(e)}")
+
+    def release(self, file_path: str):
+        """释放本实例持有的租约（不记录结果）"""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'DELETE FROM leases WHERE file_key = ? AND owner = ? AND status = ?',
+                    (self._file_key(file_path), self.instance_id, self.STATUS_LEASED)
+                )
+            except sqlite3.Error as e:
+                logger.error(f"释放文件租约失败: {file_path}, 错误: {str(e)}")
+
+    def release_all(self):
+        """释放本实例持有的所有租约"""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    'DELETE FROM leases WHERE owner = ? AND status = ?',
+                    (self.instance_id, self.STATUS_LEASED)
+                )
+            except sqlite3.Error as e:
+                logger.error(f"释放租约失败: {str(e)}")
+
+    def purge_expired(self) -> int:
+        """清理已过期的租约，返回清理数量"""
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    'DELETE FROM leases WHERE status = ? AND expires_at < ?',
+                    (self.STATUS_LEASED, time.time())
+                )
+                if cursor.rowcount:
+                    logger.info(f"清理了 {cursor.rowcount} 个过期租约")
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logger.error(f"清理过期租约失败: {str(e)}")
+                return 0
+
+    def get_stats(self) -> Dict:
+        """获取队列统计信息"""
+        stats = {
+            'instance_id': self.instance_id,
+            'status_count': {}
+        }
+        with self._lock:
+            try:
+                for status, count in self._conn.execute('SELECT status, COUNT(*) FROM leases GROUP BY status'):
+                    stats['status_count'][status] = count
+            except sqlite3.Error as e:
+                logger.error(f"读取队列统计失败: {str(e)}")
+        return stats
+
+    def close(self):
+        """释放租约并关闭数据库连接"""
+        self.release_all()
+        with self._lock:
+            self._conn.close()
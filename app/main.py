@@ -30,7 +30,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 # 导入必要的模块
 try:
     from app.config import ConfigManager, MessageCenter
-    from app.core import FileProcessor
+    from app.core import FileProcessor, WorkQueue, CacheWarmer
     from app.metadata import MetadataManager
     from app.monitor import FileMonitor
     from app.web import create_app, socketio
@@ -56,7 +56,7 @@ class PlexRenameApp:
             message_file='/data/messages.json'
         )
         
-        # 初始化元数据管理器
+        # 初始化元数据管理器，Web路由、文件监控和命令行共享同一个实例
         config = self.config_manager.get_config()
         self.metadata_manager = MetadataManager(config)
         
@@ -64,6 +64,20 @@ class PlexRenameApp:
         self.file_processor = FileProcessor(config)
         self.file_processor.set_metadata_client(self.metadata_manager)
         
+        # 元数据缓存预热
+        self.cache_warmer = CacheWarmer(self.file_processor, self.metadata_manager)
+        
+        # 初始化多实例工作队列（可选）
+        self.work_queue = None
+        if config.get('work_queue_enabled', False):
+            self.work_queue = WorkQueue(
+                db_path=config.get('work_queue_path', '/data/work_queue.db'),
+                instance_id=config.get('instance_id') or None,
+                lease_ttl=config.get('work_queue_lease_ttl', 600)
+            )
+            self.file_processor.set_work_queue(self.work_queue)
+            logger.info(f"已启用多实例工作队列，实例ID: {self.work_queue.instance_id}")
+        
         # 初始化文件监控器
         self.file_monitor = None
         self.monitor_thread = None
@@ -72,11 +86,22 @@ class PlexRenameApp:
         # 初始化Flask应用
         self.app = create_app(
             config_manager=self.config_manager,
-            message_center=self.message_center
+            message_center=self.message_center,
+            metadata_manager=self.metadata_manager
         )
         
-        # 存储监控器到app配置中，供路由使用
+        # 存储监控器和文件处理器到app配置中，供路由使用
         self.app.config['file_monitor'] = self._get_file_monitor
+        self.app.config['file_processor'] = self.file_processor
+        self.app.config['cache_warmer'] = self.cache_warmer
+        
+        # 配置更新时就地更新共享实例，不重新创建
+        self.config_manager.add_listener(self._on_config_updated)
+    
+    def _on_config_updated(self, config):
+        """配置更新回调"""
+        self.metadata_manager.update_config(config)
+        self.file_processor.update_config(config)
     
     def _get_file_monitor(self):
         """获取文件监控器实例"""
@@ -87,29 +112,20 @@ class PlexRenameApp:
     def _init_file_monitor(self):
         """初始化文件监控器"""
         config = self.config_manager.get_config()
-        directories = config.get('directories', [])
-        
-        # 准备监控目录
-        watch_dirs = []
-        for dir_config in directories:
-            source_dir = dir_config.get('source')
-            target_dir = dir_config.get('target')
-            if source_dir and target_dir:
-                watch_dirs.append({
-                    'source': source_dir,
-                    'target': target_dir,
-                    'name': dir_config.get('name', 'Unnamed')
-                })
+        watch_dirs = [c for c in config.get('directory_configs', []) if c.get('source_dir', '').strip()]
         
-        # 创建监控器
+        # 创建监控器，使用共享的文件处理器
         if watch_dirs:
-            self.file_monitor = FileMonitor(
-                directories=watch_dirs,
-                file_processor=self.file_processor,
-                message_center=self.message_center
-            )
+            self.file_monitor = FileMonitor(config)
+            self.file_monitor.set_file_processor(self.file_processor)
+            self.file_monitor.set_message_callback(self._on_monitor_message)
             logger.info(f"初始化文件监控器，监控目录数: {len(watch_dirs)}")
     
+    def _on_monitor_message(self, message):
+        """将监控器处理结果转发到消息中心"""
+        if message.get('type') == 'file_processed':
+            self.message_center.add_file_process_message(message['result'])
+    
     def start_monitor(self):
         """启动文件监控"""
         config = self.config_manager.get_config()
@@ -163,10 +179,7 @@ class PlexRenameApp:
                 # 检查配置是否有变化
                 if self.file_monitor and self.config_manager.has_changed():
                     logger.info("配置已更改，重启监控器")
-                    self.file_monitor.stop()
-                    self._init_file_monitor()
-                    if self.file_monitor:
-                        self.file_monitor.start()
+                    self.file_monitor.update_config(self.config_manager.get_config())
                     self.config_manager.reset_changed_flag()
                     
         except Exception as e:
@@ -201,8 +214,40 @@ class PlexRenameApp:
         finally:
             # 停止监控
             self.stop_monitor()
+            # 释放本实例持有的租约
+            if self.work_queue:
+                self.work_queue.close()
+            self.metadata_manager.close()
             logger.info("应用已关闭")
     
+    def warm_cache(self):
+        """预热所有源目录的元数据缓存"""
+        def report(done, total):
+            # 每完成约10%输出一次进度
+            if done == total or done % max(1, total // 10) == 0:
+                logger.info(f"预热进度: {done}/{total}")
+        
+        status = self.cache_warmer.warm(progress=report)
+        self.message_center.add_system_message(
+            f"元数据缓存预热完成: {status['titles']} 个标题, 找到 {status['found']}, 未找到 {status['missing']}",
+            'info'
+        )
+        return status
+    
+    def import_offline_index(self, dump_files):
+        """导入TMDB每日ID导出文件到本地标题索引"""
+        try:
+            logger.info(f"开始导入TMDB导出文件: {', '.join(dump_files)}")
+            total = self.metadata_manager.import_offline_dumps(
+                dump_files,
+                progress=lambda count: logger.info(f"已导入 {count} 条")
+            )
+            logger.info(f"导入完成: 共 {total} 条")
+            return total
+        except Exception as e:
+            logger.error(f"导入TMDB导出文件失败: {str(e)}")
+            return 0
+    
     def run_once(self, source_dir=None, target_dir=None, mode='all'):
         """运行一次批量处理"""
         try:
@@ -228,13 +273,17 @@ class PlexRenameApp:
             
             # 统计结果
             success_count = sum(1 for r in results if r.get('success'))
-            error_count = len(results) - success_count
+            skipped_count = sum(1 for r in results if r.get('skipped'))
+            review_count = sum(1 for r in results if r.get('needs_review'))
+            error_count = len(results) - success_count - skipped_count - review_count
             
-            logger.info(f"批量处理完成: 成功 {success_count}, 失败 {error_count}")
+            summary = (f"批量处理完成: 成功 {success_count}, 失败 {error_count}, 跳过 {skipped_count}, "
+                       f"待确认 {review_count}")
+            logger.info(summary)
             
             # 发送系统消息
             self.message_center.add_system_message(
-                f'批量处理完成: 成功 {success_count}, 失败 {error_count}',
+                summary,
                 'info'
             )
             
@@ -257,6 +306,15 @@ def main():
     if len(sys.argv) > 1:
         if sys.argv[1] == 'run':
             app.run_once()
+        elif sys.argv[1] == 'warm':
+            app.warm_cache()
+        elif sys.argv[1] == 'import-tmdb-dump':
+            # plexrename import-tmdb-dump movie_ids_05_15_2024.json.gz tv_series_ids_05_15_2024.json.gz
+            if len(sys.argv) < 3:
+                logger.error("请指定TMDB导出文件")
+                sys.exit(1)
+            if not app.import_offline_index(sys.argv[2:]):
+                sys.exit(1)
         else:
             logger.error("未知命令")
             sys.exit(1)
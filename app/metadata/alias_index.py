@@ -0,0 +1,58 @@
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+
+from .id_index import IdIndex
+from .cache_keys import canonical_title
+from .ranking import parse_year
+
+logger = logging.getLogger(__name__)
+
+
+class AliasIndex:
+    """查询中学到的标题别名索引（类型 -> 规范标题 -> TMDB ID）
+
+    中文标题在TMDB搜索不到、通过豆瓣的原名才找到时，中文标题和原名都记录到同一个TMDB ID，
+    之后用任一名称查询都直接按ID获取详情，不再经过失败的搜索和回退。
+    记录保存在追加写入的IdIndex中，值为 {'id': TMDB ID, 'year': 年份}。
+    """
+
+    # 查询年份与记录年份相差超过此值时视为同名的其他作品
+    MAX_YEAR_DIFF = 1
+
+    def __init__(self, index_file: str):
+        """初始化别名索引"""
+        self._index = IdIndex(index_file)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.learned = 0
+
+    def lookup(self, media_type: str, title: str, year: str = None) -> Optional[int]:
+        """查找标题对应的TMDB ID，年份与记录不符时返回None"""
+        entry = self._index.get(media_type, canonical_title(title))
+        if not entry:
+            return None
+        query_year, known_year = parse_year(year), parse_year(entry.get('year'))
+        if query_year and known_year and abs(query_year - known_year) > self.MAX_YEAR_DIFF:
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry['id']
+
+    def learn(self, media_type: str, tmdb_id: int, titles: Iterable[str], year: str = None):
+        """将一组标题（中文标题、原名等）记录到同一个TMDB ID"""
+        entry = {'id': tmdb_id, 'year': str(parse_year(year) or '')}
+        for key in {canonical_title(title) for title in titles if title}:
+            if self._index.get(media_type, key) != entry:
+                self._index.set(media_type, key, entry)
+                with self._lock:
+                    self.learned += 1
+                logger.debug(f"记录标题别名: {key} -> {tmdb_id}")
+
+    def get_stats(self) -> Dict:
+        """获取别名索引统计"""
+        return {'entries': len(self._index), 'hits': self.hits, 'learned': self.learned}
+
+    def close(self):
+        """关闭索引文件"""
+        self._index.close()
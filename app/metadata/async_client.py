@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+try:
+    import aiohttp
+    ASYNC_HTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    ASYNC_HTTP_AVAILABLE = False
+
+from .memory_cache import MISSING
+from .circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHTTPPool:
+    """基于aiohttp的异步HTTP连接池
+
+    所有请求共用一个会话：总连接数和每个主机的连接数有上限，空闲连接保持一段时间以便复用。
+    """
+
+    def __init__(self, pool_size: int = 100, per_host_limit: int = 20, timeout: float = 10,
+                 keepalive_timeout: float = 30):
+        """初始化连接池配置（会话在进入上下文时创建）"""
+        if not ASYNC_HTTP_AVAILABLE:
+            raise RuntimeError("异步HTTP客户端需要安装 aiohttp")
+        self.pool_size = pool_size
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+    async def __aenter__(self) -> 'AsyncHTTPPool':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """创建会话"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host_limit,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def close(self):
+        """关闭会话和所有连接"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_json(self, url: str, params: Dict = None, headers: Dict = None,
+                       cookies: Dict = None):
+        """发送GET请求并解析JSON响应，HTTP错误时抛出异常"""
+        if self._session is None:
+            await self.open()
+        # aiohttp只接受字符串参数值
+        params = {key: str(value) for key, value in (params or {}).items() if value is not None}
+        async with self._session.get(url, params=params, headers=headers, cookies=cookies) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+
+class AsyncTMDBClient:
+    """TMDB客户端的异步版本
+
+    请求参数、缓存键和缓存读写都复用同步客户端的实现，只把网络请求换成异步连接池。
+    """
+
+    def __init__(self, client, http: AsyncHTTPPool):
+        """初始化，client为同步TMDBClient"""
+        self.client = client
+        self.http = http
+
+    async def _make_request(self, endpoint: str, params: Dict = None, language: str = None) -> Optional[Dict]:
+        """发送API请求"""
+        if not self.client.api_key:
+            logger.error("无法发送请求：TMDB API Key 未配置")
+            return None
+
+        url, params = self.client._build_request(endpoint, params, language)
+        try:
+            return await self.client.rate_limiter.request_async(
+                self.client.CACHE_NAMESPACE,
+                lambda: self.http.get_json(url, params=params, headers=dict(self.client.session.headers))
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, CircuitOpenError) as e:
+            logger.error(f"TMDB API请求失败: {url}, 错误: {str(e) or type(e).__name__}")
+            return None
+
+    async def search_movie(self, title: str, year: str = None, language: str = None) -> Optional[Dict]:
+        """搜索电影"""
+        return await self._search('movie', title, year, language)
+
+    async def search_tv(self, title: str, year: str = None, language: str = None) -> Optional[Dict]:
+        """搜索电视剧"""
+        return await self._search('tv', title, year, language)
+
+    async def _search(self, media_type: str, title: str, year: str = None, language: str = None) -> Optional[Dict]:
+        """搜索电影或电视剧：检查缓存、搜索、获取详情并缓存"""
+        client = self.client
+        cache_key, cached = client._get_search_cache(media_type, title, year, language)
+        if cached is not MISSING:
+            return cached
+
+        # 异步请求不读取响应头，条目只记录刷新方式，过期后重新验证时发送普通请求
+        endpoint = f"/search/{media_type}"
+        params = client._search_params(media_type, title, year)
+        results = await self._make_request(endpoint, params, language)
+        hit = client._pick_search_result(results, title, year, media_type)
+        if hit and client.lean:
+            validators = client._validators('search', endpoint, params, language, media_type=media_type, title=title,
+                                            year=year)
+            return client._save_search_result(cache_key, media_type, title, hit, validators, hit['match_confidence'])
+        if hit:
+            # 获取详细信息
+            endpoint = f"/{media_type}/{hit['id']}"
+            detail = await self._make_request(endpoint, client._detail_params(), language)
+            if detail:
+                validators = client._validators('details', endpoint, client._detail_params(), language,
+                                                media_type=media_type, title=title,
+                                                confidence=hit['match_confidence'])
+                return client._save_search_result(cache_key, media_type, title, detail, validators,
+                                                  hit['match_confidence'])
+        elif results is not None:
+            client._save_search_not_found(cache_key, media_type, title)
+
+        return None
+
+    async def get_details(self, media_type: str, tmdb_id: int, language: str = None) -> Optional[Dict]:
+        """按TMDB ID获取电影或电视剧详情"""
+        client = self.client
+        cache_key = client._details_cache_key(media_type, tmdb_id, language)
+        cached = client._get_from_cache(cache_key)
+        if cached:
+            return cached
+
+        endpoint = f"/{media_type}/{tmdb_id}"
+        detail = await self._make_request(endpoint, client._detail_params(), language)
+        if detail:
+            validators = client._validators('details', endpoint, client._detail_params(), language,
+                                            media_type=media_type)
+            return client._save_details(cache_key, media_type, detail, validators)
+        return None
+
+
+class AsyncDoubanClient:
+    """豆瓣客户端的异步版本，复用同步客户端的请求头、Cookies和缓存"""
+
+    def __init__(self, client, http: AsyncHTTPPool):
+        """初始化，client为同步DoubanClient"""
+        self.client = client
+        self.http = http
+
+    async def search(self, title: str, media_type: str = None, year: str = None) -> Optional[Dict]:
+        """搜索电影或电视剧"""
+        client = self.client
+        cache_key, cached = client._get_search_cache(title, media_type, year)
+        if cached is not MISSING:
+            return cached
+
+        try:
+            results = await client.rate_limiter.request_async(
+                client.CACHE_NAMESPACE,
+                lambda: self.http.get_json(
+                    client._search_url(title),
+                    headers=dict(client.session.headers),
+                    cookies=client.session.cookies.get_dict()
+                )
+            )
+            return client._handle_search_results(cache_key, title, media_type, results,
+                                                 client._validators(title, media_type, year), year)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"豆瓣搜索失败: {title}, 错误: {str(e) or type(e).__name__}")
+        except Exception as e:
+            logger.error(f"豆瓣搜索处理失败: {title}, 错误: {str(e)}")
+
+        return None
@@ -0,0 +1,36 @@
+import json
+import zlib
+from typing import Any, Union
+
+# 编码后第一个字节标记格式
+FORMAT_JSON = b'\x00'
+FORMAT_ZLIB = b'\x01'
+
+
+def encode_value(value: Any, compress_threshold: int = 1024, level: int = 6) -> bytes:
+    """将缓存值编码为紧凑JSON，超过compress_threshold字节且压缩后更小时使用zlib压缩
+
+    compress_threshold为0表示不压缩。
+    """
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if compress_threshold and len(data) > compress_threshold:
+        compressed = zlib.compress(data, level)
+        if len(compressed) < len(data):
+            return FORMAT_ZLIB + compressed
+    return FORMAT_JSON + data
+
+
+def decode_value(data: Union[bytes, str]) -> Any:
+    """解码缓存值，兼容旧版以TEXT保存的JSON"""
+    if isinstance(data, str):
+        return json.loads(data)
+    data = bytes(data)
+    header, body = data[:1], data[1:]
+    if header == FORMAT_ZLIB:
+        try:
+            return json.loads(zlib.decompress(body))
+        except zlib.error as e:
+            raise ValueError(f"解压缓存值失败: {str(e)}")
+    if header == FORMAT_JSON:
+        return json.loads(body)
+    raise ValueError(f"未知的缓存值格式: {header!r}")
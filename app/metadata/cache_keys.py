@@ -0,0 +1,41 @@
+import re
+from typing import Optional
+
+from ..core.title_normalizer import normalize_title, to_simplified
+
+# 旧版搜索缓存键：{类型}_{标题}[_{年份}][_{语言}]，类型为 movie/tv（TMDB）或 all（豆瓣未指定类型）
+_LEGACY_SEARCH_KEY = re.compile(
+    r'^(?P<prefix>movie|tv|all)_(?P<title>.+?)(?:_(?P<year>\d{4}))?(?:_(?P<language>[a-z]{2}-[A-Z]{2}))?$'
+)
+# 不是按标题生成的键：剧集、整季和按ID获取的详情
+_NON_TITLE_KEY = re.compile(r'^(?:episode_|season_|(?:movie|tv)_id_\d)')
+
+
+def canonical_title(title: str) -> str:
+    """标题的规范形式：繁体转简体，全角转半角，忽略大小写、标点和空白"""
+    canonical = normalize_title(to_simplified(title or ''))
+    # 全部由标点组成的标题保留原文，避免不同标题得到相同的空键
+    return canonical or (title or '').strip()
+
+
+def search_key(prefix: str, title: str, year: str = None, language: str = None) -> str:
+    """TMDB和豆瓣客户端共用的搜索缓存键
+
+    大小写、标点、空白或繁简体不同的同一标题得到相同的键。
+    """
+    parts = [prefix, canonical_title(title)]
+    if year:
+        parts.append(str(year))
+    if language:
+        parts.append(language)
+    return '_'.join(parts)
+
+
+def canonicalize_key(key: str) -> Optional[str]:
+    """将旧版搜索缓存键转换为规范键，不是搜索缓存键时返回None"""
+    if _NON_TITLE_KEY.match(key):
+        return None
+    match = _LEGACY_SEARCH_KEY.match(key)
+    if not match:
+        return None
+    return search_key(match.group('prefix'), match.group('title'), match.group('year'), match.group('language'))
@@ -0,0 +1,541 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Any
+from pathlib import Path
+from .memory_cache import MemoryCache, MISSING
+from .cache_codec import decode_value, encode_value
+
+logger = logging.getLogger(__name__)
+
+# 否定缓存命中时get返回的标记：数据源已确认没有结果
+NOT_FOUND = object()
+# 否定缓存条目在存储中的表示
+_NOT_FOUND_VALUE = {'__not_found__': True}
+
+
+class CacheStore:
+    """元数据缓存存储
+
+    TMDB和豆瓣客户端共用的SQLite缓存，按命名空间（数据源）区分键，
+    每条记录有独立的过期时间，超出条目数或字节数上限时按最近访问时间淘汰（LRU），并记录命中次数。
+    前面有一层进程内LRU缓存保存已解析的条目，两层分别统计命中率。
+    值以紧凑JSON保存，超过compress_threshold字节的值使用zlib压缩（见cache_codec）。
+    数据源确认没有结果时写入否定条目（使用更短的过期时间），读取时返回NOT_FOUND。
+    写入时附带了刷新方式（validators中的refresh）的条目过期后在stale_grace秒内仍可读取，
+    读取时通过revalidator在后台重新验证（条件请求使用保存的ETag和Last-Modified）。
+    """
+
+    DB_NAME = 'metadata_cache.db'
+    # 豆瓣客户端缓存的字段，用于迁移时区分来源
+    DOUBAN_FIELDS = {'title', 'original_title', 'year', 'type', 'id', 'cover'}
+    # 累积多少个内存命中后写回访问时间
+    TOUCH_FLUSH_SIZE = 500
+
+    def __init__(self, cache_dir: str = './data', default_ttl: int = 30 * 24 * 3600,
+                 max_entries: int = 0, max_bytes: int = 0,
+                 memory_entries: int = 2000, memory_bytes: int = 0, stale_grace: int = 0,
+                 compress_threshold: int = 1024):
+        """初始化缓存存储
+
+        default_ttl为0表示永不过期；max_entries/max_bytes为0表示不限制。
+        memory_entries/memory_bytes为内存层容量，均为0时不启用内存层。
+        stale_grace为可刷新条目过期后继续返回旧值的时间，0表示过期即删除。
+        compress_threshold为压缩的最小字节数，0表示不压缩。
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / self.DB_NAME
+
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_grace = stale_grace
+        self.compress_threshold = compress_threshold
+        # 读取到过期条目时调用：revalidator(命名空间, 键, 条目信息)，由MetadataManager设置
+        self.revalidator: Optional[Callable[[str, str, Dict], Any]] = None
+
+        self.memory = MemoryCache(max_entries=memory_entries, max_bytes=memory_bytes)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.stale_hits = 0
+        # 内存命中尚未写回磁盘的访问：(命名空间, 键) -> [最近访问时间, 命中次数]
+        self._pending_touches: Dict[tuple, list] = {}
+        # 否定缓存命中次数：(命名空间, 媒体类型) -> 次数
+        self.not_found_hits: Dict[tuple, int] = {}
+        
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._init_db()
+
+        # 当前条目数和总字节数，避免每次写入都统计全表
+        self._entry_count, self._total_bytes = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+        ).fetchone()
+
+    def _init_db(self):
+        """创建表结构"""
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' namespace TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' value BLOB NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' expires_at REAL,'
+                ' last_access REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, key)'
+                ')'
+            )
+            # 旧版数据库没有命中次数列
+            columns = {row[1] for row in self._conn.execute('PRAGMA table_info(entries)')}
+            if 'hits' not in columns:
+                self._conn.execute('ALTER TABLE entries ADD COLUMN hits INTEGER NOT NULL DEFAULT 0')
+            # 旧版数据库没有重新验证所需的列：stale_at为条目失效时间，expires_at为宽限期结束时间
+            if 'stale_at' not in columns:
+                self._conn.execute('ALTER TABLE entries ADD COLUMN stale_at REAL')
+                self._conn.execute('ALTER TABLE entries ADD COLUMN etag TEXT')
+                self._conn.execute('ALTER TABLE entries ADD COLUMN last_modified TEXT')
+                self._conn.execute('ALTER TABLE entries ADD COLUMN refresh TEXT')
+                self._conn.execute('UPDATE entries SET stale_at = expires_at')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            self._conn.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """读取缓存，过期的条目视为不存在，否定条目返回NOT_FOUND
+
+        宽限期内的过期条目返回旧值，并提交后台重新验证。
+        """
+        value = self.memory.get((namespace, key))
+        if value is NOT_FOUND:
+            self._count_not_found(namespace, key)
+        if value is not MISSING:
+            # 内存命中的访问时间延迟写回磁盘，保证磁盘层的LRU顺序
+            with self._lock:
+                touch = self._pending_touches.get((namespace, key))
+                if touch:
+                    touch[0] = time.time()
+                    touch[1] += 1
+                else:
+                    self._pending_touches[(namespace, key)] = [time.time(), 1]
+                if len(self._pending_touches) >= self.TOUCH_FLUSH_SIZE:
+                    try:
+                        self._flush_touches()
+                        self._conn.commit()
+                    except sqlite3.Error as e:
+                        logger.error(f"写回缓存访问时间失败: {str(e)}")
+            return value
+
+        now = time.time()
+        stale_entry = None
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    'SELECT value, expires_at, stale_at, etag, last_modified, refresh '
+                    'FROM entries WHERE namespace = ? AND key = ?',
+                    (namespace, key)
+                ).fetchone()
+                if not row:
+                    self.disk_misses += 1
+                    return None
+
+                data, expires_at, stale_at, etag, last_modified, refresh = row
+                if expires_at is not None and expires_at <= now:
+                    self._delete(namespace, key)
+                    self._conn.commit()
+                    self.disk_misses += 1
+                    return None
+
+                self._conn.execute(
+                    'UPDATE entries SET last_access = ?, hits = hits + 1 WHERE namespace = ? AND key = ?',
+                    (now, namespace, key)
+                )
+                self._conn.commit()
+                self.disk_hits += 1
+
+                value = decode_value(data)
+                if value == _NOT_FOUND_VALUE:
+                    value = NOT_FOUND
+                    self._count_not_found(namespace, key)
+                if refresh and stale_at is not None and stale_at <= now:
+                    # 过期但在宽限期内：返回旧值，不放入内存层，下次读取仍会检查是否已重新验证
+                    self.stale_hits += 1
+                    stale_entry = {'etag': etag, 'last_modified': last_modified, 'refresh': json.loads(refresh)}
+                else:
+                    self.memory.set((namespace, key), value, len(data), stale_at if stale_at is not None else expires_at)
+            except (sqlite3.Error, ValueError) as e:
+                logger.error(f"读取缓存失败: {namespace}/{key}, 错误: {str(e)}")
+                return None
+
+        if stale_entry is not None and self.revalidator is not None:
+            try:
+                self.revalidator(namespace, key, stale_entry)
+            except Exception as e:
+                logger.error(f"提交缓存重新验证失败: {namespace}/{key}, 错误: {str(e)}")
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: int = None, validators: Dict = None):
+        """写入缓存，ttl为None时使用默认过期时间
+
+        validators为重新验证所需的信息：etag、last_modified和refresh（客户端重新请求的方式），
+        有refresh的条目过期后在宽限期内仍可读取。
+        """
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        stale_at = now + ttl if ttl else None
+        validators = validators or {}
+        refresh = validators.get('refresh')
+        expires_at = stale_at + self.stale_grace if stale_at is not None and refresh else stale_at
+
+        with self._lock:
+            try:
+                stored = _NOT_FOUND_VALUE if value is NOT_FOUND else value
+                data = encode_value(stored, self.compress_threshold)
+                size = len(data)
+                self._delete(namespace, key)
+                self._conn.execute(
+                    'INSERT INTO entries (namespace, key, value, size, created_at, expires_at, last_access, '
+                    'stale_at, etag, last_modified, refresh) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (namespace, key, data, size, now, expires_at, now, stale_at,
+                     validators.get('etag'), validators.get('last_modified'),
+                     json.dumps(refresh, ensure_ascii=False, separators=(',', ':')) if refresh else None)
+                )
+                self._entry_count += 1
+                self._total_bytes += size
+                self._evict()
+                self._conn.commit()
+                self.memory.set((namespace, key), value, size, stale_at)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                self._conn.rollback()
+                self._entry_count, self._total_bytes = self._conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+                ).fetchone()
+                logger.error(f"写入缓存失败: {namespace}/{key}, 错误: {str(e)}")
+
+    def extend(self, namespace: str, key: str, ttl: int = None) -> bool:
+        """重新验证确认内容未变化时延长条目的有效期，条目已不存在时返回False"""
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        stale_at = now + ttl if ttl else None
+        expires_at = stale_at + self.stale_grace if stale_at is not None else None
+        with self._lock:
+            try:
+                cursor = self._conn.execute(
+                    'UPDATE entries SET stale_at = ?, expires_at = ? WHERE namespace = ? AND key = ?',
+                    (stale_at, expires_at, namespace, key)
+                )
+                self._conn.commit()
+                return cursor.rowcount > 0
+            except sqlite3.Error as e:
+                logger.error(f"延长缓存有效期失败: {namespace}/{key}, 错误: {str(e)}")
+                return False
+
+    def set_not_found(self, namespace: str, key: str, ttl: int):
+        """写入否定缓存条目"""
+        self.set(namespace, key, NOT_FOUND, ttl=ttl)
+
+    def _count_not_found(self, namespace: str, key: str):
+        """按数据源和媒体类型（键前缀）统计否定缓存命中"""
+        media_type = key.split('_', 1)[0]
+        with self._lock:
+            counter_key = (namespace, media_type)
+            self.not_found_hits[counter_key] = self.not_found_hits.get(counter_key, 0) + 1
+
+    def delete(self, namespace: str, key: str):
+        """删除缓存条目"""
+        self.memory.delete((namespace, key))
+        with self._lock:
+            try:
+                self._delete(namespace, key)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"删除缓存失败: {namespace}/{key}, 错误: {str(e)}")
+
+    def _delete(self, namespace: str, key: str):
+        """删除条目并更新统计（调用方持有锁并负责提交）"""
+        row = self._conn.execute(
+            'SELECT size FROM entries WHERE namespace = ? AND key = ?', (namespace, key)
+        ).fetchone()
+        if row:
+            self._conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+            self._entry_count -= 1
+            self._total_bytes -= row[0]
+
+    def _evict(self):
+        """超出上限时按最近访问时间淘汰条目（调用方持有锁并负责提交）"""
+        if not self._over_limit():
+            return
+
+        self._flush_touches()
+        # 先清理已过期的条目
+        self._purge_expired()
+
+        evicted = 0
+        while self._over_limit():
+            rows = self._conn.execute(
+                'SELECT namespace, key, size FROM entries ORDER BY last_access LIMIT 100'
+            ).fetchall()
+            if not rows:
+                break
+            for namespace, key, size in rows:
+                self._conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+                self.memory.delete((namespace, key))
+                self._entry_count -= 1
+                self._total_bytes -= size
+                evicted += 1
+                if not self._over_limit():
+                    break
+
+        if evicted:
+            logger.info(f"缓存超出上限，淘汰了 {evicted} 个条目")
+
+    def _flush_touches(self):
+        """写回内存命中的访问时间（调用方持有锁并负责提交）"""
+        if not self._pending_touches:
+            return
+        self._conn.executemany(
+            'UPDATE entries SET last_access = ?, hits = hits + ? WHERE namespace = ? AND key = ?',
+            [(ts, hits, namespace, key) for (namespace, key), (ts, hits) in self._pending_touches.items()]
+        )
+        self._pending_touches.clear()
+
+    def _over_limit(self) -> bool:
+        return bool((self.max_entries and self._entry_count > self.max_entries) or
+                    (self.max_bytes and self._total_bytes > self.max_bytes))
+
+    def _purge_expired(self) -> int:
+        """删除已过期条目（调用方持有锁并负责提交）"""
+        now = time.time()
+        count, size = self._conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?',
+            (now,)
+        ).fetchone()
+        if count:
+            self._conn.execute('DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+            self._entry_count -= count
+            self._total_bytes -= size
+        return count
+
+    def purge_expired(self) -> int:
+        """清理已过期的条目，返回清理数量"""
+        with self._lock:
+            try:
+                count = self._purge_expired()
+                self._conn.commit()
+                if count:
+                    logger.info(f"清理了 {count} 个过期缓存条目")
+                return count
+            except sqlite3.Error as e:
+                logger.error(f"清理过期缓存失败: {str(e)}")
+                return 0
+
+    def migrate_json_files(self, json_dir: str = None) -> int:
+        """导入旧版每个键一个JSON文件的缓存，导入成功的文件会被删除
+
+        TMDB和豆瓣曾共用同一目录，movie_/tv_ 前缀的文件按内容区分来源。
+        迁移只执行一次，完成后在meta表中记录。
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'json_migrated'").fetchone()
+            if row:
+                return 0
+
+        json_dir = Path(json_dir) if json_dir else self.cache_dir
+        migrated = 0
+        if json_dir.exists():
+            for cache_file in json_dir.glob('*.json'):
+                namespace = self._detect_namespace(cache_file)
+                if not namespace:
+                    continue
+                try:
+                    with open(cache_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if namespace == 'auto':
+                        namespace = 'douban' if set(data) == self.DOUBAN_FIELDS else 'tmdb'
+                    self.set(namespace, cache_file.stem, data)
+                    cache_file.unlink()
+                    migrated += 1
+                except Exception as e:
+                    logger.error(f"迁移缓存文件失败: {cache_file}, 错误: {str(e)}")
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('json_migrated', ?)", (str(time.time()),)
+            )
+            self._conn.commit()
+
+        if migrated:
+            logger.info(f"已将 {migrated} 个JSON缓存文件迁移到 {self.db_path}")
+        return migrated
+
+    def migrate_keys(self, key_fn: Callable[[str], Optional[str]], marker: str) -> int:
+        """按key_fn重写所有键，合并映射到同一个键的条目，返回合并掉的条目数
+
+        key_fn返回None表示保留原键。同一新键的多个条目中优先保留有结果的条目，
+        其次保留最新写入的条目，命中次数累加。迁移按marker只执行一次。
+        """
+        with self._lock:
+            try:
+                if self._conn.execute('SELECT value FROM meta WHERE name = ?', (marker,)).fetchone():
+                    return 0
+                self._flush_touches()
+
+                groups: Dict[tuple, List[tuple]] = {}
+                for row in self._conn.execute(
+                        'SELECT namespace, key, value, size, created_at, expires_at, last_access, hits FROM entries'):
+                    new_key = key_fn(row[1])
+                    if new_key is None or new_key == row[1]:
+                        groups.setdefault((row[0], row[1]), []).append(row)
+                    else:
+                        groups.setdefault((row[0], new_key), []).append(row)
+
+                merged = 0
+                for (namespace, new_key), rows in groups.items():
+                    if len(rows) == 1 and rows[0][1] == new_key:
+                        continue
+                    # 有结果的条目优先于否定条目，其次是最新写入的条目
+                    rows.sort(key=lambda r: (decode_value(r[2]) != _NOT_FOUND_VALUE, r[4]), reverse=True)
+                    keep = rows[0]
+                    for row in rows:
+                        self._conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, row[1]))
+                    self._conn.execute(
+                        'INSERT INTO entries (namespace, key, value, size, created_at, expires_at, last_access, hits) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (namespace, new_key, keep[2], keep[3], keep[4], keep[5],
+                         max(r[6] for r in rows), sum(r[7] for r in rows))
+                    )
+                    merged += len(rows) - 1
+
+                self._conn.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (marker, str(time.time())))
+                self._conn.commit()
+            except (sqlite3.Error, ValueError) as e:
+                self._conn.rollback()
+                logger.error(f"迁移缓存键失败: {str(e)}")
+                return 0
+            finally:
+                self._entry_count, self._total_bytes = self._conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+                ).fetchone()
+
+        self.memory.clear()
+        if merged:
+            logger.info(f"缓存键已规范化，合并了 {merged} 个重复条目")
+        return merged
+
+    def migrate_encoding(self, batch_size: int = 1000) -> int:
+        """将旧版以TEXT保存的JSON值重新编码（必要时压缩），返回重新编码的条目数
+
+        新写入的值都已编码，迁移完成后在meta表中记录，之后不再扫描。
+        """
+        migrated = 0
+        with self._lock:
+            try:
+                if self._conn.execute("SELECT value FROM meta WHERE name = 'values_encoded'").fetchone():
+                    return 0
+                while True:
+                    rows = self._conn.execute(
+                        "SELECT namespace, key, value FROM entries WHERE typeof(value) = 'text' LIMIT ?",
+                        (batch_size,)
+                    ).fetchall()
+                    if not rows:
+                        break
+                    updates = []
+                    for namespace, key, value in rows:
+                        data = encode_value(json.loads(value), self.compress_threshold)
+                        updates.append((data, len(data), namespace, key))
+                    self._conn.executemany(
+                        'UPDATE entries SET value = ?, size = ? WHERE namespace = ? AND key = ?', updates
+                    )
+                    self._conn.commit()
+                    migrated += len(rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('values_encoded', ?)", (str(time.time()),)
+                )
+                self._conn.commit()
+            except (sqlite3.Error, ValueError) as e:
+                self._conn.rollback()
+                logger.error(f"重新编码缓存值失败: {str(e)}")
+            finally:
+                self._entry_count, self._total_bytes = self._conn.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries'
+                ).fetchone()
+
+        if migrated:
+            logger.info(f"已重新编码 {migrated} 个缓存条目，当前占用 {self._total_bytes} 字节")
+        return migrated
+
+    def get_hot_keys(self, limit: int = 10) -> List[Dict]:
+        """获取命中次数最多的键"""
+        with self._lock:
+            try:
+                self._flush_touches()
+                self._conn.commit()
+                rows = self._conn.execute(
+                    'SELECT namespace, key, hits FROM entries WHERE hits > 0 ORDER BY hits DESC LIMIT ?', (limit,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.error(f"读取缓存命中统计失败: {str(e)}")
+                return []
+        return [{'namespace': namespace, 'key': key, 'hits': hits} for namespace, key, hits in rows]
+
+    @staticmethod
+    def _detect_namespace(cache_file: Path) -> Optional[str]:
+        """根据文件名前缀判断缓存来源"""
+        name = cache_file.stem
+        if name.startswith('episode_'):
+            return 'tmdb'
+        if name.startswith('all_'):
+            return 'douban'
+        if name.startswith('movie_') or name.startswith('tv_'):
+            return 'auto'
+        return None
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            disk_total = self.disk_hits + self.disk_misses
+            stats = {
+                'entries': self._entry_count,
+                'bytes': self._total_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'stale_grace': self.stale_grace,
+                'stale_hits': self.stale_hits,
+                'namespaces': {},
+                'not_found_hits': {
+                    f"{namespace}:{media_type}": count
+                    for (namespace, media_type), count in self.not_found_hits.items()
+                },
+                'tiers': {
+                    'memory': self.memory.get_stats(),
+                    'disk': {
+                        'hits': self.disk_hits,
+                        'misses': self.disk_misses,
+                        'hit_ratio': round(self.disk_hits / disk_total, 4) if disk_total else 0.0
+                    }
+                }
+            }
+            try:
+                for namespace, count in self._conn.execute(
+                        'SELECT namespace, COUNT(*) FROM entries GROUP BY namespace'):
+                    stats['namespaces'][namespace] = count
+            except sqlite3.Error as e:
+                logger.error(f"读取缓存统计失败: {str(e)}")
+        stats['hot_keys'] = self.get_hot_keys()
+        return stats
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            try:
+                self._flush_touches()
+                self._conn.commit()
+                self._conn.close()
+            except sqlite3.Error:
+                pass
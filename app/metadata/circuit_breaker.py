@@ -0,0 +1,111 @@
+import time
+import logging
+import threading
+from typing import Dict
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.RequestException):
+    """熔断器打开时拒绝请求（客户端按请求失败处理，不等待超时）"""
+
+
+class CircuitBreaker:
+    """单个元数据源的熔断器（线程安全）
+
+    连续failure_threshold次请求失败后打开，之后的请求立即失败；
+    打开reset_timeout秒后进入半开状态，只放行一个探测请求：成功则关闭，失败则重新打开。
+    failure_threshold为0表示不熔断。
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        """初始化熔断器"""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """当前状态（打开超过reset_timeout秒时视为半开）"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return STATE_HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """是否放行请求，半开状态下同一时间只放行一个探测请求
+
+        探测请求被取消而没有结果时，reset_timeout秒后放行下一个探测请求。
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return True
+            now = time.monotonic()
+            if state == STATE_HALF_OPEN and (not self._probing or now - self._probe_started >= self.reset_timeout):
+                self._state = STATE_HALF_OPEN
+                self._probing = True
+                self._probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """不放行时抛出CircuitOpenError"""
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} 熔断器已打开，跳过请求")
+
+    def record_success(self):
+        """请求成功（数据源有响应），关闭熔断器"""
+        with self._lock:
+            if self._state != STATE_CLOSED:
+                logger.info(f"{self.name} 已恢复，熔断器关闭")
+            self._state = STATE_CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        """请求失败，连续失败达到阈值或半开探测失败时打开熔断器"""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == STATE_HALF_OPEN or (
+                    self._state == STATE_CLOSED and self.failure_threshold
+                    and self._failures >= self.failure_threshold):
+                if self._state == STATE_CLOSED:
+                    logger.warning(f"{self.name} 连续失败 {self._failures} 次，熔断器打开 {self.reset_timeout} 秒")
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+    def get_stats(self) -> Dict:
+        """获取熔断器状态"""
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.reset_timeout - (time.monotonic() - self._opened_at) if state == STATE_OPEN else 0
+            return {
+                'state': state,
+                'failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'retry_in': round(max(0.0, retry_in), 1)
+            }
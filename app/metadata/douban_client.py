@@ -1,9 +1,15 @@
 import os
-import json
 import logging
 import requests
-from typing import Dict, Optional
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Optional, Tuple
 from pathlib import Path
+from .cache_store import CacheStore, NOT_FOUND
+from .cache_keys import search_key
+from .memory_cache import MISSING
+from .rate_limiter import RateLimiter
+from .ranking import pick_best
+from .revalidator import RESULT_FAILED, RESULT_NOT_MODIFIED, RESULT_REFRESHED, conditional_headers, response_validators
 
 logger = logging.getLogger(__name__)
 
@@ -11,27 +17,49 @@ logger = logging.getLogger(__name__)
 class DoubanClient:
     """豆瓣API客户端"""
     
+    BASE_URL = 'https://movie.douban.com'
     SEARCH_URL = 'https://movie.douban.com/j/subject_suggest?q='
     DETAIL_URL = 'https://movie.douban.com/subject/'
+    CACHE_NAMESPACE = 'douban'
     
-    def __init__(self, cookies: str = None, cache_dir: str = './data/douban_cache'):
-        """初始化豆瓣客户端"""
+    def __init__(self, cookies: str = None, cache_dir: str = './data/douban_cache', cache_store: CacheStore = None,
+                 negative_ttl: int = 24 * 3600, rate_limiter: RateLimiter = None, base_url: str = None,
+                 pool_size: int = 10):
+        """初始化豆瓣客户端，base_url用于指向代理或本地替身服务，pool_size为会话中保持的连接数"""
         self.cookies = cookies or os.environ.get('DOUBAN_COOKIES')
+        self.set_base_url(base_url)
         
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
+        # 缓存存储（与TMDB客户端共用时由MetadataManager传入）
+        self._owns_cache_store = cache_store is None
+        self.cache_store = cache_store or CacheStore(cache_dir)
+        # 未找到结果的否定缓存过期时间
+        self.negative_ttl = negative_ttl
+        
+        # 限速和重试（与TMDB客户端共用时由MetadataManager传入）
+        self.rate_limiter = rate_limiter or RateLimiter()
+        
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'application/json, text/plain, */*',
             'Referer': 'https://movie.douban.com/'
         })
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
         
         # 设置cookies
         if self.cookies:
             self._set_cookies(self.cookies)
     
+    def set_base_url(self, base_url: str = None):
+        """设置网站地址，为空时使用官方地址"""
+        base_url = (base_url or DoubanClient.BASE_URL).rstrip('/')
+        self.SEARCH_URL = f"{base_url}/j/subject_suggest?q="
+        self.DETAIL_URL = f"{base_url}/subject/"
+    
     def _set_cookies(self, cookies_str: str):
         """设置cookies"""
         try:
@@ -49,49 +77,18 @@ class DoubanClient:
         except Exception as e:
             logger.error(f"设置Cookies失败: {str(e)}")
     
-    def search(self, title: str, media_type: str = None) -> Optional[Dict]:
-        """搜索电影或电视剧"""
+    def search(self, title: str, media_type: str = None, year: str = None) -> Optional[Dict]:
+        """搜索电影或电视剧，year用于在候选中选择最匹配的结果"""
         # 检查缓存
-        cache_key = f"{media_type or 'all'}_{title}"
-        cached = self._get_from_cache(cache_key)
-        if cached:
-            logger.debug(f"从缓存获取豆瓣信息: {title}")
+        cache_key, cached = self._get_search_cache(title, media_type, year)
+        if cached is not MISSING:
             return cached
         
         try:
-            # 发送搜索请求
-            response = self.session.get(f"{self.SEARCH_URL}{requests.utils.quote(title)}", timeout=10)
-            response.raise_for_status()
-            
-            results = response.json()
-            if not results:
-                logger.info(f"豆瓣未找到: {title}")
-                return None
-            
-            # 选择最匹配的结果
-            # 优先匹配类型
-            if media_type == 'movie':
-                target = next((r for r in results if r.get('type') == 'movie'), None)
-            elif media_type == 'tv':
-                target = next((r for r in results if r.get('type') == 'tv'), None)
-            else:
-                target = results[0]
-            
-            if target:
-                # 获取详细信息（简化版）
-                # 注意：完整的豆瓣API需要认证，这里只返回搜索结果中的信息
-                metadata = {
-                    'title': target.get('title', title),
-                    'original_title': target.get('original_title', ''),
-                    'year': target.get('year', ''),
-                    'type': target.get('type', 'unknown'),
-                    'id': target.get('id', ''),
-                    'cover': target.get('img', '')
-                }
-                
-                # 保存到缓存
-                self._save_to_cache(cache_key, metadata)
-                return metadata
+            response = self._send_search(title)
+            validators = self._validators(title, media_type, year)
+            validators.update(response_validators(response))
+            return self._handle_search_results(cache_key, title, media_type, response.json(), validators, year)
             
         except requests.RequestException as e:
             logger.error(f"豆瓣搜索失败: {title}, 错误: {str(e)}")
@@ -100,26 +97,104 @@ class DoubanClient:
         
         return None
     
-    def _get_from_cache(self, key: str) -> Optional[Dict]:
-        """从缓存获取数据"""
+    def _send_search(self, title: str, headers: Dict = None):
+        """发送搜索请求（限速并重试），headers为条件请求头"""
+        def send():
+            response = self.session.get(self._search_url(title), headers=headers, timeout=10)
+            response.raise_for_status()
+            return response
+        
+        return self.rate_limiter.request(self.CACHE_NAMESPACE, send)
+    
+    def _search_url(self, title: str) -> str:
+        """搜索请求URL"""
+        return f"{self.SEARCH_URL}{requests.utils.quote(title)}"
+    
+    def _validators(self, title: str, media_type: str = None, year: str = None) -> Dict:
+        """缓存条目的重新验证信息（同步和异步客户端共用）"""
+        return {'refresh': {'kind': 'search', 'title': title, 'media_type': media_type, 'year': year}}
+    
+    def revalidate(self, cache_key: str, entry: Dict) -> str:
+        """重新验证过期的搜索缓存（在后台线程中执行），返回304时延长有效期"""
+        refresh = entry['refresh']
+        title = refresh['title']
         try:
-            cache_file = self.cache_dir / f"{key.replace('/', '_')}.json"
-            if cache_file.exists():
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            response = self._send_search(title, conditional_headers(entry))
+            if response.status_code == 304:
+                self.cache_store.extend(self.CACHE_NAMESPACE, cache_key)
+                return RESULT_NOT_MODIFIED
+            validators = self._validators(title, refresh.get('media_type'), refresh.get('year'))
+            validators.update(response_validators(response))
+            self._handle_search_results(cache_key, title, refresh.get('media_type'), response.json(), validators,
+                                        refresh.get('year'))
+            return RESULT_REFRESHED
         except Exception as e:
-            logger.error(f"读取豆瓣缓存失败: {key}, 错误: {str(e)}")
+            logger.error(f"豆瓣重新验证失败: {title}, 错误: {str(e)}")
+            return RESULT_FAILED
+    
+    def _get_search_cache(self, title: str, media_type: str = None, year: str = None) -> Tuple[str, Any]:
+        """返回搜索的缓存键和缓存结果（未命中为MISSING，否定缓存为None）"""
+        cache_key = search_key(media_type or 'all', title, year)
+        cached = self._get_from_cache(cache_key)
+        if cached is NOT_FOUND:
+            logger.debug(f"缓存记录豆瓣未找到: {title}")
+            return cache_key, None
+        if cached:
+            logger.debug(f"从缓存获取豆瓣信息: {title}")
+            return cache_key, cached
+        return cache_key, MISSING
+    
+    def _handle_search_results(self, cache_key: str, title: str, media_type: str, results,
+                               validators: Dict = None, year: str = None) -> Optional[Dict]:
+        """从搜索结果中选择条目并缓存（同步和异步客户端共用）"""
+        if not results:
+            logger.info(f"豆瓣未找到: {title}")
+            self._save_not_found(cache_key)
+            return None
+        
+        # 指定类型时只考虑该类型的条目，再按标题和年份选择最匹配的结果
+        rank_type = media_type if media_type in ('movie', 'tv') else None
+        if rank_type:
+            results = [r for r in results if r.get('type') == rank_type]
+        target, score = pick_best(results, title, year, rank_type)
+        
+        if target:
+            # 获取详细信息（简化版）
+            # 注意：完整的豆瓣API需要认证，这里只返回搜索结果中的信息
+            metadata = {
+                'title': target.get('title', title),
+                'original_title': target.get('original_title') or target.get('sub_title', ''),
+                'year': target.get('year', ''),
+                'type': target.get('type', 'unknown'),
+                'id': target.get('id', ''),
+                'cover': target.get('img', ''),
+                'match_confidence': round(score, 3)
+            }
+            
+            # 保存到缓存
+            self._save_to_cache(cache_key, metadata, validators=validators)
+            return metadata
+        
+        # 有结果但没有匹配类型的条目
+        logger.info(f"豆瓣未找到{media_type}类型的结果: {title}")
+        self._save_not_found(cache_key)
         return None
     
-    def _save_to_cache(self, key: str, data: Dict):
+    def _get_from_cache(self, key: str) -> Optional[Dict]:
+        """从缓存获取数据"""
+        return self.cache_store.get(self.CACHE_NAMESPACE, key)
+    
+    def _save_to_cache(self, key: str, data: Dict, ttl: int = None, validators: Dict = None):
         """保存数据到缓存"""
-        try:
-            cache_file = self.cache_dir / f"{key.replace('/', '_')}.json"
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存豆瓣缓存失败: {key}, 错误: {str(e)}")
+        self.cache_store.set(self.CACHE_NAMESPACE, key, data, ttl=ttl, validators=validators)
+    
+    def _save_not_found(self, key: str):
+        """记录未找到结果的否定缓存"""
+        if self.negative_ttl:
+            self.cache_store.set_not_found(self.CACHE_NAMESPACE, key, self.negative_ttl)
     
     def close(self):
         """关闭会话"""
-        self.session.close()
\ No newline at end of file
+        self.session.close()
+        if self._owns_cache_store:
+            self.cache_store.close()
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows上没有fcntl，只支持单实例
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class IdIndex:
+    """追加写入的标题索引（分类 -> 标题 -> 值）
+
+    每次更新只在日志文件末尾追加一行JSON，读取使用启动时加载的内存视图。
+    崩溃时最多丢失最后一行不完整的记录（加载时截掉）。日志中的过期记录
+    超过一定比例时重写为紧凑文件（先写临时文件再原子替换）。
+    多个实例共用同一文件时，追加和压缩都持有文件锁，压缩前重新读取日志，
+    保留其他实例追加的记录。
+    """
+
+    def __init__(self, index_file: str, legacy_file: str = None,
+                 compact_ratio: float = 2.0, min_compact_lines: int = 1000):
+        """初始化索引，legacy_file为旧版整体JSON文件（首次加载时导入）"""
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+        self.compact_ratio = compact_ratio
+        self.min_compact_lines = min_compact_lines
+
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._line_count = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._lock_file = Path(f"{self.index_file}.lock")
+
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        """多实例间的文件锁（不支持时只有进程内的锁）"""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_file, 'a') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _load(self):
+        """加载日志文件到内存"""
+        if not self.index_file.exists():
+            self._import_legacy()
+            return
+
+        with self._file_lock():
+            self._entries, self._line_count = self._read_log()
+
+    def _read_log(self) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """读取日志文件（调用方持有文件锁），返回 (记录, 行数)
+
+        崩溃时写了一半的最后一行会被截掉，否则下一次追加会接在它后面，使新记录无法解析。
+        """
+        entries: Dict[str, Dict[str, Any]] = {}
+        if not self.index_file.exists():
+            return entries, 0
+
+        data = self.index_file.read_bytes()
+        if data and not data.endswith(b'\n'):
+            end = data.rfind(b'\n') + 1
+            with open(self.index_file, 'r+b') as f:
+                f.truncate(end)
+            data = data[:end]
+            logger.warning(f"索引文件末尾有不完整的记录，已截掉: {self.index_file}")
+
+        line_count = skipped = 0
+        for line in data.decode('utf-8', errors='replace').splitlines():
+            try:
+                record = json.loads(line)
+                entries.setdefault(record['c'], {})[record['k']] = record['v']
+                line_count += 1
+            except (ValueError, KeyError, TypeError):
+                skipped += 1
+
+        if skipped:
+            logger.warning(f"索引文件中有 {skipped} 行无法解析，已跳过: {self.index_file}")
+        return entries, line_count
+
+    def _import_legacy(self):
+        """导入旧版整体JSON文件并写成紧凑日志"""
+        if not self.legacy_file or not self.legacy_file.exists():
+            return
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for category, items in data.items():
+                if isinstance(items, dict):
+                    self._entries.setdefault(category, {}).update(items)
+            self._rewrite()
+            logger.info(f"已从 {self.legacy_file} 导入 {len(self)} 条索引记录")
+        except Exception as e:
+            logger.error(f"导入旧版索引失败: {self.legacy_file}, 错误: {str(e)}")
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._entries.values())
+
+    def get(self, category: str, key: str) -> Optional[Any]:
+        """读取索引值"""
+        items = self._entries.get(category)
+        return items.get(key) if items else None
+
+    def set(self, category: str, key: str, value: Any):
+        """更新索引值（值未变化时不写入）"""
+        with self._lock:
+            items = self._entries.setdefault(category, {})
+            if items.get(key) == value:
+                return
+            items[key] = value
+
+            try:
+                line = json.dumps({'c': category, 'k': key, 'v': value}, ensure_ascii=False)
+                self._append(line + '\n')
+                self._line_count += 1
+                if self._line_count >= self.min_compact_lines and \
+                        self._line_count > self.compact_ratio * len(self):
+                    self._rewrite()
+            except Exception as e:
+                logger.error(f"写入索引失败: {category}/{key}, 错误: {str(e)}")
+
+    def _append(self, line: str):
+        """追加一行（文件被其他实例压缩替换后重新打开）"""
+        with self._file_lock():
+            self._write_line(line)
+
+    def _write_line(self, line: str):
+        """追加一行（调用方持有文件锁）"""
+        if self._file is not None:
+            try:
+                if os.fstat(self._file.fileno()).st_ino != os.stat(self.index_file).st_ino:
+                    self._file.close()
+                    self._file = None
+            except OSError:
+                self._file.close()
+                self._file = None
+        if self._file is None:
+            self._file = open(self.index_file, 'a', encoding='utf-8')
+        self._file.write(line)
+        self._file.flush()
+
+    def _rewrite(self):
+        """将日志重写为紧凑文件（调用方持有锁或在初始化中）
+
+        持有文件锁重新读取日志并合并到内存视图，其他实例在本实例加载后追加的记录不会丢失。
+        """
+        with self._file_lock():
+            entries, _ = self._read_log()
+            for category, items in entries.items():
+                self._entries.setdefault(category, {}).update(items)
+            self._write_compact()
+
+    def _write_compact(self):
+        """将内存视图写入临时文件并原子替换日志文件（调用方持有文件锁）"""
+        temp_file = self.index_file.with_suffix('.tmp')
+        line_count = 0
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            for category, items in self._entries.items():
+                for key, value in items.items():
+                    f.write(json.dumps({'c': category, 'k': key, 'v': value}, ensure_ascii=False) + '\n')
+                    line_count += 1
+            f.flush()
+            os.fsync(f.fileno())
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(temp_file, self.index_file)
+        self._line_count = line_count
+        logger.debug(f"索引文件已压缩: {self.index_file}, 记录数: {line_count}")
+
+    def compact(self):
+        """立即压缩日志文件"""
+        with self._lock:
+            try:
+                self._rewrite()
+            except Exception as e:
+                logger.error(f"压缩索引失败: {self.index_file}, 错误: {str(e)}")
+
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,102 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# 未命中标记（缓存值本身可能是None）
+MISSING = object()
+
+
+class MemoryCache:
+    """进程内LRU缓存
+
+    保存已解析的条目，可按条目数或估算字节数限制容量。返回的是缓存中的同一对象，
+    调用方不应修改。
+    """
+
+    def __init__(self, max_entries: int = 2000, max_bytes: int = 0):
+        """初始化内存缓存，max_entries/max_bytes为0表示不限制该项"""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # 键 -> (值, 过期时间, 估算字节数)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_entries or self.max_bytes)
+
+    def get(self, key: Hashable) -> Any:
+        """读取条目，未命中或已过期时返回MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+
+            value, expires_at, size = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: int, expires_at: Optional[float] = None):
+        """写入条目，size为估算的字节数"""
+        if not self.enabled:
+            return
+        # 单个条目超过字节上限时不缓存
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+
+            while self._entries and (
+                    (self.max_entries and len(self._entries) > self.max_entries) or
+                    (self.max_bytes and self._bytes > self.max_bytes)):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """删除条目"""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict:
+        """获取命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
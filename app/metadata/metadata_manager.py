@@ -1,8 +1,25 @@
 import json
+import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed, wait
+from functools import partial
+from typing import Callable, Dict, Any, Iterable, List, Optional, Union
 from pathlib import Path
 
+from .cache_store import CacheStore
+from .cache_keys import canonical_title, canonicalize_key
+from .single_flight import SingleFlight
+from .rate_limiter import RateLimiter
+from .circuit_breaker import CircuitBreaker
+from .metrics import LatencyTracker
+from .offline_index import OfflineIndex
+from .alias_index import AliasIndex
+from .revalidator import Revalidator
+from .memory_cache import MISSING
+from .async_client import ASYNC_HTTP_AVAILABLE, AsyncHTTPPool, AsyncTMDBClient, AsyncDoubanClient
+
 try:
     from .tmdb_client import TMDBClient
     from .douban_client import DoubanClient
@@ -10,7 +27,7 @@ except ImportError as e:
     logging.warning(f"Warning: Failed to import metadata clients: {str(e)}")
     # 创建空的类以避免导入错误
     class TMDBClient:
-        def __init__(self, api_key='', cache_dir=None):
+        def __init__(self, api_key='', cache_dir=None, **kwargs):
             self.api_key = api_key
             self.cache_dir = cache_dir
         def search_movie(self, *args, **kwargs):
@@ -21,7 +38,7 @@ except ImportError as e:
             pass
     
     class DoubanClient:
-        def __init__(self, cookies='', cache_dir=None):
+        def __init__(self, cookies='', cache_dir=None, **kwargs):
             self.cookies = cookies
             self.cache_dir = cache_dir
         def search(self, *args, **kwargs):
@@ -33,62 +50,173 @@ logger = logging.getLogger(__name__)
 
 
 class MetadataManager:
-    """元数据管理器，整合多个元数据源"""
+    """元数据管理器，整合多个元数据源
+
+    每个进程只创建一个，由PlexRenameApp注入Web路由、文件监控和命令行共用，
+    客户端的HTTP连接池和缓存在所有请求间复用；配置变化通过update_config应用，不需要重新创建。
+    """
     
     def __init__(self, config: Dict):
         """初始化元数据管理器"""
+        cache_dir = config.get('cache_dir', './data')
+        
+        # 初始化两个客户端共用的缓存存储，并迁移旧版JSON缓存文件
+        self.cache_store = CacheStore(
+            cache_dir=cache_dir,
+            default_ttl=config.get('cache_ttl', 30 * 24 * 3600),
+            max_entries=config.get('cache_max_entries', 0),
+            max_bytes=config.get('cache_max_bytes', 0),
+            memory_entries=config.get('memory_cache_entries', 2000),
+            memory_bytes=config.get('memory_cache_bytes', 0),
+            stale_grace=config.get('cache_stale_grace', 0),
+            compress_threshold=config.get('cache_compress_threshold', 1024)
+        )
+        self.cache_store.migrate_json_files()
+        # 旧版缓存键按原始标题生成，规范化后合并重复条目
+        self.cache_store.migrate_keys(canonicalize_key, 'keys_canonical')
+        # 旧版以文本保存的值重新编码并压缩
+        self.cache_store.migrate_encoding()
+        
+        # 每个来源一个熔断器：数据源不可用时直接跳过，定期放行探测请求
+        self.circuit_breakers = {
+            source: CircuitBreaker(
+                source,
+                failure_threshold=config.get('circuit_failure_threshold', 5),
+                reset_timeout=config.get('circuit_reset_timeout', 60.0)
+            )
+            for source in ('tmdb', 'douban')
+        }
+        
+        # 两个客户端共用的限速器：按来源限速，限流和临时错误时退避重试
+        self.rate_limiter = RateLimiter(
+            rates=config.get('rate_limits', {}),
+            max_retries=config.get('max_retries', 3),
+            base_delay=config.get('retry_base_delay', 1.0),
+            max_delay=config.get('retry_max_delay', 60.0),
+            breakers=self.circuit_breakers
+        )
+        
         # 初始化TMDB客户端
         tmdb_api_key = config.get('tmdb_api_key') or config.get('TMDB_API_KEY')
         self.tmdb_client = TMDBClient(
             api_key=tmdb_api_key,
-            cache_dir=config.get('cache_dir', './data/tmdb_cache')
+            cache_dir=cache_dir,
+            language=config.get('tmdb_language', 'zh-CN'),
+            cache_store=self.cache_store,
+            negative_ttl=config.get('negative_cache_ttl', 24 * 3600),
+            rate_limiter=self.rate_limiter,
+            lean=config.get('tmdb_lean_mode', True),
+            append_to_response=config.get('tmdb_append_to_response', ''),
+            base_url=config.get('tmdb_base_url') or None,
+            pool_size=config.get('http_per_host_limit', 20)
         )
         
         # 初始化豆瓣客户端
         douban_cookies = config.get('douban_cookies') or config.get('DOUBAN_COOKIES')
         self.douban_client = DoubanClient(
             cookies=douban_cookies,
-            cache_dir=config.get('cache_dir', './data/douban_cache')
+            cache_dir=cache_dir,
+            cache_store=self.cache_store,
+            negative_ttl=config.get('negative_cache_ttl', 24 * 3600),
+            rate_limiter=self.rate_limiter,
+            base_url=config.get('douban_base_url') or None,
+            pool_size=config.get('http_per_host_limit', 20)
         )
         
+        # 过期条目在后台重新验证，读取方直接使用旧值，不等待请求
+        self.revalidator = Revalidator(max_workers=config.get('revalidate_workers', 2))
+        for client in (self.tmdb_client, self.douban_client):
+            if hasattr(client, 'revalidate'):
+                self.revalidator.register(client.CACHE_NAMESPACE, client.revalidate)
+        self.cache_store.revalidator = self._revalidate
+        
         # 配置回退策略
         self.fallback_enabled = config.get('fallback_enabled', True)
+        
+        # 搜索结果匹配得分低于此值时标记为需要人工确认（0为不标记）
+        self.match_confidence_threshold = config.get('match_confidence_threshold', 0.5)
+        
+        # TMDB导出文件的本地标题索引（导入过导出文件后才存在）；离线模式下不发送任何网络请求
+        self.offline_index_path = config.get('offline_index_path') or str(Path(cache_dir) / 'tmdb_offline_index.db')
+        self.offline_index = OfflineIndex(self.offline_index_path) if Path(self.offline_index_path).exists() else None
+        self.offline_mode = config.get('offline_mode', False)
+        
+        # 从查询结果中学到的标题别名（中文标题、原名 -> TMDB ID）
+        self.alias_index = AliasIndex(Path(cache_dir) / 'title_aliases.jsonl')
+        
+        # 合并并发的相同查询
+        self._single_flight = SingleFlight()
+        
+        # 查询策略：sequential（TMDB失败后再查豆瓣）、parallel（同时查询）、
+        # hedged（TMDB超过hedge_delay秒未返回时开始查询豆瓣）
+        self.lookup_strategy = config.get('lookup_strategy', 'sequential')
+        self.hedge_delay = config.get('hedge_delay', 1.0)
+        self.lookup_deadline = config.get('lookup_deadline', 10.0)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.latency = LatencyTracker()
+        self._lookup_counts = {'hedged': 0, 'tmdb': 0, 'douban': 0}
+        
+        # 批量异步查询的并发数和连接池配置
+        self.async_concurrency = config.get('async_concurrency', 50)
+        self.http_pool_size = config.get('http_pool_size', 100)
+        self.http_per_host_limit = config.get('http_per_host_limit', 20)
     
-    def get_metadata(self, title: str, media_type: str = None, year: str = None) -> Optional[Dict]:
-        """获取元数据，支持回退机制"""
+    def get_metadata(self, title: str, media_type: str = None, year: str = None,
+                     language: str = None) -> Optional[Dict]:
+        """获取元数据，支持回退机制
+
+        media_type已知时（来自文件名或目录配置）只查询该类型；language为TMDB查询语言，
+        未指定时使用配置的默认语言。
+        """
         if not title:
             return None
         
-        # 标准化媒体类型
-        if media_type == 'tv' or media_type == '电视剧':
-            media_type = 'tv'
-        elif media_type == 'movie' or media_type == '电影':
-            media_type = 'movie'
-        else:
+        media_type = self._normalize_media_type(media_type)
+        if not media_type:
             # 未知类型，先尝试电影再尝试电视剧
-            metadata = self._try_get_metadata(title, 'movie', year)
+            metadata = self._try_get_metadata(title, 'movie', year, language)
             if not metadata and self.fallback_enabled:
-                metadata = self._try_get_metadata(title, 'tv', year)
+                metadata = self._try_get_metadata(title, 'tv', year, language)
             return metadata
         
         # 已知类型
-        return self._try_get_metadata(title, media_type, year)
+        return self._try_get_metadata(title, media_type, year, language)
+    
+    @staticmethod
+    def _normalize_media_type(media_type: str = None) -> Optional[str]:
+        """标准化媒体类型，未知类型返回None"""
+        if media_type == 'tv' or media_type == '电视剧':
+            return 'tv'
+        if media_type == 'movie' or media_type == '电影':
+            return 'movie'
+        return None
     
-    def _try_get_metadata(self, title: str, media_type: str, year: str = None) -> Optional[Dict]:
-        """尝试从多个源获取元数据"""
+    def _try_get_metadata(self, title: str, media_type: str, year: str = None,
+                          language: str = None) -> Optional[Dict]:
+        """尝试从多个源获取元数据，并发的相同查询只执行一次"""
+        key = (title.strip(), media_type, str(year) if year else None, language)
+        return self._single_flight.do(key, self._lookup_metadata, title, media_type, year, language)
+    
+    def _lookup_metadata(self, title: str, media_type: str, year: str = None,
+                         language: str = None) -> Optional[Dict]:
+        """按查询策略从TMDB和豆瓣获取元数据"""
         logger.info(f"获取元数据: {title} ({media_type}, {year})")
         
-        # 首先尝试TMDB
-        metadata = self._get_from_tmdb(title, media_type, year)
-        
-        # 如果TMDB失败且启用了回退，尝试豆瓣
-        if not metadata and self.fallback_enabled:
-            logger.info(f"TMDB失败，尝试豆瓣: {title}")
-            metadata = self._get_from_douban(title, media_type)
+        if self.fallback_enabled and self.lookup_strategy in ('parallel', 'hedged'):
+            metadata = self._lookup_concurrent(title, media_type, year, language)
+        else:
+            # 首先尝试TMDB
+            metadata = self._timed('tmdb', self._get_from_tmdb, title, media_type, year, language)
             
-            # 如果从豆瓣获取到数据，尝试映射到标准格式
-            if metadata:
-                metadata = self._map_douban_to_standard(metadata)
+            # 如果TMDB失败且启用了回退，尝试豆瓣
+            if not metadata and self.fallback_enabled:
+                logger.info(f"TMDB失败，尝试豆瓣: {title}")
+                metadata = self._timed('douban', self._get_from_douban, title, media_type, year)
+                
+                # 如果从豆瓣获取到数据，尝试映射到标准格式
+                if metadata:
+                    metadata = self._resolve_douban_result(title, media_type, year, language, metadata)
         
         if metadata:
             logger.info(f"成功获取元数据: {title}")
@@ -97,44 +225,224 @@ class MetadataManager:
         
         return metadata
     
-    def _get_from_tmdb(self, title: str, media_type: str, year: str = None) -> Optional[Dict]:
-        """从TMDB获取元数据"""
+    def _lookup_concurrent(self, title: str, media_type: str, year: str = None,
+                           language: str = None) -> Optional[Dict]:
+        """同时（或延迟hedge_delay秒后）查询两个源
+
+        截止时间内TMDB返回结果时优先使用TMDB；TMDB失败或超时则使用先返回结果的源。
+        未开始的查询会被取消，已发出的请求无法中断，其结果被忽略（仍会写入缓存）。
+        """
+        executor = self._get_executor()
+        deadline = time.monotonic() + self.lookup_deadline
+        futures = {
+            executor.submit(self._timed, 'tmdb', self._get_from_tmdb, title, media_type, year, language): 'tmdb'
+        }
+        tmdb_future = next(iter(futures))
+        
+        if self.lookup_strategy == 'hedged':
+            wait([tmdb_future], timeout=self.hedge_delay)
+        if not (tmdb_future.done() and tmdb_future.result()):
+            if self.lookup_strategy == 'hedged':
+                logger.info(f"TMDB未在{self.hedge_delay}秒内返回，同时查询豆瓣: {title}")
+                self._count_lookup('hedged')
+            futures[executor.submit(self._timed, 'douban', self._get_from_douban, title, media_type, year)] = 'douban'
+        
+        # 截止时间内优先等待TMDB
         try:
-            if media_type == 'movie':
-                result = self.tmdb_client.search_movie(title, year)
-                if result:
-                    return {
-                        'title': result.get('title') or result.get('original_title', title),
-                        'original_title': result.get('original_title', ''),
-                        'year': str(result.get('release_date', '')).split('-')[0] if result.get('release_date') else year,
-                        'type': 'movie',
-                        'tmdb_id': result.get('id'),
-                        'overview': result.get('overview', ''),
-                        'poster': f"https://image.tmdb.org/t/p/w500{result.get('poster_path', '')}" if result.get('poster_path') else ''
-                    }
-            
-            elif media_type == 'tv':
-                result = self.tmdb_client.search_tv(title, year)
-                if result:
-                    return {
-                        'title': result.get('name') or result.get('original_name', title),
-                        'original_title': result.get('original_name', ''),
-                        'year': str(result.get('first_air_date', '')).split('-')[0] if result.get('first_air_date') else year,
-                        'type': 'tv',
-                        'tmdb_id': result.get('id'),
-                        'overview': result.get('overview', ''),
-                        'poster': f"https://image.tmdb.org/t/p/w500{result.get('poster_path', '')}" if result.get('poster_path') else ''
-                    }
+            metadata = tmdb_future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logger.info(f"TMDB在截止时间内未返回: {title}")
+            metadata = None
+        if metadata:
+            return self._finish_concurrent(futures, tmdb_future, metadata)
+        
+        # TMDB失败或超时，使用先返回结果的源
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                if futures[future] == 'douban':
+                    result = self._resolve_douban_result(title, media_type, year, language, result)
+                return self._finish_concurrent(futures, future, result)
+        return None
+    
+    def _finish_concurrent(self, futures: Dict, winner, metadata: Dict) -> Dict:
+        """记录胜出的源并取消其余查询"""
+        self._count_lookup(futures[winner])
+        for future in futures:
+            if future is not winner:
+                future.cancel()
+        return metadata
+    
+    def _count_lookup(self, name: str):
+        """累加并发查询统计"""
+        with self._executor_lock:
+            self._lookup_counts[name] += 1
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取并发查询使用的线程池"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(thread_name_prefix='metadata-lookup')
+            return self._executor
+    
+    def _timed(self, source: str, fn, *args):
+        """执行查询并记录该源的耗时"""
+        start = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            self.latency.record(source, time.monotonic() - start)
+    
+    def _get_from_tmdb(self, title: str, media_type: str, year: str = None,
+                       language: str = None) -> Optional[Dict]:
+        """从TMDB获取元数据，本地索引能确定TMDB ID时直接获取详情"""
+        try:
+            offline = self._lookup_offline(title, media_type, year)
+            if self.offline_mode:
+                # 离线模式：先使用缓存的搜索结果，其次使用本地索引
+                result = self._get_cached_tmdb_search(title, media_type, year, language)
+                if not result and offline:
+                    result = self._offline_result(offline, media_type)
+            else:
+                tmdb_id = offline['id'] if offline else self._lookup_alias(title, media_type, year)
+                result = self.tmdb_client.get_details(media_type, tmdb_id, language) if tmdb_id else None
+                if result is None and media_type == 'movie':
+                    result = self.tmdb_client.search_movie(title, year, language=language)
+                elif result is None and media_type == 'tv':
+                    result = self.tmdb_client.search_tv(title, year, language=language)
+            if result:
+                return self._learn_original_title(title, media_type, year,
+                                                  self._map_tmdb_to_standard(result, media_type, title, year))
         
         except Exception as e:
             logger.error(f"TMDB获取元数据失败: {title}, 错误: {str(e)}")
         
         return None
     
-    def _get_from_douban(self, title: str, media_type: str) -> Optional[Dict]:
+    def _lookup_alias(self, title: str, media_type: str, year: str = None) -> Optional[int]:
+        """在学到的标题别名中查找TMDB ID"""
+        if media_type not in ('movie', 'tv'):
+            return None
+        tmdb_id = self.alias_index.lookup(media_type, title, year)
+        if tmdb_id:
+            logger.debug(f"标题别名命中: {title} -> {tmdb_id}")
+        return tmdb_id
+    
+    def _learn_alias(self, media_type: str, year: str, metadata: Dict, titles: Iterable[str]) -> Dict:
+        """记录titles到TMDB结果ID的别名（匹配置信度低的结果不记录）"""
+        if metadata.get('tmdb_id') and not metadata.get('low_confidence'):
+            self.alias_index.learn(media_type, metadata['tmdb_id'], titles, metadata.get('year') or year)
+        return metadata
+    
+    def _learn_original_title(self, title: str, media_type: str, year: str, metadata: Dict) -> Dict:
+        """TMDB直接找到结果时记录原名（与查询标题相同时由搜索缓存覆盖，不记录）"""
+        original = metadata.get('original_title')
+        if original and canonical_title(original) != canonical_title(title):
+            self._learn_alias(media_type, year, metadata, [original])
+        return metadata
+    
+    def _douban_original_title(self, title: str, media_type: str, douban_data: Dict) -> Optional[str]:
+        """豆瓣结果的原名与查询标题不同时返回原名，用于在TMDB中再次搜索"""
+        original = douban_data.get('original_title')
+        if media_type not in ('movie', 'tv') or not original or canonical_title(original) == canonical_title(title):
+            return None
+        return original
+    
+    def _resolve_douban_result(self, title: str, media_type: str, year: str, language: str,
+                               douban_data: Dict) -> Dict:
+        """TMDB搜索失败而豆瓣找到时，用豆瓣的原名搜索TMDB并记录别名，找不到时使用豆瓣结果"""
+        original = self._douban_original_title(title, media_type, douban_data)
+        if original and not self.offline_mode:
+            try:
+                search = self.tmdb_client.search_movie if media_type == 'movie' else self.tmdb_client.search_tv
+                result = search(original, douban_data.get('year') or year, language=language)
+                if result:
+                    metadata = self._map_tmdb_to_standard(result, media_type, original, year)
+                    if not metadata.get('low_confidence'):
+                        logger.info(f"通过豆瓣原名找到TMDB条目: {title} -> {original} -> {metadata['tmdb_id']}")
+                        return self._learn_alias(media_type, year, metadata, [title, original])
+            except Exception as e:
+                logger.error(f"按原名搜索TMDB失败: {original}, 错误: {str(e)}")
+        return self._map_douban_to_standard(douban_data)
+    
+    def _lookup_offline(self, title: str, media_type: str, year: str = None) -> Optional[Dict]:
+        """在本地索引中查找标题
+
+        离线模式下接受前缀和模糊匹配；联网时只使用唯一的精确匹配，其他情况仍然搜索。
+        """
+        if self.offline_index is None or media_type not in ('movie', 'tv'):
+            return None
+        try:
+            match = self.offline_index.lookup(title, media_type, year, fuzzy=self.offline_mode)
+        except Exception as e:
+            logger.error(f"本地索引查找失败: {title}, 错误: {str(e)}")
+            return None
+        if match and (self.offline_mode or (match['match'] == 'exact' and not match['ambiguous'])):
+            logger.debug(f"本地索引命中: {title} -> {match['id']} ({match['match']})")
+            return match
+        return None
+    
+    def _get_cached_tmdb_search(self, title: str, media_type: str, year: str = None,
+                                language: str = None) -> Optional[Dict]:
+        """只从缓存读取TMDB搜索结果，不发送请求"""
+        if not hasattr(self.tmdb_client, '_get_search_cache') or media_type not in ('movie', 'tv'):
+            return None
+        _, cached = self.tmdb_client._get_search_cache(media_type, title, year, language)
+        return cached if cached is not MISSING else None
+    
+    def _offline_result(self, match: Dict, media_type: str) -> Dict:
+        """将本地索引条目转换为TMDB结果格式（只有原始标题和年份）"""
+        if media_type == 'movie':
+            return {'id': match['id'], 'original_title': match['title'], 'release_date': match['year']}
+        return {'id': match['id'], 'original_name': match['title'], 'first_air_date': match['year']}
+    
+    def import_offline_dumps(self, dump_files: List[str], progress=None) -> int:
+        """导入TMDB每日ID导出文件到本地索引，返回导入的条目总数"""
+        if self.offline_index is None:
+            self.offline_index = OfflineIndex(self.offline_index_path)
+        total = 0
+        for dump_file in dump_files:
+            total += self.offline_index.import_dump(dump_file, progress=progress)
+        return total
+    
+    def _map_tmdb_to_standard(self, result: Dict, media_type: str, title: str, year: str = None) -> Dict:
+        """将TMDB数据映射到标准格式"""
+        poster = f"https://image.tmdb.org/t/p/w500{result.get('poster_path', '')}" if result.get('poster_path') else ''
+        if media_type == 'movie':
+            return self._apply_confidence(result, {
+                'title': result.get('title') or result.get('original_title', title),
+                'original_title': result.get('original_title', ''),
+                'year': str(result.get('release_date', '')).split('-')[0] if result.get('release_date') else year,
+                'type': 'movie',
+                'tmdb_id': result.get('id'),
+                'overview': result.get('overview', ''),
+                'poster': poster
+            })
+        return self._apply_confidence(result, {
+            'title': result.get('name') or result.get('original_name', title),
+            'original_title': result.get('original_name', ''),
+            'year': str(result.get('first_air_date', '')).split('-')[0] if result.get('first_air_date') else year,
+            'type': 'tv',
+            'tmdb_id': result.get('id'),
+            'overview': result.get('overview', ''),
+            'poster': poster
+        })
+    
+    def _apply_confidence(self, result: Dict, metadata: Dict) -> Dict:
+        """附加搜索匹配得分，低于match_confidence_threshold时标记low_confidence等待人工确认"""
+        confidence = result.get('match_confidence')
+        if confidence is not None:
+            metadata['match_confidence'] = confidence
+            if confidence < self.match_confidence_threshold:
+                metadata['low_confidence'] = True
+        return metadata
+    
+    def _get_from_douban(self, title: str, media_type: str, year: str = None) -> Optional[Dict]:
         """从豆瓣获取元数据"""
+        if self.offline_mode:
+            return None
         try:
-            return self.douban_client.search(title, media_type)
+            return self.douban_client.search(title, media_type, year)
         except Exception as e:
             logger.error(f"豆瓣获取元数据失败: {title}, 错误: {str(e)}")
         
@@ -142,14 +450,161 @@ class MetadataManager:
     
     def _map_douban_to_standard(self, douban_data: Dict) -> Dict:
         """将豆瓣数据映射到标准格式"""
-        return {
+        return self._apply_confidence(douban_data, {
             'title': douban_data.get('title', ''),
             'original_title': douban_data.get('original_title', ''),
             'year': douban_data.get('year', ''),
             'type': 'movie' if douban_data.get('type') == 'movie' else 'tv',
             'douban_id': douban_data.get('id', ''),
             'poster': douban_data.get('cover', '')
-        }
+        })
+    
+    async def get_metadata_many(self, items: Iterable[Dict], concurrency: int = None,
+                                progress: Callable[[int, int], None] = None) -> List[Optional[Dict]]:
+        """批量获取元数据（异步）
+
+        items中每项为get_metadata的关键字参数（title、media_type、year、language），
+        结果按输入顺序返回。相同的查询只执行一次，同时进行的查询数不超过concurrency，
+        每完成一个查询调用progress(已完成数, 查询总数)。
+        安装了aiohttp时在当前线程内通过共享连接池并发请求，否则回退到线程池执行同步查询。
+        """
+        items = list(items)
+        semaphore = asyncio.Semaphore(concurrency or self.async_concurrency)
+        
+        if self._async_transport_available():
+            async with AsyncHTTPPool(self.http_pool_size, self.http_per_host_limit) as http:
+                tmdb = AsyncTMDBClient(self.tmdb_client, http)
+                douban = AsyncDoubanClient(self.douban_client, http)
+                
+                async def run(item):
+                    async with semaphore:
+                        return await self._get_metadata_async(tmdb, douban, **item)
+                
+                return await self._gather_unique(items, run, progress)
+        
+        loop = asyncio.get_running_loop()
+        
+        async def run_in_thread(item):
+            async with semaphore:
+                return await loop.run_in_executor(None, partial(self.get_metadata, **item))
+        
+        return await self._gather_unique(items, run_in_thread, progress)
+    
+    async def _gather_unique(self, items: List[Dict], run, progress=None) -> List[Optional[Dict]]:
+        """相同的查询共用一个任务，按输入顺序收集结果"""
+        tasks = {}
+        completed = 0
+        
+        def on_done(_task):
+            nonlocal completed
+            completed += 1
+            try:
+                progress(completed, len(tasks))
+            except Exception as e:
+                logger.error(f"进度回调失败: {str(e)}")
+        
+        keys = []
+        for item in items:
+            title = item.get('title') or ''
+            year = item.get('year')
+            key = (title.strip(), self._normalize_media_type(item.get('media_type')),
+                   str(year) if year else None, item.get('language'))
+            if key not in tasks:
+                tasks[key] = asyncio.ensure_future(run(item))
+                if progress:
+                    tasks[key].add_done_callback(on_done)
+            keys.append(key)
+        
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        
+        results = []
+        for key in keys:
+            task = tasks[key]
+            if task.exception() is not None:
+                logger.error(f"批量获取元数据失败: {key[0]}, 错误: {str(task.exception())}")
+                results.append(None)
+            else:
+                results.append(task.result())
+        return results
+    
+    def _async_transport_available(self) -> bool:
+        """是否可以使用异步HTTP请求（需要aiohttp和标准的客户端实现）"""
+        return ASYNC_HTTP_AVAILABLE and \
+            hasattr(self.tmdb_client, '_build_request') and \
+            hasattr(self.douban_client, '_handle_search_results')
+    
+    async def _get_metadata_async(self, tmdb: AsyncTMDBClient, douban: AsyncDoubanClient, title: str,
+                                  media_type: str = None, year: str = None,
+                                  language: str = None) -> Optional[Dict]:
+        """get_metadata的异步版本"""
+        if not title:
+            return None
+        
+        media_type = self._normalize_media_type(media_type)
+        if not media_type:
+            # 未知类型，先尝试电影再尝试电视剧
+            metadata = await self._lookup_metadata_async(tmdb, douban, title, 'movie', year, language)
+            if not metadata and self.fallback_enabled:
+                metadata = await self._lookup_metadata_async(tmdb, douban, title, 'tv', year, language)
+            return metadata
+        
+        return await self._lookup_metadata_async(tmdb, douban, title, media_type, year, language)
+    
+    async def _lookup_metadata_async(self, tmdb: AsyncTMDBClient, douban: AsyncDoubanClient, title: str,
+                                     media_type: str, year: str = None,
+                                     language: str = None) -> Optional[Dict]:
+        """_lookup_metadata的异步版本：依次从TMDB和豆瓣获取元数据"""
+        logger.info(f"获取元数据: {title} ({media_type}, {year})")
+        
+        metadata = None
+        try:
+            offline = self._lookup_offline(title, media_type, year)
+            if self.offline_mode:
+                result = self._get_cached_tmdb_search(title, media_type, year, language)
+                if not result and offline:
+                    result = self._offline_result(offline, media_type)
+            else:
+                tmdb_id = offline['id'] if offline else self._lookup_alias(title, media_type, year)
+                result = await tmdb.get_details(media_type, tmdb_id, language) if tmdb_id else None
+                if result is None:
+                    result = await tmdb._search(media_type, title, year, language)
+            if result:
+                metadata = self._learn_original_title(title, media_type, year,
+                                                      self._map_tmdb_to_standard(result, media_type, title, year))
+        except Exception as e:
+            logger.error(f"TMDB获取元数据失败: {title}, 错误: {str(e)}")
+        
+        if not metadata and self.fallback_enabled and not self.offline_mode:
+            logger.info(f"TMDB失败，尝试豆瓣: {title}")
+            try:
+                result = await douban.search(title, media_type, year)
+                if result:
+                    metadata = await self._resolve_douban_result_async(tmdb, title, media_type, year, language, result)
+            except Exception as e:
+                logger.error(f"豆瓣获取元数据失败: {title}, 错误: {str(e)}")
+        
+        if metadata:
+            logger.info(f"成功获取元数据: {title}")
+        else:
+            logger.warning(f"所有源都无法获取元数据: {title}")
+        
+        return metadata
+    
+    async def _resolve_douban_result_async(self, tmdb: AsyncTMDBClient, title: str, media_type: str, year: str,
+                                           language: str, douban_data: Dict) -> Dict:
+        """_resolve_douban_result的异步版本"""
+        original = self._douban_original_title(title, media_type, douban_data)
+        if original:
+            try:
+                result = await tmdb._search(media_type, original, douban_data.get('year') or year, language)
+                if result:
+                    metadata = self._map_tmdb_to_standard(result, media_type, original, year)
+                    if not metadata.get('low_confidence'):
+                        logger.info(f"通过豆瓣原名找到TMDB条目: {title} -> {original} -> {metadata['tmdb_id']}")
+                        return self._learn_alias(media_type, year, metadata, [title, original])
+            except Exception as e:
+                logger.error(f"按原名搜索TMDB失败: {original}, 错误: {str(e)}")
+        return self._map_douban_to_standard(douban_data)
     
     def get_episode_metadata(self, tv_id: int, season: int, episode: int) -> Optional[Dict]:
         """获取剧集的详细信息"""
@@ -184,13 +639,110 @@ class MetadataManager:
         if douban_cookies and hasattr(self.douban_client, '_set_cookies'):
             self.douban_client._set_cookies(douban_cookies)
         
+        # 更新API地址
+        if 'tmdb_base_url' in config and hasattr(self.tmdb_client, 'set_base_url'):
+            self.tmdb_client.set_base_url(config['tmdb_base_url'])
+        if 'douban_base_url' in config and hasattr(self.douban_client, 'set_base_url'):
+            self.douban_client.set_base_url(config['douban_base_url'])
+        
+        # 更新默认查询语言
+        if config.get('tmdb_language') and hasattr(self.tmdb_client, 'language'):
+            self.tmdb_client.language = config['tmdb_language']
+        
+        # 更新TMDB精简模式和附加数据
+        if 'tmdb_lean_mode' in config and hasattr(self.tmdb_client, 'lean'):
+            self.tmdb_client.lean = config['tmdb_lean_mode']
+        if 'tmdb_append_to_response' in config and hasattr(self.tmdb_client, 'append_to_response'):
+            self.tmdb_client.append_to_response = config['tmdb_append_to_response'] or ''
+        
         # 更新回退设置
         if 'fallback_enabled' in config:
             self.fallback_enabled = config['fallback_enabled']
+        if 'match_confidence_threshold' in config:
+            self.match_confidence_threshold = config['match_confidence_threshold']
+        if 'offline_mode' in config:
+            self.offline_mode = config['offline_mode']
+        
+        # 更新缓存过期时间和容量上限
+        if 'cache_ttl' in config:
+            self.cache_store.default_ttl = config['cache_ttl']
+        if 'cache_max_entries' in config:
+            self.cache_store.max_entries = config['cache_max_entries']
+        if 'cache_max_bytes' in config:
+            self.cache_store.max_bytes = config['cache_max_bytes']
+        if 'memory_cache_entries' in config:
+            self.cache_store.memory.max_entries = config['memory_cache_entries']
+        if 'memory_cache_bytes' in config:
+            self.cache_store.memory.max_bytes = config['memory_cache_bytes']
+        if 'cache_compress_threshold' in config:
+            self.cache_store.compress_threshold = config['cache_compress_threshold']
+        if 'cache_stale_grace' in config:
+            self.cache_store.stale_grace = config['cache_stale_grace']
+        # 更新限速和重试设置
+        if 'rate_limits' in config:
+            self.rate_limiter.set_rates(config['rate_limits'])
+        if 'max_retries' in config:
+            self.rate_limiter.max_retries = config['max_retries']
+        if 'retry_base_delay' in config:
+            self.rate_limiter.base_delay = config['retry_base_delay']
+        if 'retry_max_delay' in config:
+            self.rate_limiter.max_delay = config['retry_max_delay']
+        for breaker in self.circuit_breakers.values():
+            if 'circuit_failure_threshold' in config:
+                breaker.failure_threshold = config['circuit_failure_threshold']
+            if 'circuit_reset_timeout' in config:
+                breaker.reset_timeout = config['circuit_reset_timeout']
+        # 更新查询策略
+        if 'lookup_strategy' in config:
+            self.lookup_strategy = config['lookup_strategy']
+        if 'hedge_delay' in config:
+            self.hedge_delay = config['hedge_delay']
+        if 'lookup_deadline' in config:
+            self.lookup_deadline = config['lookup_deadline']
+        if 'async_concurrency' in config:
+            self.async_concurrency = config['async_concurrency']
+        if 'http_pool_size' in config:
+            self.http_pool_size = config['http_pool_size']
+        if 'http_per_host_limit' in config:
+            self.http_per_host_limit = config['http_per_host_limit']
+        if 'negative_cache_ttl' in config:
+            for client in (self.tmdb_client, self.douban_client):
+                if hasattr(client, 'negative_ttl'):
+                    client.negative_ttl = config['negative_cache_ttl']
+    
+    def _revalidate(self, namespace: str, key: str, entry: Dict):
+        """提交过期条目的后台重新验证（离线模式下不发送请求）"""
+        if not self.offline_mode:
+            self.revalidator.submit(namespace, key, entry)
+    
+    def get_stats(self) -> Dict:
+        """获取元数据查询统计信息"""
+        return {
+            'cache': self.cache_store.get_stats(),
+            'single_flight': self._single_flight.get_stats(),
+            'rate_limits': self.rate_limiter.get_stats(),
+            'latency': self.latency.get_stats(),
+            'lookup': {'strategy': self.lookup_strategy, **self._lookup_counts},
+            'revalidation': self.revalidator.get_stats(),
+            'circuit_breakers': self.get_source_health(),
+            'aliases': self.alias_index.get_stats(),
+            'offline_index': self.offline_index.get_stats() if self.offline_index else {}
+        }
+    
+    def get_source_health(self) -> Dict:
+        """获取各元数据源的熔断器状态"""
+        return {source: breaker.get_stats() for source, breaker in self.circuit_breakers.items()}
     
     def close(self):
         """关闭所有客户端"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.revalidator.close()
         if self.tmdb_client:
             self.tmdb_client.close()
         if self.douban_client:
-            self.douban_client.close()
\ No newline at end of file
+            self.douban_client.close()
+        if self.offline_index:
+            self.offline_index.close()
+        self.alias_index.close()
+        self.cache_store.close()
\ No newline at end of file
@@ -0,0 +1,45 @@
+import math
+import threading
+from collections import deque
+from typing import Dict
+
+
+class LatencyTracker:
+    """按来源记录请求耗时，统计最近window次的分位数"""
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, window: int = 1000):
+        """初始化，window为每个来源保留的样本数"""
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, source: str, seconds: float):
+        """记录一次耗时"""
+        with self._lock:
+            samples = self._samples.get(source)
+            if samples is None:
+                samples = self._samples[source] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._counts[source] = self._counts.get(source, 0) + 1
+
+    @staticmethod
+    def _percentile(ordered, percent: float) -> float:
+        """最近秩法计算分位数"""
+        rank = max(1, math.ceil(percent / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def get_stats(self) -> Dict:
+        """获取各来源的调用次数和耗时分位数（毫秒）"""
+        with self._lock:
+            snapshot = {source: sorted(samples) for source, samples in self._samples.items()}
+            counts = dict(self._counts)
+
+        stats = {}
+        for source, ordered in snapshot.items():
+            stats[source] = {'count': counts[source]}
+            for percent in self.PERCENTILES:
+                stats[source][f"p{percent}_ms"] = round(self._percentile(ordered, percent) * 1000, 1)
+        return stats
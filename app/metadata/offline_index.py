@@ -0,0 +1,200 @@
+import gzip
+import json
+import sqlite3
+import difflib
+import logging
+import threading
+from typing import Callable, Dict, Optional
+from pathlib import Path
+
+from ..core.title_normalizer import normalize_title
+
+logger = logging.getLogger(__name__)
+
+
+class OfflineIndex:
+    """TMDB每日ID导出文件的本地标题索引
+
+    导出文件为gzip压缩的JSON Lines（movie_ids_MM_DD_YYYY.json.gz、tv_series_ids_MM_DD_YYYY.json.gz），
+    每行包含id、原始标题和热度。索引按 媒体类型 + 标准化标题 存储，支持精确、前缀和模糊查找，
+    用于离线解析标题或在联网时跳过搜索请求。
+    """
+
+    # 文件名前缀 -> 媒体类型
+    DUMP_TYPES = (('movie_ids', 'movie'), ('tv_series_ids', 'tv'))
+    BATCH_SIZE = 10000
+    # 前缀查找要求的最短标题长度，过短的标题前缀匹配没有意义
+    MIN_PREFIX_LENGTH = 4
+    FUZZY_CUTOFF = 0.85
+    FUZZY_CANDIDATES = 5000
+
+    def __init__(self, index_file: str):
+        """初始化索引数据库"""
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_file), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS titles (
+                media_type TEXT NOT NULL,
+                norm TEXT NOT NULL,
+                tmdb_id INTEGER NOT NULL,
+                year TEXT,
+                title TEXT,
+                popularity REAL DEFAULT 0,
+                PRIMARY KEY (media_type, norm, tmdb_id)
+            ) WITHOUT ROWID
+        ''')
+        self._conn.commit()
+
+    @classmethod
+    def detect_media_type(cls, dump_file: str) -> Optional[str]:
+        """根据导出文件名判断媒体类型"""
+        name = Path(dump_file).name
+        for prefix, media_type in cls.DUMP_TYPES:
+            if name.startswith(prefix):
+                return media_type
+        return None
+
+    def import_dump(self, dump_file: str, media_type: str = None, include_adult: bool = False,
+                    progress: Callable[[int], None] = None) -> int:
+        """导入导出文件，替换该媒体类型的全部记录，返回导入的条目数"""
+        media_type = media_type or self.detect_media_type(dump_file)
+        if media_type not in ('movie', 'tv'):
+            raise ValueError(f"无法判断导出文件的媒体类型: {dump_file}")
+
+        opener = gzip.open if str(dump_file).endswith('.gz') else open
+        count = 0
+        skipped = 0
+        with self._lock:
+            try:
+                self._conn.execute('DELETE FROM titles WHERE media_type = ?', (media_type,))
+                batch = []
+                with opener(dump_file, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        row = self._parse_line(line, media_type, include_adult)
+                        if row is None:
+                            skipped += 1
+                            continue
+                        batch.append(row)
+                        if len(batch) >= self.BATCH_SIZE:
+                            count += self._insert(batch)
+                            batch = []
+                            if progress:
+                                progress(count)
+                if batch:
+                    count += self._insert(batch)
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+        if progress:
+            progress(count)
+        logger.info(f"已导入TMDB导出文件: {dump_file}, 条目数: {count}, 跳过: {skipped}")
+        return count
+
+    def _parse_line(self, line: str, media_type: str, include_adult: bool) -> Optional[tuple]:
+        """解析导出文件中的一行"""
+        try:
+            record = json.loads(line)
+            tmdb_id = int(record['id'])
+        except (ValueError, KeyError, TypeError):
+            return None
+        if record.get('adult') and not include_adult:
+            return None
+
+        title = record.get('original_title') or record.get('original_name') or \
+            record.get('title') or record.get('name') or ''
+        norm = normalize_title(title)
+        if not norm:
+            return None
+        date = record.get('release_date') or record.get('first_air_date') or ''
+        year = str(record.get('year') or date[:4]) or None
+        return (media_type, norm, tmdb_id, year, title, record.get('popularity') or 0)
+
+    def _insert(self, batch) -> int:
+        """批量写入"""
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO titles (media_type, norm, tmdb_id, year, title, popularity) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            batch
+        )
+        return len(batch)
+
+    def lookup(self, title: str, media_type: str, year: str = None, fuzzy: bool = True) -> Optional[Dict]:
+        """查找标题对应的TMDB ID
+
+        依次尝试精确匹配、前缀匹配和模糊匹配（fuzzy为False时只做精确匹配）。
+        返回的match为匹配方式，ambiguous表示有多个同样符合条件的条目。
+        """
+        norm = normalize_title(title)
+        if not norm:
+            return None
+        year = str(year) if year else None
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT tmdb_id, year, title, popularity FROM titles WHERE media_type = ? AND norm = ?',
+                (media_type, norm)
+            ).fetchall()
+            result = self._pick(rows, year, 'exact')
+            if result or not fuzzy:
+                return result
+
+            if len(norm) >= self.MIN_PREFIX_LENGTH:
+                rows = self._conn.execute(
+                    'SELECT tmdb_id, year, title, popularity FROM titles '
+                    'WHERE media_type = ? AND norm > ? AND norm < ? ORDER BY popularity DESC LIMIT 50',
+                    (media_type, norm, norm + '\U0010ffff')
+                ).fetchall()
+                result = self._pick(rows, year, 'prefix')
+                if result:
+                    return result
+
+            # 模糊匹配只在前两个字符相同的标题中查找，避免扫描整个索引
+            candidates = self._conn.execute(
+                'SELECT DISTINCT norm FROM titles WHERE media_type = ? AND norm >= ? AND norm < ? LIMIT ?',
+                (media_type, norm[:2], norm[:2] + '\U0010ffff', self.FUZZY_CANDIDATES)
+            ).fetchall()
+            matches = difflib.get_close_matches(norm, [row[0] for row in candidates], n=1,
+                                                cutoff=self.FUZZY_CUTOFF)
+            if not matches:
+                return None
+            rows = self._conn.execute(
+                'SELECT tmdb_id, year, title, popularity FROM titles WHERE media_type = ? AND norm = ?',
+                (media_type, matches[0])
+            ).fetchall()
+            return self._pick(rows, year, 'fuzzy')
+
+    @staticmethod
+    def _pick(rows, year: Optional[str], match: str) -> Optional[Dict]:
+        """按年份过滤后选择热度最高的条目"""
+        if year:
+            # 年份一致的优先，其次是没有年份信息的条目
+            same_year = [row for row in rows if row[1] == year]
+            rows = same_year or [row for row in rows if not row[1]]
+        if not rows:
+            return None
+        rows = sorted(rows, key=lambda row: row[3] or 0, reverse=True)
+        tmdb_id, row_year, row_title, popularity = rows[0]
+        return {
+            'id': tmdb_id,
+            'title': row_title,
+            'year': row_year or '',
+            'popularity': popularity,
+            'match': match,
+            'ambiguous': len({row[0] for row in rows}) > 1
+        }
+
+    def get_stats(self) -> Dict:
+        """获取各媒体类型的条目数"""
+        with self._lock:
+            rows = self._conn.execute('SELECT media_type, COUNT(*) FROM titles GROUP BY media_type').fetchall()
+        return {media_type: count for media_type, count in rows}
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,81 @@
+import math
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cache_keys import canonical_title
+
+# 各项得分的权重，候选缺少某项信息时该项不参与计算
+WEIGHTS = {'title': 0.6, 'year': 0.25, 'type': 0.1, 'popularity': 0.05}
+# 候选中可能包含标题的字段（TMDB电影/电视剧、豆瓣）
+TITLE_FIELDS = ('title', 'name', 'original_title', 'original_name', 'sub_title')
+# 年份相差1年常见于首映和上映地区不同，相差更多时很可能是同名的其他作品
+YEAR_SCORES = {0: 1.0, 1: 0.7, 2: 0.3}
+
+
+def parse_year(value) -> Optional[int]:
+    """从年份或日期字符串中取出年份，无法解析时返回None"""
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def candidate_year(candidate: Dict) -> Optional[int]:
+    """候选的年份（TMDB的release_date/first_air_date或豆瓣的year）"""
+    return parse_year(candidate.get('release_date') or candidate.get('first_air_date') or candidate.get('year'))
+
+
+def title_similarity(query: str, candidate: Dict) -> float:
+    """查询标题与候选各标题字段规范形式的最大相似度"""
+    query = canonical_title(query)
+    best = 0.0
+    for field in TITLE_FIELDS:
+        value = candidate.get(field)
+        if not value:
+            continue
+        value = canonical_title(value)
+        if value == query:
+            return 1.0
+        best = max(best, SequenceMatcher(None, query, value).ratio())
+    return best
+
+
+def score_candidate(candidate: Dict, title: str, year: str = None, media_type: str = None,
+                    max_popularity: float = 0) -> float:
+    """候选与查询的匹配得分（0~1）：标题相似度、年份差、类型和热度的加权平均"""
+    scores = {'title': title_similarity(title, candidate)}
+
+    query_year, found_year = parse_year(year), candidate_year(candidate)
+    if query_year and found_year:
+        scores['year'] = YEAR_SCORES.get(abs(query_year - found_year), 0.0)
+
+    # 豆瓣候选的类型为type，TMDB多类型搜索结果为media_type
+    found_type = candidate.get('type') or candidate.get('media_type')
+    if media_type and found_type:
+        scores['type'] = 1.0 if found_type == media_type else 0.0
+
+    # 热度按对数归一化，只在同一次搜索结果中比较，主要用于区分同名作品
+    popularity = candidate.get('popularity')
+    if max_popularity > 0 and popularity is not None:
+        scores['popularity'] = math.log1p(max(0.0, popularity)) / math.log1p(max_popularity)
+
+    total_weight = sum(WEIGHTS[name] for name in scores)
+    return sum(WEIGHTS[name] * score for name, score in scores.items()) / total_weight
+
+
+def rank_candidates(candidates: Sequence[Dict], title: str, year: str = None,
+                    media_type: str = None) -> List[Tuple[float, Dict]]:
+    """按得分从高到低排列候选，得分相同时保持数据源的原有顺序"""
+    max_popularity = max((c.get('popularity') or 0 for c in candidates), default=0)
+    scored = [(score_candidate(c, title, year, media_type, max_popularity), c) for c in candidates]
+    return sorted(scored, key=lambda item: item[0], reverse=True)
+
+
+def pick_best(candidates: Sequence[Dict], title: str, year: str = None,
+              media_type: str = None) -> Tuple[Optional[Dict], float]:
+    """选择得分最高的候选，返回 (候选, 得分)，没有候选时返回 (None, 0)"""
+    ranked = rank_candidates(candidates, title, year, media_type)
+    if not ranked:
+        return None, 0.0
+    score, best = ranked[0]
+    return best, score
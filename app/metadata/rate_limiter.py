@@ -0,0 +1,270 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from .circuit_breaker import CircuitBreaker
+
+try:
+    import aiohttp
+    _ASYNC_RETRYABLE_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+except ImportError:
+    _ASYNC_RETRYABLE_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码：限流和服务端临时错误
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# 可重试的网络错误（连接失败、超时）
+RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, asyncio.TimeoutError) + _ASYNC_RETRYABLE_ERRORS
+# 计入熔断的HTTP状态码：除可重试的错误外，还包括Cookies失效或被封禁
+OUTAGE_STATUS = RETRY_STATUS | {401, 403}
+
+
+def _error_response(error: Exception):
+    """返回错误的HTTP状态码和响应头（requests.HTTPError或aiohttp.ClientResponseError）"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'status', None)
+    headers = getattr(response, 'headers', None) or getattr(error, 'headers', None) or {}
+    return status, headers
+
+
+def is_outage(error: Exception) -> bool:
+    """错误是否说明数据源不可用（计入熔断），404等正常的错误响应不计入"""
+    status, _ = _error_response(error)
+    if status is not None:
+        return status in OUTAGE_STATUS
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析Retry-After响应头（秒数或HTTP日期），无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶限速器（线程安全）
+
+    每次请求预定一个令牌，令牌不足时返回需要等待的时间，因此并发请求会被均匀地排开。
+    rate为每秒令牌数，0表示不限速。
+    """
+
+    def __init__(self, rate: float = 0, burst: float = None):
+        """初始化令牌桶，burst为桶容量（默认与rate相同，至少为1）"""
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.burst = 1.0
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.configure(rate, burst)
+        self._tokens = self.burst
+
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    def configure(self, rate: float, burst: float = None):
+        """更新速率和容量"""
+        with self._lock:
+            self.rate = float(rate or 0)
+            self.burst = float(burst or max(1.0, self.rate))
+            self._tokens = min(self._tokens, self.burst)
+
+    def _reserve(self) -> float:
+        """预定一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = -self._tokens / self.rate
+            wait = max(wait, self._paused_until - now)
+
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def acquire(self) -> float:
+        """获取一个令牌（阻塞等待），返回等待的秒数"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """获取一个令牌（异步等待），返回等待的秒数"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """暂停发放令牌（服务端要求稍后重试时，所有请求一起等待）"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def get_stats(self) -> Dict:
+        """获取等待统计"""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'acquired': self.acquired,
+                'waited': self.waited,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'max_wait': round(self.max_wait, 3)
+            }
+
+
+class RateLimiter:
+    """按元数据源限速，并对限流和临时错误进行退避重试
+
+    每个来源一个令牌桶。请求返回429/5xx或网络错误时按带随机抖动的指数退避重试，
+    响应带有Retry-After时按其指定的时间等待，并暂停该来源的令牌桶。
+    配置了熔断器的来源在熔断器打开时直接抛出CircuitOpenError，重试耗尽后的失败计入熔断。
+    """
+
+    def __init__(self, rates: Dict[str, float] = None, max_retries: int = 3,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 breakers: Dict[str, CircuitBreaker] = None):
+        """初始化，rates为 来源 -> 每秒请求数（未配置的来源不限速），breakers为 来源 -> 熔断器"""
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breakers: Dict[str, CircuitBreaker] = dict(breakers or {})
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._retries: Dict[str, int] = {}
+        self._throttled: Dict[str, int] = {}
+        self._failures: Dict[str, int] = {}
+        self.set_rates(rates or {})
+
+    def set_rates(self, rates: Dict[str, float]):
+        """设置各来源的速率"""
+        for source, rate in rates.items():
+            self.bucket(source).configure(rate)
+
+    def bucket(self, source: str) -> TokenBucket:
+        """获取来源的令牌桶"""
+        with self._lock:
+            bucket = self._buckets.get(source)
+            if bucket is None:
+                bucket = self._buckets[source] = TokenBucket()
+            return bucket
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """第attempt次重试前的等待时间"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # 完全抖动：在 [0, base * 2^attempt] 内随机，避免所有请求同时重试
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _retry_delay(self, source: str, error: Exception, attempt: int) -> Optional[float]:
+        """判断错误是否可重试，返回等待时间（不可重试时返回None）"""
+        status, headers = _error_response(error)
+
+        if status is not None:
+            if status not in RETRY_STATUS:
+                return None
+        elif not isinstance(error, RETRYABLE_ERRORS):
+            return None
+
+        with self._lock:
+            if status == 429:
+                self._throttled[source] = self._throttled.get(source, 0) + 1
+            if attempt >= self.max_retries:
+                self._failures[source] = self._failures.get(source, 0) + 1
+                return None
+            self._retries[source] = self._retries.get(source, 0) + 1
+
+        retry_after = parse_retry_after(headers.get('Retry-After')) if status in (429, 503) else None
+        delay = self.backoff(attempt, retry_after)
+        if retry_after is not None:
+            self.bucket(source).pause(delay)
+        logger.warning(f"{source} 请求失败，{delay:.1f}秒后重试（第{attempt + 1}次）: {str(error)}")
+        return delay
+
+    def _record_result(self, source: str, error: Exception = None):
+        """将请求的最终结果计入来源的熔断器"""
+        breaker = self.breakers.get(source)
+        if breaker is None:
+            return
+        if error is not None and is_outage(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def request(self, source: str, send: Callable[[], Any]) -> Any:
+        """限速执行请求，可重试的错误按退避时间重试，最终失败时抛出最后一次的异常"""
+        breaker = self.breakers.get(source)
+        if breaker is not None:
+            breaker.check()
+        attempt = 0
+        while True:
+            self.bucket(source).acquire()
+            try:
+                response = send()
+                self._record_result(source)
+                return response
+            except Exception as e:
+                delay = self._retry_delay(source, e, attempt)
+                if delay is None:
+                    self._record_result(source, e)
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def request_async(self, source: str, send: Callable[[], Any]) -> Any:
+        """request的异步版本，send返回可等待对象"""
+        breaker = self.breakers.get(source)
+        if breaker is not None:
+            breaker.check()
+        attempt = 0
+        while True:
+            await self.bucket(source).acquire_async()
+            try:
+                response = await send()
+                self._record_result(source)
+                return response
+            except Exception as e:
+                delay = self._retry_delay(source, e, attempt)
+                if delay is None:
+                    self._record_result(source, e)
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def get_stats(self) -> Dict:
+        """获取各来源的限速和重试统计"""
+        with self._lock:
+            buckets = dict(self._buckets)
+        stats = {}
+        for source, bucket in buckets.items():
+            stats[source] = bucket.get_stats()
+            stats[source].update({
+                'retries': self._retries.get(source, 0),
+                'throttled': self._throttled.get(source, 0),
+                'failures': self._failures.get(source, 0)
+            })
+        return stats
@@ -0,0 +1,117 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 条件请求返回304时客户端_make_request的返回值：缓存的内容仍然有效
+NOT_MODIFIED = object()
+
+# 重新验证的结果
+RESULT_NOT_MODIFIED = 'not_modified'
+RESULT_REFRESHED = 'refreshed'
+RESULT_FAILED = 'failed'
+
+
+def conditional_headers(entry: Dict) -> Dict:
+    """根据条目保存的验证信息生成条件请求头"""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def response_validators(response) -> Dict:
+    """从响应头中取出ETag和Last-Modified"""
+    headers = getattr(response, 'headers', None) or {}
+    return {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified')
+    }
+
+
+class Revalidator:
+    """在后台重新验证已过期的缓存条目
+
+    CacheStore读取到过期但仍在宽限期内的条目时照常返回旧值，并通过submit提交重新验证，
+    读取方不会等待。各命名空间的处理函数由客户端注册，发送条件请求（If-None-Match /
+    If-Modified-Since）：返回304时只延长条目的有效期，返回新内容时重新写入缓存。
+    同一条目同时只验证一次，验证失败的条目在FAILURE_COOLDOWN秒内不再重试。
+    """
+
+    FAILURE_COOLDOWN = 300
+
+    def __init__(self, max_workers: int = 2):
+        """初始化，max_workers为后台验证线程数"""
+        self.max_workers = max(1, int(max_workers or 1))
+        self._handlers: Dict[str, Callable[[str, Dict], str]] = {}
+        self._in_flight = set()
+        self._failed_at: Dict[tuple, float] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._counts = {'submitted': 0, RESULT_NOT_MODIFIED: 0, RESULT_REFRESHED: 0, RESULT_FAILED: 0}
+
+    def register(self, namespace: str, handler: Callable[[str, Dict], str]):
+        """注册命名空间的处理函数，handler(键, 条目信息)返回验证结果"""
+        self._handlers[namespace] = handler
+
+    def submit(self, namespace: str, key: str, entry: Dict) -> bool:
+        """提交重新验证（不阻塞），已在验证中、最近失败过或没有处理函数时返回False"""
+        handler = self._handlers.get(namespace)
+        if handler is None:
+            return False
+
+        task = (namespace, key)
+        with self._lock:
+            if self._closed or task in self._in_flight:
+                return False
+            failed_at = self._failed_at.get(task)
+            if failed_at and time.monotonic() - failed_at < self.FAILURE_COOLDOWN:
+                return False
+            self._in_flight.add(task)
+            self._counts['submitted'] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='revalidate')
+            executor = self._executor
+
+        executor.submit(self._run, handler, task, entry)
+        return True
+
+    def _run(self, handler: Callable[[str, Dict], str], task: tuple, entry: Dict):
+        """在后台线程中执行重新验证"""
+        namespace, key = task
+        try:
+            result = handler(key, entry)
+        except Exception as e:
+            logger.error(f"重新验证缓存失败: {namespace}/{key}, 错误: {str(e)}")
+            result = RESULT_FAILED
+
+        with self._lock:
+            self._in_flight.discard(task)
+            self._counts[result] = self._counts.get(result, 0) + 1
+            if result == RESULT_FAILED:
+                self._failed_at[task] = time.monotonic()
+            else:
+                self._failed_at.pop(task, None)
+        logger.debug(f"重新验证缓存: {namespace}/{key}, 结果: {result}")
+
+    def get_stats(self) -> Dict:
+        """获取重新验证统计"""
+        with self._lock:
+            stats = dict(self._counts)
+            stats['in_flight'] = len(self._in_flight)
+        return stats
+
+    def close(self, wait: bool = False):
+        """停止后台验证，wait为True时等待进行中的验证完成"""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -1,9 +1,18 @@
 import os
-import json
 import logging
 import requests
-from typing import Dict, Optional, List
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Optional, List, Tuple
 from pathlib import Path
+from .cache_store import CacheStore, NOT_FOUND
+from .cache_keys import search_key
+from .memory_cache import MISSING
+from .id_index import IdIndex
+from .rate_limiter import RateLimiter
+from .ranking import pick_best
+from .revalidator import (NOT_MODIFIED, RESULT_FAILED, RESULT_NOT_MODIFIED, RESULT_REFRESHED,
+                          conditional_headers, response_validators)
+from .single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -12,168 +21,359 @@ class TMDBClient:
     """TMDB API客户端"""
     
     BASE_URL = 'https://api.themoviedb.org/3'
+    CACHE_NAMESPACE = 'tmdb'
+    MEDIA_LABELS = {'movie': '电影', 'tv': '电视剧'}
+    # 各媒体类型搜索时的年份参数
+    YEAR_PARAMS = {'movie': 'year', 'tv': 'first_air_date_year'}
+    # 缓存的搜索结果只保留MetadataManager使用的字段
+    RESULT_FIELDS = {
+        'movie': ('id', 'title', 'original_title', 'release_date', 'overview', 'poster_path',
+                  'original_language', 'popularity', 'vote_count'),
+        'tv': ('id', 'name', 'original_name', 'first_air_date', 'overview', 'poster_path',
+               'original_language', 'popularity', 'vote_count')
+    }
+    # 整季缓存中每集保留的字段
+    EPISODE_FIELDS = ('id', 'name', 'overview', 'air_date', 'episode_number', 'season_number',
+                      'still_path', 'runtime', 'vote_average')
     
-    def __init__(self, api_key: str = None, cache_dir: str = './data/tmdb_cache'):
-        """初始化TMDB客户端"""
+    def __init__(self, api_key: str = None, cache_dir: str = './data/tmdb_cache', language: str = 'zh-CN',
+                 cache_store: CacheStore = None, negative_ttl: int = 24 * 3600,
+                 rate_limiter: RateLimiter = None, lean: bool = True, append_to_response: str = '',
+                 base_url: str = None, pool_size: int = 10):
+        """初始化TMDB客户端
+
+        base_url用于指向代理或本地替身服务；pool_size为会话中保持的连接数，
+        应不少于同时查询的线程数，否则多出的连接用完即关闭，无法复用。
+        """
         self.api_key = api_key or os.environ.get('TMDB_API_KEY')
+        self.language = language or 'zh-CN'  # 默认使用中文
         if not self.api_key:
             logger.warning("TMDB API Key 未配置")
+        self.set_base_url(base_url)
         
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
+        # 缓存存储（与豆瓣客户端共用时由MetadataManager传入）
+        self._owns_cache_store = cache_store is None
+        self.cache_store = cache_store or CacheStore(cache_dir)
+        # 未找到结果的否定缓存过期时间
+        self.negative_ttl = negative_ttl
+        
+        # 标题 -> TMDB ID 索引（兼容导入旧版 tmdb_ids.json）
+        self.id_index = IdIndex(
+            self.cache_dir / 'tmdb_ids.jsonl',
+            legacy_file=self.cache_dir / 'tmdb_ids.json'
+        )
+        
+        # 限速和重试（与豆瓣客户端共用时由MetadataManager传入）
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # 精简模式：直接使用搜索结果，不再请求详情
+        self.lean = lean
+        # 非精简模式下随详情一起获取的附加数据（逗号分隔，如 external_ids,alternative_titles）
+        self.append_to_response = append_to_response or ''
+        
+        # 同一季的并发剧集查询只请求一次
+        self._season_flight = SingleFlight()
+        
         self.session = requests.Session()
         self.session.headers.update({
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         })
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=pool_size))
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=pool_size))
+    
+    def set_base_url(self, base_url: str = None):
+        """设置API地址，为空时使用官方地址"""
+        self.BASE_URL = (base_url or TMDBClient.BASE_URL).rstrip('/')
     
-    def _make_request(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
-        """发送API请求"""
+    def _build_request(self, endpoint: str, params: Dict = None, language: str = None) -> Tuple[str, Dict]:
+        """生成请求URL和参数（同步和异步客户端共用）"""
+        url = f"{self.BASE_URL}{endpoint}"
+        params = dict(params) if params else {}
+        params['api_key'] = self.api_key
+        params['language'] = language or self.language
+        return url, params
+    
+    def _make_request(self, endpoint: str, params: Dict = None, language: str = None,
+                      validators: Dict = None, headers: Dict = None) -> Optional[Dict]:
+        """发送API请求
+
+        validators不为None时写入响应的ETag和Last-Modified；headers为条件请求头，
+        服务端返回304时返回NOT_MODIFIED。
+        """
         if not self.api_key:
             logger.error("无法发送请求：TMDB API Key 未配置")
             return None
         
-        url = f"{self.BASE_URL}{endpoint}"
+        url, params = self._build_request(endpoint, params, language)
         
-        if params is None:
-            params = {}
-        params['api_key'] = self.api_key
-        params['language'] = 'zh-CN'  # 默认使用中文
+        def send():
+            response = self.session.get(url, params=params, headers=headers, timeout=10)
+            response.raise_for_status()
+            return response
         
         try:
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            response = self.rate_limiter.request(self.CACHE_NAMESPACE, send)
+            if validators is not None:
+                validators.update(response_validators(response))
+            if response.status_code == 304:
+                return NOT_MODIFIED
             return response.json()
         except requests.RequestException as e:
             logger.error(f"TMDB API请求失败: {url}, 错误: {str(e)}")
             return None
     
-    def search_movie(self, title: str, year: str = None) -> Optional[Dict]:
+    def _validators(self, kind: str, endpoint: str, params: Dict = None, language: str = None, **extra) -> Dict:
+        """缓存条目的重新验证信息：重新请求的接口、参数和处理方式（同步和异步客户端共用）"""
+        refresh = {'kind': kind, 'endpoint': endpoint, 'params': dict(params or {}), 'language': language}
+        refresh.update(extra)
+        return {'refresh': refresh}
+    
+    def _language_suffix(self, language: str = None) -> str:
+        """非默认语言的缓存键后缀"""
+        return f"_{language}" if language and language != self.language else ''
+    
+    def search_movie(self, title: str, year: str = None, language: str = None) -> Optional[Dict]:
         """搜索电影"""
-        # 检查缓存
-        cache_key = f"movie_{title}_{year}" if year else f"movie_{title}"
-        cached = self._get_from_cache(cache_key)
-        if cached:
-            logger.debug(f"从缓存获取电影信息: {title}")
+        return self._search('movie', title, year, language)
+    
+    def search_tv(self, title: str, year: str = None, language: str = None) -> Optional[Dict]:
+        """搜索电视剧"""
+        return self._search('tv', title, year, language)
+    
+    def _search(self, media_type: str, title: str, year: str = None, language: str = None) -> Optional[Dict]:
+        """搜索电影或电视剧：检查缓存、搜索、获取详情并缓存"""
+        cache_key, cached = self._get_search_cache(media_type, title, year, language)
+        if cached is not MISSING:
             return cached
         
-        params = {'query': title}
-        if year:
-            params['year'] = year
-        
-        results = self._make_request('/search/movie', params)
-        if results and results.get('results'):
-            # 返回第一个结果
-            movie = results['results'][0]
-            # 获取详细信息
-            movie_detail = self._make_request(f"/movie/{movie['id']}")
-            if movie_detail:
-                # 保存到缓存
-                self._save_to_cache(cache_key, movie_detail)
-                # 保存TMDB ID到单独的缓存
-                self._save_tmdb_id(title, 'movie', movie_detail['id'])
-                return movie_detail
+        endpoint = f"/search/{media_type}"
+        params = self._search_params(media_type, title, year)
+        validators = self._validators('search', endpoint, params, language, media_type=media_type, title=title,
+                                      year=year)
+        results = self._make_request(endpoint, params, language, validators)
+        hit = self._pick_search_result(results, title, year, media_type)
+        if hit and self.lean:
+            return self._save_search_result(cache_key, media_type, title, hit, validators, hit['match_confidence'])
+        if hit:
+            # 获取详细信息，搜索得分随条目保存，刷新详情时保留
+            endpoint = f"/{media_type}/{hit['id']}"
+            validators = self._validators('details', endpoint, self._detail_params(), language, media_type=media_type,
+                                          title=title, confidence=hit['match_confidence'])
+            detail = self._make_request(endpoint, self._detail_params(), language, validators)
+            if detail:
+                return self._save_search_result(cache_key, media_type, title, detail, validators,
+                                                hit['match_confidence'])
+        elif results is not None:
+            self._save_search_not_found(cache_key, media_type, title)
         
         return None
     
-    def search_tv(self, title: str, year: str = None) -> Optional[Dict]:
-        """搜索电视剧"""
-        # 检查缓存
-        cache_key = f"tv_{title}_{year}" if year else f"tv_{title}"
+    def _get_search_cache(self, media_type: str, title: str, year: str = None,
+                          language: str = None) -> Tuple[str, Any]:
+        """返回搜索的缓存键和缓存结果（未命中为MISSING，否定缓存为None）"""
+        label = self.MEDIA_LABELS[media_type]
+        cache_key = search_key(media_type, title, year,
+                               language if language and language != self.language else None)
+        
         cached = self._get_from_cache(cache_key)
+        if cached is NOT_FOUND:
+            logger.debug(f"缓存记录TMDB未找到{label}: {title}")
+            return cache_key, None
         if cached:
-            logger.debug(f"从缓存获取电视剧信息: {title}")
-            return cached
-        
+            logger.debug(f"从缓存获取{label}信息: {title}")
+            return cache_key, cached
+        return cache_key, MISSING
+    
+    def _search_params(self, media_type: str, title: str, year: str = None) -> Dict:
+        """搜索请求参数"""
         params = {'query': title}
         if year:
-            params['first_air_date_year'] = year
-        
-        results = self._make_request('/search/tv', params)
-        if results and results.get('results'):
-            # 返回第一个结果
-            tv = results['results'][0]
-            # 获取详细信息
-            tv_detail = self._make_request(f"/tv/{tv['id']}")
-            if tv_detail:
-                # 保存到缓存
-                self._save_to_cache(cache_key, tv_detail)
-                # 保存TMDB ID到单独的缓存
-                self._save_tmdb_id(title, 'tv', tv_detail['id'])
-                return tv_detail
+            params[self.YEAR_PARAMS[media_type]] = year
+        return params
+    
+    def _pick_search_result(self, results: Optional[Dict], title: str, year: str = None,
+                            media_type: str = None) -> Optional[Dict]:
+        """在搜索响应的所有候选中选择与标题、年份和类型最匹配的结果，附带匹配得分match_confidence"""
+        if not results or not results.get('results'):
+            return None
+        hit, score = pick_best(results['results'], title, year, media_type)
+        if hit is not results['results'][0]:
+            logger.debug(f"TMDB搜索 {title} 选择第 {results['results'].index(hit) + 1} 个结果, 得分 {score:.2f}")
+        return dict(hit, match_confidence=round(score, 3))
+    
+    def _detail_params(self) -> Dict:
+        """详情请求参数，附加数据通过append_to_response在同一次请求中获取"""
+        return {'append_to_response': self.append_to_response} if self.append_to_response else {}
+    
+    def _trim_result(self, media_type: str, data: Dict) -> Dict:
+        """只保留使用的字段和附加数据"""
+        fields = self.RESULT_FIELDS[media_type] + tuple(
+            name.strip() for name in self.append_to_response.split(',') if name.strip()
+        )
+        return {field: data[field] for field in fields if field in data}
+    
+    def _save_search_result(self, cache_key: str, media_type: str, title: str, detail: Dict,
+                            validators: Dict = None, confidence: float = None) -> Dict:
+        """精简并缓存搜索结果（搜索命中或详情）和匹配得分，记录TMDB ID"""
+        detail = self._trim_result(media_type, detail)
+        if confidence is not None:
+            detail['match_confidence'] = confidence
+        self._save_to_cache(cache_key, detail, validators=validators)
+        self._save_tmdb_id(title, media_type, detail['id'])
+        return detail
+    
+    def _save_search_not_found(self, cache_key: str, media_type: str, title: str):
+        """请求成功但没有结果，记录否定缓存"""
+        logger.info(f"TMDB未找到{self.MEDIA_LABELS[media_type]}: {title}")
+        self._save_not_found(cache_key)
+    
+    def get_details(self, media_type: str, tmdb_id: int, language: str = None) -> Optional[Dict]:
+        """按TMDB ID获取电影或电视剧详情（已知ID时无需搜索）"""
+        cache_key = self._details_cache_key(media_type, tmdb_id, language)
+        cached = self._get_from_cache(cache_key)
+        if cached:
+            logger.debug(f"从缓存获取{self.MEDIA_LABELS[media_type]}详情: {tmdb_id}")
+            return cached
         
+        endpoint = f"/{media_type}/{tmdb_id}"
+        validators = self._validators('details', endpoint, self._detail_params(), language, media_type=media_type)
+        detail = self._make_request(endpoint, self._detail_params(), language, validators)
+        if detail:
+            return self._save_details(cache_key, media_type, detail, validators)
         return None
     
+    def _details_cache_key(self, media_type: str, tmdb_id: int, language: str = None) -> str:
+        """按ID获取的详情的缓存键"""
+        return f"{media_type}_id_{tmdb_id}{self._language_suffix(language)}"
+    
+    def _save_details(self, cache_key: str, media_type: str, detail: Dict, validators: Dict = None) -> Dict:
+        """精简并缓存详情"""
+        detail = self._trim_result(media_type, detail)
+        self._save_to_cache(cache_key, detail, validators=validators)
+        return detail
+    
     def get_episode_info(self, tv_id: int, season: int, episode: int) -> Optional[Dict]:
-        """获取剧集信息"""
-        # 检查缓存
-        cache_key = f"episode_{tv_id}_S{season:02d}E{episode:02d}"
-        cached = self._get_from_cache(cache_key)
+        """获取剧集信息（整季获取并缓存，同一季的其他剧集直接从缓存返回）"""
+        cached_season = self._get_from_cache(self._season_cache_key(tv_id, season))
+        if cached_season and str(episode) in cached_season.get('episodes', {}):
+            logger.debug(f"从缓存获取剧集信息: S{season:02d}E{episode:02d}")
+            return cached_season['episodes'][str(episode)]
+        
+        # 旧版按集缓存的条目，或整季中没有该集的否定缓存
+        episode_key = f"episode_{tv_id}_S{season:02d}E{episode:02d}"
+        cached = self._get_from_cache(episode_key)
+        if cached is NOT_FOUND:
+            return None
         if cached:
             logger.debug(f"从缓存获取剧集信息: S{season:02d}E{episode:02d}")
             return cached
         
-        episode_info = self._make_request(f"/tv/{tv_id}/season/{season}/episode/{episode}")
-        if episode_info:
-            self._save_to_cache(cache_key, episode_info)
+        # 缓存中没有该季或该季缺少这一集（可能是新播出的剧集），重新获取整季
+        season_info = self._season_flight.do((tv_id, season), self._fetch_season, tv_id, season)
+        if season_info is None:
+            return None
+        episode_info = season_info['episodes'].get(str(episode))
+        if not episode_info:
+            logger.info(f"TMDB未找到剧集: {tv_id} S{season:02d}E{episode:02d}")
+            self._save_not_found(episode_key)
         return episode_info
     
+    def _season_cache_key(self, tv_id: int, season: int) -> str:
+        """整季信息的缓存键"""
+        return f"season_{tv_id}_S{season:02d}"
+    
+    def _fetch_season(self, tv_id: int, season: int) -> Optional[Dict]:
+        """请求整季信息并缓存，剧集按集号索引并只保留常用字段"""
+        endpoint = f"/tv/{tv_id}/season/{season}"
+        validators = self._validators('season', endpoint, tv_id=tv_id, season=season)
+        season_info = self._make_request(endpoint, validators=validators)
+        if not season_info:
+            return None
+        return self._save_season(tv_id, season, season_info, validators)
+    
+    def _save_season(self, tv_id: int, season: int, season_info: Dict, validators: Dict = None) -> Dict:
+        """精简并缓存整季信息"""
+        episodes = {}
+        for item in season_info.get('episodes') or []:
+            if item.get('episode_number') is None:
+                continue
+            episodes[str(item['episode_number'])] = {
+                field: item[field] for field in self.EPISODE_FIELDS if field in item
+            }
+        season_info = {
+            'id': season_info.get('id'),
+            'name': season_info.get('name', ''),
+            'season_number': season_info.get('season_number', season),
+            'episodes': episodes
+        }
+        self._save_to_cache(self._season_cache_key(tv_id, season), season_info, validators=validators)
+        logger.debug(f"已缓存整季剧集信息: {tv_id} S{season:02d}, 共 {len(episodes)} 集")
+        return season_info
+    
+    def revalidate(self, cache_key: str, entry: Dict) -> str:
+        """重新验证过期的缓存条目（在后台线程中执行）
+
+        按条目保存的ETag和Last-Modified发送条件请求，返回304时延长有效期，
+        返回新内容时按条目类型重新处理并写入缓存。
+        """
+        refresh = entry['refresh']
+        validators = {'refresh': refresh}
+        data = self._make_request(refresh['endpoint'], refresh.get('params'), refresh.get('language'),
+                                  validators, conditional_headers(entry))
+        if data is NOT_MODIFIED:
+            self.cache_store.extend(self.CACHE_NAMESPACE, cache_key)
+            return RESULT_NOT_MODIFIED
+        if data is None:
+            return RESULT_FAILED
+        
+        kind = refresh['kind']
+        if kind == 'search':
+            hit = self._pick_search_result(data, refresh['title'], refresh.get('year'), refresh['media_type'])
+            if hit:
+                self._save_search_result(cache_key, refresh['media_type'], refresh['title'], hit, validators,
+                                         hit['match_confidence'])
+            else:
+                self._save_search_not_found(cache_key, refresh['media_type'], refresh['title'])
+        elif kind == 'details' and refresh.get('confidence') is not None:
+            # 以搜索缓存键保存的详情（非精简模式），保留匹配得分
+            self._save_search_result(cache_key, refresh['media_type'], refresh['title'], data, validators,
+                                     refresh['confidence'])
+        elif kind == 'details':
+            self._save_details(cache_key, refresh['media_type'], data, validators)
+        elif kind == 'season':
+            self._save_season(refresh['tv_id'], refresh['season'], data, validators)
+        else:
+            logger.warning(f"未知的缓存刷新类型: {kind}")
+            return RESULT_FAILED
+        return RESULT_REFRESHED
+    
     def _get_from_cache(self, key: str) -> Optional[Dict]:
         """从缓存获取数据"""
-        try:
-            cache_file = self.cache_dir / f"{key.replace('/', '_')}.json"
-            if cache_file.exists():
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            logger.error(f"读取缓存失败: {key}, 错误: {str(e)}")
-        return None
+        return self.cache_store.get(self.CACHE_NAMESPACE, key)
     
-    def _save_to_cache(self, key: str, data: Dict):
+    def _save_to_cache(self, key: str, data: Dict, ttl: int = None, validators: Dict = None):
         """保存数据到缓存"""
-        try:
-            cache_file = self.cache_dir / f"{key.replace('/', '_')}.json"
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存缓存失败: {key}, 错误: {str(e)}")
+        self.cache_store.set(self.CACHE_NAMESPACE, key, data, ttl=ttl, validators=validators)
+    
+    def _save_not_found(self, key: str):
+        """记录未找到结果的否定缓存"""
+        if self.negative_ttl:
+            self.cache_store.set_not_found(self.CACHE_NAMESPACE, key, self.negative_ttl)
     
     def _save_tmdb_id(self, title: str, media_type: str, tmdb_id: int):
-        """保存TMDB ID到本地JSON"""
-        try:
-            id_file = self.cache_dir / 'tmdb_ids.json'
-            
-            # 读取现有数据
-            ids = {}
-            if id_file.exists():
-                with open(id_file, 'r', encoding='utf-8') as f:
-                    ids = json.load(f)
-            
-            # 更新或添加ID
-            if media_type not in ids:
-                ids[media_type] = {}
-            ids[media_type][title] = tmdb_id
-            
-            # 保存回文件
-            with open(id_file, 'w', encoding='utf-8') as f:
-                json.dump(ids, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"保存TMDB ID失败: {title}, 错误: {str(e)}")
+        """保存TMDB ID到本地索引（追加写入）"""
+        self.id_index.set(media_type, title, tmdb_id)
     
     def get_tmdb_id(self, title: str, media_type: str) -> Optional[int]:
-        """从本地JSON获取TMDB ID"""
-        try:
-            id_file = self.cache_dir / 'tmdb_ids.json'
-            if id_file.exists():
-                with open(id_file, 'r', encoding='utf-8') as f:
-                    ids = json.load(f)
-                    if media_type in ids and title in ids[media_type]:
-                        return ids[media_type][title]
-        except Exception as e:
-            logger.error(f"读取TMDB ID失败: {title}, 错误: {str(e)}")
-        return None
+        """从本地索引获取TMDB ID"""
+        return self.id_index.get(media_type, title)
     
     def close(self):
         """关闭会话"""
-        self.session.close()
\ No newline at end of file
+        self.session.close()
+        self.id_index.close()
+        if self._owns_cache_store:
+            self.cache_store.close()
\ No newline at end of file
@@ -123,7 +123,7 @@ class FileMonitor:
         if self.message_callback:
             self.message_callback({
                 'type': 'file_processed',
-                'result': result
+                'result': result.to_dict()
             })
     
     def _get_target_dir(self, file_path: str) -> Optional[str]:
@@ -4,14 +4,15 @@ from .socketio import socketio
 
 __all__ = ['create_app', 'socketio']
 
-def create_app(config_manager=None, message_center=None):
+def create_app(config_manager=None, message_center=None, metadata_manager=None):
     """创建Flask应用"""
     app = Flask(__name__, template_folder='templates', static_folder='static')
     app.config['SECRET_KEY'] = 'plexrename_secret_key'
     
-    # 存储配置管理器和消息中心实例
+    # 存储配置管理器、消息中心和共享的元数据管理器实例
     app.config['config_manager'] = config_manager
     app.config['message_center'] = message_center
+    app.config['metadata_manager'] = metadata_manager
     
     # 设置路由
     setup_routes(app)
@@ -1,12 +1,33 @@
 from flask import render_template, request, jsonify, current_app
 import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 def setup_routes(app):
     """设置所有路由"""
     
+    services_lock = threading.Lock()
+    
+    def get_file_processor(config):
+        """获取应用级的文件处理器，元数据管理器在整个进程内只创建一次以复用HTTP连接和缓存"""
+        from app.core.file_processor import FileProcessor
+        from app.metadata.metadata_manager import MetadataManager
+        
+        with services_lock:
+            metadata_manager = current_app.config.get('metadata_manager')
+            if not metadata_manager:
+                metadata_manager = MetadataManager(config)
+                current_app.config['metadata_manager'] = metadata_manager
+            
+            file_processor = current_app.config.get('file_processor')
+            if not file_processor:
+                file_processor = FileProcessor(config)
+                file_processor.set_metadata_client(metadata_manager)
+                current_app.config['file_processor'] = file_processor
+            return file_processor
+    
     @app.route('/')
     def index():
         """首页"""
@@ -83,12 +104,7 @@ def setup_routes(app):
     def api_run_batch_process():
         """运行批量处理"""
         try:
-            # 导入处理器
-            from app.core.file_processor import FileProcessor
-            from app.metadata.metadata_manager import MetadataManager
-            
             config_manager = current_app.config.get('config_manager')
-            message_center = current_app.config.get('message_center')
             
             if not config_manager:
                 return jsonify({'success': False, 'error': '配置管理器未初始化'}), 500
@@ -105,11 +121,8 @@ def setup_routes(app):
             if not source_dir or not target_dir:
                 return jsonify({'success': False, 'error': '源目录和目标目录不能为空'}), 400
             
-            # 创建元数据管理器
-            metadata_manager = MetadataManager(config.get('tmdb_api_key', ''), config.get('douban_cookies', ''))
-            
-            # 创建文件处理器
-            file_processor = FileProcessor(metadata_manager, message_center)
+            # 使用共享的文件处理器
+            file_processor = get_file_processor(config)
             
             # 异步处理，返回任务ID
             # 这里简单实现，实际应该使用线程池
@@ -120,13 +133,17 @@ def setup_routes(app):
             
             # 统计结果
             success_count = sum(1 for r in results if r.get('success'))
-            error_count = len(results) - success_count
+            skipped_count = sum(1 for r in results if r.get('skipped'))
+            needs_review_count = sum(1 for r in results if r.get('needs_review'))
+            error_count = len(results) - success_count - skipped_count - needs_review_count
             
             return jsonify({
                 'success': True,
                 'total': len(results),
                 'success_count': success_count,
-                'error_count': error_count
+                'error_count': error_count,
+                'skipped_count': skipped_count,
+                'needs_review_count': needs_review_count
             })
         
         except Exception as e:
@@ -143,21 +160,19 @@ def setup_routes(app):
     def api_toggle_monitor():
         """切换监控状态"""
         try:
-            # 导入监控器
-            from app.monitor.file_monitor import FileMonitor
-            
-            # 获取监控器实例（实际应该从app配置中获取）
-            # 这里需要一个单例或者全局实例管理
+            # 获取监控器实例，app配置中保存的是按需创建监控器的函数
             monitor = request.environ.get('file_monitor') or current_app.config.get('file_monitor')
+            if callable(monitor):
+                monitor = monitor()
             
             data = request.get_json() or {}
             enabled = data.get('enabled', False)
             
             if enabled:
-                if monitor and not monitor.is_running():
+                if monitor and not monitor.is_running:
                     monitor.start()
             else:
-                if monitor and monitor.is_running():
+                if monitor and monitor.is_running:
                     monitor.stop()
             
             return jsonify({'success': True, 'enabled': enabled})
@@ -201,6 +216,17 @@ def setup_routes(app):
             # 执行重做命令
             # 这里简单实现，实际应该根据命令内容执行相应操作
             command = redo_command.get('redo_command', '')
+            config_manager = current_app.config.get('config_manager')
+            
+            # 文件处理结果生成的 '/redo source target'，待确认的匹配执行即视为确认
+            if command.startswith('/redo ') and config_manager:
+                file_processor = get_file_processor(config_manager.get_config())
+                result = file_processor.process_redo_command(command)
+                
+                if result.get('success'):
+                    message_center.mark_redo_processed(redo_id)
+                
+                return jsonify({'success': True, 'result': result.to_dict()})
             
             # 解析命令（假设格式为 'process_file source target'）
             if command.startswith('process_file'):
@@ -208,15 +234,8 @@ def setup_routes(app):
                 if len(parts) == 3:
                     source, target = parts[1], parts[2]
                     
-                    # 导入处理器
-                    from app.core.file_processor import FileProcessor
-                    from app.metadata.metadata_manager import MetadataManager
-                    
-                    config_manager = current_app.config.get('config_manager')
                     if config_manager:
-                        config = config_manager.get_config()
-                        metadata_manager = MetadataManager(config.get('tmdb_api_key', ''), config.get('douban_cookies', ''))
-                        file_processor = FileProcessor(metadata_manager, message_center)
+                        file_processor = get_file_processor(config_manager.get_config())
                         
                         # 处理单个文件
                         result = file_processor.process_file(source, target)
@@ -224,7 +243,7 @@ def setup_routes(app):
                         if result.get('success'):
                             message_center.mark_redo_processed(redo_id)
                         
-                        return jsonify({'success': True, 'result': result})
+                        return jsonify({'success': True, 'result': result.to_dict()})
             
             return jsonify({'success': False, 'error': '无法执行重做命令'}), 400
             
@@ -232,10 +251,57 @@ def setup_routes(app):
             logger.error(f"执行重做命令失败: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
     
+    @app.route('/api/metadata_stats', methods=['GET'])
+    def api_metadata_stats():
+        """元数据缓存和查询统计"""
+        metadata_manager = current_app.config.get('metadata_manager')
+        
+        if not metadata_manager:
+            return jsonify({})
+        
+        return jsonify(metadata_manager.get_stats())
+    
+    @app.route('/api/warm_cache', methods=['GET', 'POST'])
+    def api_warm_cache():
+        """预热元数据缓存（POST在后台开始预热，GET获取进度）"""
+        cache_warmer = current_app.config.get('cache_warmer')
+        
+        if not cache_warmer:
+            return jsonify({'success': False, 'error': '缓存预热未初始化'}), 500
+        
+        if request.method == 'GET':
+            return jsonify(cache_warmer.get_status())
+        
+        status = cache_warmer.get_status()
+        if status['running']:
+            return jsonify({'success': False, 'error': '缓存预热正在进行', 'status': status}), 409
+        
+        message_center = current_app.config.get('message_center')
+        
+        def run():
+            status = cache_warmer.warm()
+            if message_center:
+                message_center.add_system_message(
+                    f"元数据缓存预热完成: {status['titles']} 个标题, 找到 {status['found']}, 未找到 {status['missing']}",
+                    'info'
+                )
+        
+        threading.Thread(target=run, name='cache-warmer', daemon=True).start()
+        return jsonify({'success': True, 'message': '缓存预热已开始'})
+    
     @app.route('/api/health', methods=['GET'])
     def api_health():
-        """健康检查"""
-        return jsonify({
+        """健康检查（包含各元数据源的熔断器状态）"""
+        health = {
             'status': 'healthy',
             'service': 'plexrename'
-        })
\ No newline at end of file
+        }
+        
+        metadata_manager = current_app.config.get('metadata_manager')
+        if metadata_manager:
+            sources = metadata_manager.get_source_health()
+            health['metadata_sources'] = sources
+            if any(source['state'] != 'closed' for source in sources.values()):
+                health['status'] = 'degraded'
+        
+        return jsonify(health)
\ No newline at end of file
@@ -309,7 +309,7 @@ document.addEventListener('DOMContentLoaded', function() {
             btn.innerHTML = originalText;
             
             if (data.success) {
-                showNotification(`批量处理完成: 成功 ${data.success_count}, 失败 ${data.error_count}`, 'success');
+                showNotification(`批量处理完成: 成功 ${data.success_count}, 失败 ${data.error_count}, 跳过 ${data.skipped_count}, 待确认 ${data.needs_review_count}`, 'success');
                 // 重新加载消息
                 setTimeout(() => {
                     loadMessages();
@@ -366,7 +366,7 @@ document.addEventListener('DOMContentLoaded', function() {
             btn.innerHTML = originalText;
             
             if (data.success) {
-                showNotification(`比较处理完成: 成功 ${data.success_count}, 失败 ${data.error_count}`, 'success');
+                showNotification(`比较处理完成: 成功 ${data.success_count}, 失败 ${data.error_count}, 跳过 ${data.skipped_count}, 待确认 ${data.needs_review_count}`, 'success');
                 // 重新加载消息
                 setTimeout(() => {
                     loadMessages();
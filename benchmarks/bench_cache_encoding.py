@@ -0,0 +1,195 @@
+"""比较元数据缓存的磁盘占用和读取耗时：旧版每键一个缩进JSON文件 vs 精简字段 + 紧凑编码
+
+条目为TMDB电影详情和整季信息（1:9）的完整响应。
+
+用法: python benchmarks/bench_cache_encoding.py [条目数]
+"""
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.metadata.cache_store import CacheStore
+from app.metadata.cache_codec import decode_value
+from app.metadata.tmdb_client import TMDBClient
+
+PHRASES = ['一名专业的盗贼', '擅长在梦境中窃取秘密', '他接受了最后一个任务', '为了回到家人身边',
+           '团队必须深入三层梦境', '现实与梦境的界限逐渐模糊', '一场关于记忆与信念的冒险',
+           '在废墟之上重建生活', '两个家族之间的恩怨', '跨越半个世纪的爱情故事']
+COMPANIES = [('Warner Bros. Pictures', 'US'), ('Legendary Pictures', 'US'), ('Syncopy', 'GB'),
+             ('中国电影股份有限公司', 'CN'), ('博纳影业', 'CN'), ('Toho', 'JP')]
+
+
+def make_detail(rng: random.Random, tmdb_id: int) -> dict:
+    """生成与TMDB电影详情结构相同的完整响应"""
+    title = rng.choice(PHRASES)[:rng.randint(2, 6)] + str(tmdb_id)
+    return {
+        'adult': False,
+        'backdrop_path': f"/{tmdb_id:x}backdrop.jpg",
+        'belongs_to_collection': None,
+        'budget': rng.randint(0, 200) * 1000000,
+        'genres': [{'id': 28, 'name': '动作'}, {'id': 878, 'name': '科幻'}, {'id': 12, 'name': '冒险'}],
+        'homepage': f"https://example.com/movie/{tmdb_id}",
+        'id': tmdb_id,
+        'imdb_id': f"tt{tmdb_id:07d}",
+        'original_language': rng.choice(['en', 'zh', 'ja', 'ko']),
+        'original_title': f"Original Title {tmdb_id}",
+        'overview': '，'.join(rng.choice(PHRASES) for _ in range(rng.randint(4, 12))) + '。',
+        'popularity': round(rng.uniform(0, 500), 3),
+        'poster_path': f"/{tmdb_id:x}poster.jpg",
+        'production_companies': [
+            {'id': rng.randint(1, 99999), 'logo_path': f"/{rng.randint(1, 99999):x}.png", 'name': name,
+             'origin_country': country}
+            for name, country in rng.sample(COMPANIES, 3)
+        ],
+        'production_countries': [{'iso_3166_1': 'US', 'name': 'United States of America'}],
+        'release_date': f"{rng.randint(1950, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        'revenue': rng.randint(0, 900) * 1000000,
+        'runtime': rng.randint(80, 180),
+        'spoken_languages': [{'english_name': 'English', 'iso_639_1': 'en', 'name': 'English'},
+                             {'english_name': 'Mandarin', 'iso_639_1': 'zh', 'name': '普通话'}],
+        'status': 'Released',
+        'tagline': rng.choice(PHRASES),
+        'title': title,
+        'video': False,
+        'vote_average': round(rng.uniform(1, 10), 3),
+        'vote_count': rng.randint(0, 30000)
+    }
+
+
+def make_season(rng: random.Random, tv_id: int) -> dict:
+    """生成与TMDB整季响应结构相同的完整响应（每集带演职人员）"""
+    person = lambda: {'id': rng.randint(1, 10 ** 6), 'name': f"演员{rng.randint(1, 9999)}", 'gender': 2,
+                      'character': rng.choice(PHRASES)[:4], 'profile_path': f"/{rng.randint(1, 10 ** 6):x}.jpg",
+                      'credit_id': f"{rng.getrandbits(96):024x}", 'popularity': round(rng.uniform(0, 50), 3)}
+    return {
+        '_id': f"{rng.getrandbits(96):024x}",
+        'id': tv_id,
+        'name': '第 1 季',
+        'season_number': 1,
+        'overview': rng.choice(PHRASES),
+        'poster_path': f"/{tv_id:x}season.jpg",
+        'episodes': [{
+            'id': tv_id * 100 + number,
+            'name': f"第{number}集",
+            'overview': '，'.join(rng.choice(PHRASES) for _ in range(rng.randint(3, 8))) + '。',
+            'air_date': f"2020-01-{number:02d}",
+            'episode_number': number,
+            'season_number': 1,
+            'still_path': f"/{tv_id * 100 + number:x}still.jpg",
+            'runtime': rng.randint(40, 60),
+            'vote_average': round(rng.uniform(1, 10), 3),
+            'vote_count': rng.randint(0, 500),
+            'production_code': '',
+            'crew': [dict(person(), job='Director', department='Directing') for _ in range(3)],
+            'guest_stars': [person() for _ in range(rng.randint(2, 6))]
+        } for number in range(1, rng.randint(8, 24))]
+    }
+
+
+def trim(key: str, detail: dict) -> dict:
+    """按TMDBClient缓存时的方式精简"""
+    if key.startswith('season_'):
+        return {
+            'id': detail['id'],
+            'name': detail['name'],
+            'season_number': detail['season_number'],
+            'episodes': {str(item['episode_number']): {field: item[field] for field in TMDBClient.EPISODE_FIELDS
+                                                       if field in item}
+                         for item in detail['episodes']}
+        }
+    return {field: detail[field] for field in TMDBClient.RESULT_FIELDS['movie'] if field in detail}
+
+
+def dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def bench_json_files(cache_dir: Path, details):
+    """旧版实现：每个键一个 indent=2 的完整JSON文件"""
+    start = time.perf_counter()
+    for key, detail in details:
+        with open(cache_dir / f"{key}.json", 'w', encoding='utf-8') as f:
+            json.dump(detail, f, ensure_ascii=False, indent=2)
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    texts = []
+    for key, _ in details:
+        with open(cache_dir / f"{key}.json", 'r', encoding='utf-8') as f:
+            texts.append(f.read())
+            json.loads(texts[-1])
+    read_time = time.perf_counter() - start
+
+    return dir_size(cache_dir), write_time, read_time, parse_time(json.loads, texts)
+
+
+def parse_time(decode, payloads) -> float:
+    """只计算解码已读入内存的值的耗时"""
+    start = time.perf_counter()
+    for payload in payloads:
+        decode(payload)
+    return time.perf_counter() - start
+
+
+def bench_cache_store(cache_dir: Path, details, trimmed: bool, compress_threshold: int):
+    """CacheStore：可选精简字段，compress_threshold为0时只用紧凑JSON"""
+    store = CacheStore(str(cache_dir), memory_entries=0, compress_threshold=compress_threshold)
+
+    start = time.perf_counter()
+    for key, detail in details:
+        value = trim(key, detail) if trimmed else detail
+        store.set('tmdb', key, value)
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key, _ in details:
+        store.get('tmdb', key)
+    read_time = time.perf_counter() - start
+
+    payloads = [row[0] for row in store._conn.execute('SELECT value FROM entries')]
+    payload_bytes = store.get_stats()['bytes']
+    store.close()
+    return dir_size(cache_dir), write_time, read_time, parse_time(decode_value, payloads), payload_bytes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+    # 每10个条目中有1个整季信息，其余为电影详情
+    details = [(f"season_{10000 + i}_S01", make_season(rng, 10000 + i)) if i % 10 == 9 else
+               (f"movie_标题{i}", make_detail(rng, 10000 + i)) for i in range(count)]
+
+    rows = []
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        (temp_dir / 'json').mkdir()
+        size, write_time, read_time, parse = bench_json_files(temp_dir / 'json', details)
+        rows.append(('JSON文件 (indent=2, 完整)', size, size, write_time, read_time, parse))
+        for name, trimmed, threshold in (('SQLite 紧凑JSON, 完整', False, 0),
+                                      ('SQLite 紧凑JSON, 精简', True, 0),
+                                      ('SQLite 精简 + zlib', True, 1024)):
+            cache_dir = temp_dir / name.replace(' ', '_').replace(',', '')
+            size, write_time, read_time, parse, payload = bench_cache_store(cache_dir, details, trimmed, threshold)
+            rows.append((name, size, payload, write_time, read_time, parse))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    baseline = rows[0]
+    print(f"条目数: {count}")
+    # 读取包含CacheStore每次命中时更新访问时间的开销，解析只计算解码
+    print(f"{'方案':<26} {'磁盘':>10} {'值':>10} {'写入':>8} {'读取':>8} {'解析':>8}")
+    for name, size, payload, write_time, read_time, parse in rows:
+        print(f"{name:<26} {size / 1024 / 1024:8.1f}MB {payload / 1024 / 1024:8.1f}MB "
+              f"{write_time:7.2f}s {read_time:7.2f}s {parse:7.2f}s")
+    last = rows[-1]
+    print(f"值大小减少 {baseline[2] / last[2]:.1f} 倍，解析加快 {baseline[5] / last[5]:.1f} 倍")
+
+
+if __name__ == '__main__':
+    main()
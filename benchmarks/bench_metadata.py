@@ -0,0 +1,98 @@
+"""元数据查询端到端基准：冷缓存、热缓存、批量异步查询和故障注入
+
+使用本地替身服务（tests/fixtures/stub_server.py），不需要网络。
+用法: python benchmarks/bench_metadata.py [标题数] [--latency 秒] [--error-rate 比例]
+      [--throttle-rate 比例] [--replay 录制文件] [--concurrency 并发数]
+"""
+import sys
+import time
+import logging
+import shutil
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.metadata.metadata_manager import MetadataManager
+from tests.fixtures.stub_server import StubMetadataServer
+
+
+def make_items(count: int):
+    """生成查询参数：电影和电视剧各一半，其中约5%搜索不到"""
+    items = []
+    for i in range(count):
+        media_type = 'movie' if i % 2 == 0 else 'tv'
+        title = f"不存在的标题{i}" if i % 20 == 19 else f"基准标题{i}"
+        items.append({'title': title, 'media_type': media_type})
+    return items
+
+
+def make_manager(server: StubMetadataServer, cache_dir: str) -> MetadataManager:
+    return MetadataManager({
+        'cache_dir': cache_dir,
+        'tmdb_api_key': 'bench',
+        'tmdb_base_url': server.tmdb_base_url,
+        'douban_base_url': server.douban_base_url,
+        'rate_limits': {},
+        'retry_base_delay': 0.05,
+        'retry_max_delay': 1.0
+    })
+
+
+def run_sequential(manager, items):
+    for item in items:
+        manager.get_metadata(item['title'], item['media_type'])
+
+
+def run_batch(manager, items, concurrency):
+    asyncio.run(manager.get_metadata_many(items, concurrency))
+
+
+def measure(name, server, manager, fn, *args):
+    server.reset_stats()
+    start = time.perf_counter()
+    fn(manager, *args)
+    elapsed = time.perf_counter() - start
+    retries = sum(stats['retries'] for stats in manager.rate_limiter.get_stats().values())
+    status = ', '.join(f"{code}: {count}" for code, count in sorted(server.stats['status'].items()))
+    print(f"{name:<10} {elapsed:8.2f}s  请求 {server.stats['requests']:5d}  重试 {retries:4d}  状态 {{{status}}}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='元数据查询端到端基准')
+    parser.add_argument('count', type=int, nargs='?', default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--replay', help='从录制文件回放响应（默认生成响应）')
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    # 未找到和重试的日志会淹没结果
+    logging.basicConfig(level=logging.ERROR)
+    items = make_items(args.count)
+    server = StubMetadataServer(
+        mode='replay' if args.replay else 'synthetic', cassette=args.replay, latency=args.latency,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, retry_after=0.1,
+        missing=[item['title'] for item in items if item['title'].startswith('不存在')]
+    )
+    print(f"标题数: {args.count}  延迟: {args.latency * 1000:.0f}ms  "
+          f"500比例: {args.error_rate}  429比例: {args.throttle_rate}")
+
+    with server:
+        for name, fn, fn_args in (('顺序查询', run_sequential, ()),
+                                  ('批量异步', run_batch, (args.concurrency,))):
+            cache_dir = tempfile.mkdtemp()
+            manager = make_manager(server, cache_dir)
+            try:
+                measure(f"{name}-冷", server, manager, fn, items, *fn_args)
+                measure(f"{name}-热", server, manager, fn, items, *fn_args)
+            finally:
+                manager.close()
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
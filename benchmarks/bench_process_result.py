@@ -0,0 +1,91 @@
+"""比较批量处理结果的内存占用：每文件字典 vs ProcessResult
+
+用法: python benchmarks/bench_process_result.py [文件数]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.process_result import ProcessResult, ProcessOutcome
+
+
+def make_paths(count: int):
+    """生成测试路径（两种方案共用，不计入结果内存）"""
+    dest_dir = '/dest/tv'
+    paths = []
+    for i in range(count):
+        source = f"/source/tv/某部电视剧.S{i // 1000 + 1:02d}E{i % 1000:03d}.1080p.WEB-DL.mkv"
+        destination = f"{dest_dir}/某部电视剧/Season {i // 1000 + 1:02d}/某部电视剧 - S{i // 1000 + 1:02d}E{i % 1000:03d}.mkv"
+        paths.append((source, destination))
+    return dest_dir, paths
+
+
+def build_dicts(dest_dir, paths):
+    """原有实现：每个文件一个五键字典，消息立即格式化"""
+    results = []
+    for i, (source, destination) in enumerate(paths):
+        if i % 10 == 0:
+            results.append({
+                'success': False,
+                'source': source,
+                'destination': None,
+                'message': "创建硬链接失败",
+                'redo_command': f"/redo {source} {dest_dir}"
+            })
+        else:
+            results.append({
+                'success': True,
+                'source': source,
+                'destination': destination,
+                'message': f"成功处理文件: {os.path.basename(source)} -> {os.path.basename(destination)}",
+                'redo_command': None
+            })
+    return results
+
+
+def build_records(dest_dir, paths):
+    """新实现：__slots__ 结果记录，消息延迟生成"""
+    results = []
+    for i, (source, destination) in enumerate(paths):
+        result = ProcessResult(source, dest_dir)
+        if i % 10 == 0:
+            result.set_outcome(ProcessOutcome.LINK_FAILED)
+        else:
+            result.set_outcome(ProcessOutcome.SUCCESS, destination=destination)
+        results.append(result)
+    return results
+
+
+def measure(builder, dest_dir, paths):
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = builder(dest_dir, paths)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, current, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    dest_dir, paths = make_paths(count)
+
+    dicts, dict_bytes, dict_time = measure(build_dicts, dest_dir, paths)
+    del dicts
+    records, record_bytes, record_time = measure(build_records, dest_dir, paths)
+
+    # 序列化时才生成消息，确认结果一致
+    assert records[1].to_dict()['message'].startswith('成功处理文件')
+
+    print(f"文件数: {count}")
+    print(f"字典:          {dict_bytes / 1024 / 1024:8.1f} MiB  构建 {dict_time:.2f}s")
+    print(f"ProcessResult: {record_bytes / 1024 / 1024:8.1f} MiB  构建 {record_time:.2f}s")
+    print(f"内存减少: {(1 - record_bytes / dict_bytes) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,12 @@ setup(
         'eventlet>=0.33.0'
     ],
     extras_require={
+        'async': [
+            'aiohttp>=3.8.0'
+        ],
+        'opencc': [
+            'opencc-python-reimplemented>=0.1.7'
+        ],
         'dev': [
             'pytest>=6.0.0',
             'black>=21.0.0',
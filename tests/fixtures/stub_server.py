@@ -0,0 +1,370 @@
+"""本地TMDB/豆瓣替身服务
+
+在没有网络的机器上端到端测试和基准测试缓存、并发和重试：
+
+- synthetic: 按请求参数生成确定的响应，任意标题都能搜索到
+- record:    将请求转发到真实API，并把响应写入录制文件（cassette）
+- replay:    只从录制文件返回响应，未录制的请求返回404
+
+所有模式都支持固定或随机延迟、按比例注入500错误和429限流（带Retry-After），
+以及ETag条件请求（返回304）。客户端通过 tmdb_base_url / douban_base_url 指向该服务。
+
+独立运行（录制真实响应）:
+    python -m tests.fixtures.stub_server --mode record --cassette cassette.json --port 8765
+"""
+import sys
+import json
+import time
+import zlib
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from pathlib import Path
+
+# 录制模式转发的真实API地址
+UPSTREAM = {
+    'tmdb': 'https://api.themoviedb.org',
+    'douban': 'https://movie.douban.com'
+}
+# 录制模式转发的请求头（豆瓣需要Cookie和Referer）
+FORWARD_HEADERS = ('User-Agent', 'Accept', 'Referer', 'Cookie')
+# 不计入录制键的查询参数
+IGNORED_PARAMS = {'api_key'}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """将请求交给所属的StubMetadataServer处理"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，关闭Nagle算法避免每个请求多出约40ms的延迟确认
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        status, headers, body = self.server.stub.handle(self.path, self.headers)
+        data = b'' if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        if status != 304:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        for name, value in headers.items():
+            if value:
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    """客户端断开保持的连接时不打印异常"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+
+class StubMetadataServer:
+    """本地TMDB/豆瓣替身服务（在后台线程中运行）"""
+
+    MODES = ('synthetic', 'record', 'replay')
+
+    def __init__(self, mode: str = 'synthetic', cassette: Union[str, Path] = None,
+                 latency: Union[float, Tuple[float, float]] = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: float = 1, seed: int = 0,
+                 missing: Iterable[str] = (), episodes_per_season: int = 10,
+                 upstream: Dict[str, str] = None, host: str = '127.0.0.1', port: int = 0):
+        """初始化替身服务
+
+        latency为每个请求的延迟秒数，或 (最小, 最大) 随机延迟；error_rate/throttle_rate为
+        返回500/429的比例；missing中的标题在synthetic模式下搜索不到；port为0时自动选择端口。
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"未知的模式: {mode}")
+        if mode in ('record', 'replay') and not cassette:
+            raise ValueError(f"{mode}模式需要指定录制文件")
+
+        self.mode = mode
+        self.cassette_path = Path(cassette) if cassette else None
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.missing = {title.lower() for title in missing}
+        self.episodes_per_season = episodes_per_season
+        self.upstream = dict(UPSTREAM, **(upstream or {}))
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._titles: Dict[Tuple[str, int], str] = {}
+        self.cassette: Dict[str, Dict] = {}
+        if self.cassette_path and self.cassette_path.exists():
+            with open(self.cassette_path, 'r', encoding='utf-8') as f:
+                self.cassette = json.load(f)
+
+        self.stats = {'requests': 0, 'status': {}, 'paths': {}}
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def tmdb_base_url(self) -> str:
+        return f"{self.url}/3"
+
+    @property
+    def douban_base_url(self) -> str:
+        return self.url
+
+    def start(self) -> 'StubMetadataServer':
+        """在后台线程中启动服务"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='stub-metadata-server',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务，录制模式下保存录制文件"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+        if self.mode == 'record':
+            self.save_cassette()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def save_cassette(self):
+        """保存录制的响应"""
+        with self._lock:
+            data = dict(self.cassette)
+        self.cassette_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cassette_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    def reset_stats(self):
+        """清空请求统计"""
+        with self._lock:
+            self.stats = {'requests': 0, 'status': {}, 'paths': {}}
+
+    def handle(self, raw_path: str, headers) -> Tuple[int, Dict, Optional[object]]:
+        """处理一个请求，返回 (状态码, 响应头, JSON响应体)"""
+        parts = urlsplit(raw_path)
+        path = parts.path
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+
+        delay, fault = self._draw()
+        if delay > 0:
+            time.sleep(delay)
+
+        if fault == 429:
+            response = (429, {'Retry-After': str(self.retry_after)}, {'status_message': 'Too Many Requests'})
+        elif fault == 500:
+            response = (500, {}, {'status_message': 'Internal Server Error'})
+        elif self.mode == 'synthetic':
+            response = self._synthetic(path, query)
+        elif self.mode == 'replay':
+            response = self._replay(path, query)
+        else:
+            response = self._record(raw_path, path, query, headers)
+
+        status, response_headers, body = response
+        if status == 200:
+            etag = response_headers.get('ETag') or self._etag(body)
+            response_headers = dict(response_headers, ETag=etag)
+            if headers.get('If-None-Match') == etag:
+                status, body = 304, None
+
+        self._count(path, status)
+        return status, response_headers, body
+
+    def _draw(self) -> Tuple[float, Optional[int]]:
+        """抽取本次请求的延迟和注入的错误"""
+        with self._lock:
+            if isinstance(self.latency, (tuple, list)):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = float(self.latency or 0)
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return delay, 429
+        if roll < self.throttle_rate + self.error_rate:
+            return delay, 500
+        return delay, None
+
+    def _count(self, path: str, status: int):
+        """记录请求统计"""
+        route = self._route(path)
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['status'][status] = self.stats['status'].get(status, 0) + 1
+            self.stats['paths'][route] = self.stats['paths'].get(route, 0) + 1
+
+    @staticmethod
+    def _route(path: str) -> str:
+        """统计用的路由名（ID替换为占位符，保留TMDB的版本号）"""
+        return '/'.join('{id}' if part.isdigit() and i > 1 else part for i, part in enumerate(path.split('/')))
+
+    @staticmethod
+    def _etag(body) -> str:
+        digest = hashlib.md5(json.dumps(body, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        return f'"{digest[:16]}"'
+
+    @staticmethod
+    def cassette_key(path: str, query: Dict) -> str:
+        """录制文件中的请求键：路径和排序后的查询参数（不含api_key）"""
+        params = sorted((k, v) for k, v in query.items() if k not in IGNORED_PARAMS)
+        return f"{path}?{urlencode(params)}" if params else path
+
+    def _replay(self, path: str, query: Dict) -> Tuple[int, Dict, object]:
+        """从录制文件返回响应"""
+        recorded = self.cassette.get(self.cassette_key(path, query))
+        if recorded is None:
+            return 404, {}, {'status_message': f"未录制的请求: {self.cassette_key(path, query)}"}
+        return recorded['status'], dict(recorded.get('headers') or {}), recorded['body']
+
+    def _record(self, raw_path: str, path: str, query: Dict, headers) -> Tuple[int, Dict, object]:
+        """转发到真实API并录制响应"""
+        import requests
+
+        source = 'tmdb' if path.startswith('/3/') else 'douban'
+        forward = {name: headers[name] for name in FORWARD_HEADERS if headers.get(name)}
+        try:
+            response = requests.get(f"{self.upstream[source]}{raw_path}", headers=forward, timeout=30)
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            return 502, {}, {'status_message': f"转发失败: {str(e)}"}
+
+        recorded = {
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in ('ETag', 'Last-Modified')
+                        if name in response.headers},
+            'body': body
+        }
+        # 只录制成功和确定不存在的响应，限流和临时错误不录制
+        if response.status_code in (200, 404):
+            with self._lock:
+                self.cassette[self.cassette_key(path, query)] = recorded
+        return recorded['status'], dict(recorded['headers']), body
+
+    def _synthetic(self, path: str, query: Dict) -> Tuple[int, Dict, object]:
+        """按请求参数生成确定的响应"""
+        parts = [part for part in path.split('/') if part]
+        if parts[:2] == ['j', 'subject_suggest']:
+            return 200, {}, self._douban_suggest(query.get('q', ''))
+        if parts[:1] != ['3']:
+            return 404, {}, {'status_message': 'Not Found'}
+
+        parts = parts[1:]
+        if len(parts) == 2 and parts[0] == 'search' and parts[1] in ('movie', 'tv'):
+            return 200, {}, self._search(parts[1], query.get('query', ''), query)
+        if len(parts) == 2 and parts[0] in ('movie', 'tv') and parts[1].isdigit():
+            return 200, {}, self._details(parts[0], int(parts[1]))
+        if len(parts) == 4 and parts[0] == 'tv' and parts[2] == 'season' and parts[3].isdigit():
+            return 200, {}, self._season(int(parts[1]), int(parts[3]))
+        return 404, {}, {'status_message': 'Not Found'}
+
+    def _media_id(self, media_type: str, title: str) -> int:
+        """标题对应的确定ID"""
+        tmdb_id = zlib.crc32(f"{media_type}:{title.lower()}".encode('utf-8')) % 900000 + 100000
+        with self._lock:
+            self._titles[(media_type, tmdb_id)] = title
+        return tmdb_id
+
+    def _item(self, media_type: str, tmdb_id: int, title: str, year: str = None) -> Dict:
+        date = f"{year or 2000 + tmdb_id % 20}-01-01"
+        item = {
+            'id': tmdb_id,
+            'overview': f"{title} 的简介",
+            'poster_path': f"/{tmdb_id}.jpg",
+            'original_language': 'zh',
+            'popularity': round(tmdb_id % 1000 / 10, 1),
+            'vote_count': tmdb_id % 5000
+        }
+        if media_type == 'movie':
+            item.update({'title': title, 'original_title': title, 'release_date': date})
+        else:
+            item.update({'name': title, 'original_name': title, 'first_air_date': date})
+        return item
+
+    def _search(self, media_type: str, title: str, query: Dict) -> Dict:
+        if not title or title.lower() in self.missing:
+            return {'page': 1, 'results': [], 'total_results': 0}
+        year = query.get('year') or query.get('first_air_date_year')
+        item = self._item(media_type, self._media_id(media_type, title), title, year)
+        return {'page': 1, 'results': [item], 'total_results': 1}
+
+    def _details(self, media_type: str, tmdb_id: int) -> Dict:
+        with self._lock:
+            title = self._titles.get((media_type, tmdb_id), f"{media_type} {tmdb_id}")
+        item = self._item(media_type, tmdb_id, title)
+        item['genres'] = [{'id': 18, 'name': '剧情'}]
+        return item
+
+    def _season(self, tv_id: int, season: int) -> Dict:
+        episodes = [{
+            'id': tv_id * 1000 + season * 100 + number,
+            'name': f"第{number}集",
+            'overview': '',
+            'air_date': f"2020-{season % 12 + 1:02d}-{min(number, 28):02d}",
+            'episode_number': number,
+            'season_number': season,
+            'runtime': 45
+        } for number in range(1, self.episodes_per_season + 1)]
+        return {'id': tv_id * 100 + season, 'name': f"第 {season} 季", 'season_number': season,
+                'episodes': episodes}
+
+    def _douban_suggest(self, title: str) -> list:
+        if not title or title.lower() in self.missing:
+            return []
+        return [{
+            'title': title,
+            'original_title': title,
+            'year': str(2000 + self._media_id(media_type, title) % 20),
+            'type': media_type,
+            'id': str(self._media_id(media_type, title)),
+            'img': ''
+        } for media_type in ('movie', 'tv')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地TMDB/豆瓣替身服务')
+    parser.add_argument('--mode', choices=StubMetadataServer.MODES, default='synthetic')
+    parser.add_argument('--cassette', help='录制文件路径（record/replay模式）')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回500的比例')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='返回429的比例')
+    args = parser.parse_args()
+
+    server = StubMetadataServer(mode=args.mode, cassette=args.cassette, latency=args.latency,
+                                error_rate=args.error_rate, throttle_rate=args.throttle_rate, port=args.port)
+    server.start()
+    print(f"替身服务已启动: tmdb_base_url={server.tmdb_base_url} douban_base_url={server.douban_base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"请求统计: {json.dumps(server.stats, ensure_ascii=False)}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.metadata.cache_store import CacheStore
+from app.metadata.id_index import IdIndex
+from app.metadata.cache_keys import canonicalize_key, search_key
+
+
+class TestCacheStore(unittest.TestCase):
+    """元数据缓存存储测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = CacheStore(self.temp_dir)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_namespaces_are_separate(self):
+        self.store.set('tmdb', 'movie_盗梦空间', {'id': 27205})
+        self.store.set('douban', 'movie_盗梦空间', {'id': '3541415'})
+
+        self.assertEqual(self.store.get('tmdb', 'movie_盗梦空间'), {'id': 27205})
+        self.assertEqual(self.store.get('douban', 'movie_盗梦空间'), {'id': '3541415'})
+        self.assertIsNone(self.store.get('tmdb', 'movie_missing'))
+
+    def test_entry_expires(self):
+        self.store.set('tmdb', 'short', {'id': 1}, ttl=0.05)
+        self.store.set('tmdb', 'forever', {'id': 2}, ttl=0)
+        time.sleep(0.1)
+
+        self.assertIsNone(self.store.get('tmdb', 'short'))
+        self.assertEqual(self.store.get('tmdb', 'forever'), {'id': 2})
+
+    def test_stale_grace_only_for_refreshable_entries(self):
+        self.store.stale_grace = 0.2
+        self.store.set('tmdb', 'plain', {'id': 1}, ttl=0.05)
+        self.store.set('tmdb', 'refreshable', {'id': 2}, ttl=0.05, validators={'refresh': {'kind': 'search'}})
+        time.sleep(0.1)
+
+        self.assertIsNone(self.store.get('tmdb', 'plain'))
+        self.assertEqual(self.store.get('tmdb', 'refreshable'), {'id': 2})
+        self.assertEqual(self.store.get_stats()['stale_hits'], 1)
+
+        time.sleep(0.2)
+        self.assertIsNone(self.store.get('tmdb', 'refreshable'))
+
+    def test_lru_eviction_by_entry_count(self):
+        self.store.max_entries = 2
+        self.store.set('tmdb', 'a', {'id': 1})
+        time.sleep(0.01)
+        self.store.set('tmdb', 'b', {'id': 2})
+        time.sleep(0.01)
+        # 访问a使b成为最久未使用的条目
+        self.store.get('tmdb', 'a')
+        time.sleep(0.01)
+        self.store.set('tmdb', 'c', {'id': 3})
+
+        self.assertIsNotNone(self.store.get('tmdb', 'a'))
+        self.assertIsNone(self.store.get('tmdb', 'b'))
+        self.assertEqual(self.store.get_stats()['entries'], 2)
+
+    def test_eviction_by_bytes(self):
+        self.store.max_bytes = 100
+        for i in range(10):
+            self.store.set('tmdb', f"key_{i}", {'overview': 'x' * 30})
+
+        self.assertLessEqual(self.store.get_stats()['bytes'], 100)
+        self.assertIsNotNone(self.store.get('tmdb', 'key_9'))
+
+    def test_migrate_json_files(self):
+        json_dir = os.path.join(self.temp_dir, 'legacy')
+        os.makedirs(json_dir)
+        files = {
+            'movie_盗梦空间_2010.json': {'id': 27205, 'title': '盗梦空间', 'runtime': 148},
+            'movie_无间道.json': {'title': '无间道', 'original_title': '無間道', 'year': '2002',
+                               'type': 'movie', 'id': '1307914', 'cover': ''},
+            'episode_1399_S01E01.json': {'id': 63056, 'name': '凛冬将至'},
+            'tmdb_ids.json': {'movie': {'盗梦空间': 27205}},
+        }
+        for name, data in files.items():
+            with open(os.path.join(json_dir, name), 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+
+        self.assertEqual(self.store.migrate_json_files(json_dir), 3)
+
+        self.assertEqual(self.store.get('tmdb', 'movie_盗梦空间_2010')['runtime'], 148)
+        self.assertEqual(self.store.get('douban', 'movie_无间道')['id'], '1307914')
+        self.assertEqual(self.store.get('tmdb', 'episode_1399_S01E01')['id'], 63056)
+        self.assertEqual(os.listdir(json_dir), ['tmdb_ids.json'])
+        # 迁移只执行一次
+        self.assertEqual(self.store.migrate_json_files(json_dir), 0)
+
+    def test_memory_tier_serves_repeated_reads(self):
+        self.store.set('tmdb', 'tv_权力的游戏', {'id': 1399})
+        # 新实例的内存层为空，第一次读取来自磁盘
+        store = CacheStore(self.temp_dir, memory_entries=10)
+        try:
+            for _ in range(24):
+                self.assertEqual(store.get('tmdb', 'tv_权力的游戏'), {'id': 1399})
+            tiers = store.get_stats()['tiers']
+            self.assertEqual(tiers['disk']['hits'], 1)
+            self.assertEqual(tiers['memory']['hits'], 23)
+        finally:
+            store.close()
+
+    def test_memory_tier_bounded_by_bytes(self):
+        store = CacheStore(os.path.join(self.temp_dir, 'bytes'), memory_entries=0, memory_bytes=200)
+        try:
+            for i in range(10):
+                store.set('tmdb', f"key_{i}", {'overview': 'x' * 50})
+            self.assertLessEqual(store.memory.get_stats()['bytes'], 200)
+            self.assertGreater(store.memory.evictions, 0)
+        finally:
+            store.close()
+
+    def test_migrate_keys_merges_duplicates(self):
+        self.store.set('tmdb', 'movie_The Office_2005', {'id': 2316})
+        time.sleep(0.01)
+        self.store.set('tmdb', 'movie_the.office_2005', {'id': 9999})
+        self.store.set_not_found('douban', 'all_權力的遊戲', ttl=3600)
+        self.store.set('douban', 'all_权力的游戏', {'id': '3016187'})
+        self.store.set('tmdb', 'episode_1399_S01E01', {'id': 63056})
+        for _ in range(3):
+            self.store.get('tmdb', 'movie_The Office_2005')
+
+        self.assertEqual(self.store.migrate_keys(canonicalize_key, 'keys_canonical'), 2)
+
+        self.assertEqual(self.store.get('tmdb', search_key('movie', 'THE OFFICE', '2005'))['id'], 9999)
+        self.assertEqual(self.store.get('douban', search_key('all', '权力的游戏')), {'id': '3016187'})
+        self.assertEqual(self.store.get('tmdb', 'episode_1399_S01E01')['id'], 63056)
+        self.assertEqual(self.store.get_stats()['entries'], 3)
+        hot = self.store.get_hot_keys(1)[0]
+        self.assertEqual((hot['key'], hot['hits']), ('movie_theoffice_2005', 4))
+        # 迁移只执行一次
+        self.assertEqual(self.store.migrate_keys(canonicalize_key, 'keys_canonical'), 0)
+
+    def test_hits_counted_across_tiers(self):
+        self.store.set('tmdb', 'tv_权力的游戏', {'id': 1399})
+        for _ in range(5):
+            self.store.get('tmdb', 'tv_权力的游戏')
+
+        self.assertEqual(self.store.get_stats()['hot_keys'],
+                         [{'namespace': 'tmdb', 'key': 'tv_权力的游戏', 'hits': 5}])
+
+    def test_large_values_are_compressed(self):
+        overview = '一名专业的盗贼，擅长在人们梦境最深处潜入并窃取秘密。' * 20
+        self.store.set('tmdb', 'movie_盗梦空间', {'id': 27205, 'overview': overview})
+        self.store.set('tmdb', 'movie_星际穿越', {'id': 157336})
+
+        rows = dict(self.store._conn.execute('SELECT key, value FROM entries'))
+        self.assertEqual(rows['movie_盗梦空间'][:1], b'\x01')
+        self.assertLess(len(rows['movie_盗梦空间']), len(overview.encode('utf-8')) // 5)
+        self.assertEqual(rows['movie_星际穿越'][:1], b'\x00')
+
+        self.store.memory.clear()
+        self.assertEqual(self.store.get('tmdb', 'movie_盗梦空间')['overview'], overview)
+
+    def test_legacy_text_values_readable_and_reencoded(self):
+        legacy = json.dumps({'id': 1399, 'name': '权力的游戏'}, ensure_ascii=False, indent=2)
+        self.store._conn.execute(
+            'INSERT INTO entries (namespace, key, value, size, created_at, expires_at, last_access) '
+            'VALUES (?, ?, ?, ?, ?, NULL, ?)',
+            ('tmdb', 'tv_权力的游戏', legacy, len(legacy.encode('utf-8')), time.time(), time.time())
+        )
+        self.store._conn.commit()
+
+        self.assertEqual(self.store.get('tmdb', 'tv_权力的游戏')['id'], 1399)
+        self.assertEqual(self.store.migrate_encoding(), 1)
+
+        value, size = self.store._conn.execute('SELECT value, size FROM entries').fetchone()
+        self.assertIsInstance(value, bytes)
+        self.assertLess(size, len(legacy.encode('utf-8')))
+        self.store.memory.clear()
+        self.assertEqual(self.store.get('tmdb', 'tv_权力的游戏')['name'], '权力的游戏')
+        self.assertEqual(self.store.migrate_encoding(), 0)
+
+
+class TestIdIndex(unittest.TestCase):
+    """追加写入的ID索引测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, 'tmdb_ids.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_appends_and_reloads(self):
+        index = IdIndex(self.index_file)
+        index.set('movie', '盗梦空间', 27205)
+        index.set('tv', '权力的游戏', 1399)
+        index.close()
+
+        # 模拟崩溃时写了一半的最后一行
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write('{"c": "movie", "k": "半')
+
+        index = IdIndex(self.index_file)
+        self.assertEqual(index.get('movie', '盗梦空间'), 27205)
+        self.assertEqual(index.get('tv', '权力的游戏'), 1399)
+        self.assertIsNone(index.get('movie', '半'))
+        index.close()
+
+    def test_append_after_truncated_line_survives_reload(self):
+        index = IdIndex(self.index_file)
+        index.set('movie', '盗梦空间', 27205)
+        index.close()
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write('{"c": "movie", "k": "半')
+
+        # 重启后追加的第一条记录不能接在不完整的行后面
+        index = IdIndex(self.index_file)
+        index.set('movie', '星际穿越', 157336)
+        index.close()
+
+        index = IdIndex(self.index_file)
+        self.assertEqual(index.get('movie', '星际穿越'), 157336)
+        self.assertEqual(index.get('movie', '盗梦空间'), 27205)
+        index.close()
+
+    def test_compaction_keeps_other_instance_records(self):
+        first = IdIndex(self.index_file)
+        second = IdIndex(self.index_file)
+        second.set('tv', '权力的游戏', 1399)
+        first.set('movie', '盗梦空间', 27205)
+        first.compact()
+        second.set('movie', '星际穿越', 157336)
+        first.close()
+        second.close()
+
+        index = IdIndex(self.index_file)
+        self.assertEqual(index.get('tv', '权力的游戏'), 1399)
+        self.assertEqual(index.get('movie', '盗梦空间'), 27205)
+        self.assertEqual(index.get('movie', '星际穿越'), 157336)
+        index.close()
+
+    def test_imports_legacy_json(self):
+        legacy_file = os.path.join(self.temp_dir, 'tmdb_ids.json')
+        with open(legacy_file, 'w', encoding='utf-8') as f:
+            json.dump({'movie': {'盗梦空间': 27205}}, f, ensure_ascii=False)
+
+        index = IdIndex(self.index_file, legacy_file=legacy_file)
+        self.assertEqual(index.get('movie', '盗梦空间'), 27205)
+        index.close()
+        self.assertTrue(os.path.exists(self.index_file))
+
+    def test_compaction(self):
+        index = IdIndex(self.index_file, min_compact_lines=10)
+        for i in range(25):
+            index.set('movie', '同一部电影', i)
+        index.close()
+
+        with open(self.index_file, encoding='utf-8') as f:
+            self.assertLess(len(f.readlines()), 10)
+        self.assertEqual(IdIndex(self.index_file).get('movie', '同一部电影'), 24)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.cache_warmer import CacheWarmer
+from app.core.file_processor import FileProcessor
+from app.metadata.metadata_manager import MetadataManager
+
+
+class RecordingTMDBClient:
+    """记录查询参数的TMDB客户端"""
+
+    def __init__(self):
+        self.calls = []
+
+    def search_movie(self, title, year=None, **kwargs):
+        self.calls.append(('movie', title, year))
+        return {'id': 1, 'title': title}
+
+    def search_tv(self, title, year=None, **kwargs):
+        self.calls.append(('tv', title, year))
+        return None
+
+    def close(self):
+        pass
+
+
+class TestCacheWarmer(unittest.TestCase):
+    """元数据缓存预热测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        movies = os.path.join(self.temp_dir, 'source', 'movies')
+        shows = os.path.join(self.temp_dir, 'source', 'tv')
+        self.dest_dir = os.path.join(self.temp_dir, 'dest')
+        for path, names in ((movies, ['inception.mkv', 'Inception.mp4', 'notes.txt']),
+                            (os.path.join(shows, 'sub'), ['the_office.mkv']),
+                            (shows, ['friends.mkv'])):
+            os.makedirs(path, exist_ok=True)
+            for name in names:
+                Path(path, name).touch()
+        # 目标库中已有的文件夹不需要查询
+        os.makedirs(os.path.join(self.dest_dir, 'friends'))
+
+        config = {
+            'cache_dir': os.path.join(self.temp_dir, 'cache'),
+            'directory_configs': [
+                {'source_dir': movies, 'dest_dir': self.dest_dir, 'media_type': 'movie', 'year': '2010'},
+                {'source_dir': shows, 'dest_dir': self.dest_dir, 'media_type': 'tv'},
+            ]
+        }
+        self.manager = MetadataManager(config)
+        self.manager.tmdb_client = RecordingTMDBClient()
+        self.manager.fallback_enabled = False
+        self.warmer = CacheWarmer(FileProcessor(config), self.manager, concurrency=4)
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_warm_deduplicates_titles(self):
+        progress = []
+        status = self.warmer.warm(progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(status['files'], 4)
+        self.assertEqual(status['titles'], 2)
+        self.assertEqual((status['found'], status['missing']), (1, 1))
+        self.assertFalse(status['running'])
+        self.assertEqual(sorted(self.manager.tmdb_client.calls),
+                         [('movie', 'inception', '2010'), ('tv', 'the office', None)])
+        self.assertEqual(progress[-1], (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config.config_manager import ConfigManager
+from app.core.file_processor import FileProcessor
+from app.core.process_result import ProcessResult, ProcessOutcome
+
+
+class TestProcessResult(unittest.TestCase):
+    """处理结果记录测试"""
+
+    def test_success_serialization(self):
+        result = ProcessResult('/source/a.mkv', '/dest')
+        result.set_outcome(ProcessOutcome.SUCCESS, destination='/dest/A/A (2010).mkv')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result.to_dict(), {
+            'success': True,
+            'source': '/source/a.mkv',
+            'destination': '/dest/A/A (2010).mkv',
+            'message': '成功处理文件: a.mkv -> A (2010).mkv',
+            'redo_command': None
+        })
+
+    def test_failure_has_redo_command(self):
+        result = ProcessResult('/source/a.mkv', '/dest')
+        result.set_outcome(ProcessOutcome.PROCESS_ERROR, error='boom')
+
+        self.assertFalse(result.get('success'))
+        self.assertEqual(result.get('message'), '处理失败: boom')
+        self.assertEqual(result['redo_command'], '/redo /source/a.mkv /dest')
+        self.assertNotIn('skipped', result)
+        self.assertIsNone(result.get('skipped'))
+
+
+class CountingMetadataClient:
+    """记录调用次数的元数据客户端"""
+
+    def __init__(self, metadata=None):
+        self.metadata = metadata
+        self.calls = []
+
+    def get_metadata(self, title, media_type=None, year=None, **kwargs):
+        self.calls.append((title, media_type, year, kwargs))
+        return self.metadata
+
+
+class TestFileProcessor(unittest.TestCase):
+    """文件处理器测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.temp_dir, 'source')
+        self.dest_dir = os.path.join(self.temp_dir, 'dest')
+        os.makedirs(self.source_dir)
+        os.makedirs(self.dest_dir)
+        self.processor = FileProcessor(config={})
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _create_file(self, relative_path: str) -> str:
+        path = os.path.join(self.source_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write('dummy content')
+        return path
+
+    def test_batch_process_returns_records(self):
+        self._create_file('Movie.2010.1080p.mkv')
+
+        results = self.processor.batch_process(self.source_dir, self.dest_dir)
+
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0].success)
+        self.assertTrue(os.path.exists(results[0].destination))
+
+    def test_existing_library_folder_skips_metadata(self):
+        """标题匹配已有文件夹时直接复用，不查询元数据"""
+        os.makedirs(os.path.join(self.dest_dir, 'The Office'))
+        source = self._create_file('the_office.mkv')
+        client = CountingMetadataClient({'title': '办公室'})
+        self.processor.set_metadata_client(client)
+
+        result = self.processor.process_file(source, self.dest_dir)
+
+        self.assertTrue(result.success)
+        self.assertEqual(client.calls, [])
+        self.assertEqual(os.path.basename(os.path.dirname(result.destination)), 'The Office')
+
+    def test_metadata_title_reuses_existing_folder(self):
+        """元数据标题与已有文件夹仅拼写不同时沿用已有文件夹"""
+        os.makedirs(os.path.join(self.dest_dir, 'Spider-Man'))
+        source = self._create_file('spiderman film.mkv')
+        self.processor.set_metadata_client(CountingMetadataClient({'title': 'spider man'}))
+
+        result = self.processor.process_file(source, self.dest_dir)
+
+        self.assertEqual(os.path.basename(os.path.dirname(result.destination)), 'Spider-Man')
+
+    def test_library_index_updated_incrementally(self):
+        """新建的文件夹会加入索引"""
+        client = CountingMetadataClient({'title': 'Some Show'})
+        self.processor.set_metadata_client(client)
+
+        self.processor.process_file(self._create_file('some show a.mkv'), self.dest_dir)
+        self.assertEqual(self.processor.library_index.resolve(self.dest_dir, 'SOME.SHOW'), 'Some Show')
+
+    def test_config_update_rescans_library_and_moves_snapshots(self):
+        """配置更新后媒体库索引按新的目录树重建，快照改用新的目录"""
+        config_manager = ConfigManager(os.path.join(self.temp_dir, 'config.json'))
+        config_manager.add_listener(self.processor.update_config)
+        self.processor.set_metadata_client(CountingMetadataClient({'title': 'Some Show'}))
+        self.processor.process_file(self._create_file('some show a.mkv'), self.dest_dir)
+        self.processor._get_snapshot(self.source_dir)
+        shutil.rmtree(os.path.join(self.dest_dir, 'Some Show'))
+
+        snapshot_dir = os.path.join(self.temp_dir, 'snapshots')
+        config_manager.update_config({'snapshot_dir': snapshot_dir})
+
+        self.assertIsNone(self.processor.library_index.resolve(self.dest_dir, 'SOME.SHOW'))
+        self.assertEqual(self.processor._get_snapshot(self.source_dir).snapshot_file.parent, Path(snapshot_dir))
+
+    def test_low_confidence_match_needs_review(self):
+        """匹配置信度低的元数据不创建链接，等待人工确认"""
+        source = self._create_file('some show.mkv')
+        self.processor.set_metadata_client(CountingMetadataClient(
+            {'title': 'Another Show', 'year': '1998', 'match_confidence': 0.31, 'low_confidence': True}
+        ))
+
+        result = self.processor.process_file(source, self.dest_dir)
+
+        self.assertIs(result.outcome, ProcessOutcome.NEEDS_REVIEW)
+        self.assertTrue(result.to_dict()['needs_review'])
+        self.assertEqual(result.redo_command, f"/redo '{source}' {self.dest_dir}")
+        self.assertEqual(os.listdir(self.dest_dir), [])
+
+    def test_redo_accepts_low_confidence_match(self):
+        """执行待确认结果的重做命令即接受匹配（路径包含空格）"""
+        source = self._create_file('some show.mkv')
+        self.processor.set_metadata_client(CountingMetadataClient(
+            {'title': 'Another Show', 'year': '1998', 'match_confidence': 0.31, 'low_confidence': True}
+        ))
+        redo_command = self.processor.process_file(source, self.dest_dir).redo_command
+
+        result = self.processor.process_redo_command(redo_command)
+
+        self.assertTrue(result.success)
+        self.assertEqual(os.path.basename(os.path.dirname(result.destination)), 'Another Show')
+
+    def test_directory_hints_passed_to_metadata(self):
+        """目录声明的类型、年份和语言会传给元数据查询"""
+        processor = FileProcessor(config={'directory_configs': [
+            {'source_dir': self.temp_dir, 'dest_dir': self.dest_dir, 'media_type': 'movie'},
+            {'source_dir': self.source_dir, 'dest_dir': self.dest_dir, 'media_type': 'tv',
+             'year': 2019, 'language': 'en-US'},
+        ]})
+        client = CountingMetadataClient()
+        processor.set_metadata_client(client)
+
+        processor.process_file(self._create_file('some show.mkv'), self.dest_dir)
+
+        self.assertEqual(client.calls, [('some show', 'tv', '2019', {'language': 'en-US'})])
+
+    def test_compare_skips_hardlinked_and_unchanged_dirs(self):
+        """比较模式识别已重命名的硬链接，并复用未变化目录的快照"""
+        snapshot_dir = os.path.join(self.temp_dir, 'snapshots')
+        processor = FileProcessor(config={'snapshot_dir': snapshot_dir})
+        self._create_file('shows/show a.mkv')
+
+        first = processor.compare_and_process(self.source_dir, self.dest_dir)
+        self.assertEqual(len(first), 1)
+        self.assertTrue(first[0].success)
+
+        # 将所有目录的修改时间设为过去，使快照可信
+        for root in (self.source_dir, self.dest_dir):
+            for path, dirs, _ in os.walk(root):
+                os.utime(path, (1000000000, 1000000000))
+
+        processor.compare_and_process(self.source_dir, self.dest_dir)
+        # 新建处理器从持久化的快照加载
+        processor = FileProcessor(config={'snapshot_dir': snapshot_dir})
+        second = processor.compare_and_process(self.source_dir, self.dest_dir)
+
+        self.assertEqual(second, [])
+        self.assertEqual(processor._get_snapshot(self.source_dir).last_stats['listed'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,416 @@
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import requests
+
+from app.metadata.cache_store import CacheStore
+from app.metadata.tmdb_client import TMDBClient
+from app.metadata.douban_client import DoubanClient
+from app.metadata.rate_limiter import RateLimiter, TokenBucket, parse_retry_after
+from app.metadata.revalidator import Revalidator
+from app.metadata.circuit_breaker import CircuitBreaker
+from app.metadata.ranking import pick_best
+
+
+class FakeResponse:
+    """模拟的HTTP响应"""
+
+    def __init__(self, data=None, status_code=200, headers=None):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class FakeSession:
+    """按URL路径返回预设响应的会话，记录所有请求"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        self.sent_headers = []
+        self.headers = {}
+        self.cookies = requests.cookies.RequestsCookieJar()
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        self.requests.append((url, dict(params or {})))
+        self.sent_headers.append(kwargs.get('headers') or {})
+        for path, response in self.routes.items():
+            if url.endswith(path) or path in url:
+                if isinstance(response, list):
+                    return response.pop(0)
+                return response
+        return FakeResponse(status_code=404)
+
+    def close(self):
+        pass
+
+
+class MetadataClientTestCase(unittest.TestCase):
+    """元数据客户端测试基类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = CacheStore(self.temp_dir)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def make_tmdb_client(self, routes, rate_limiter=None):
+        client = TMDBClient(api_key='test_key', cache_dir=self.temp_dir, cache_store=self.store,
+                            rate_limiter=rate_limiter or RateLimiter(max_retries=0))
+        client.session = FakeSession(routes)
+        return client
+
+    def make_douban_client(self, routes, rate_limiter=None):
+        client = DoubanClient(cache_dir=self.temp_dir, cache_store=self.store,
+                              rate_limiter=rate_limiter or RateLimiter(max_retries=0))
+        client.session = FakeSession(routes)
+        return client
+
+
+class TestNegativeCache(MetadataClientTestCase):
+    """否定缓存测试"""
+
+    def test_tmdb_empty_result_is_cached(self):
+        client = self.make_tmdb_client({'/search/movie': FakeResponse({'results': []})})
+
+        self.assertIsNone(client.search_movie('家庭录像'))
+        self.assertIsNone(client.search_movie('家庭录像'))
+
+        self.assertEqual(len(client.session.requests), 1)
+        self.assertEqual(self.store.get_stats()['not_found_hits'], {'tmdb:movie': 1})
+
+    def test_tmdb_request_error_is_not_cached(self):
+        client = self.make_tmdb_client({'/search/tv': FakeResponse(status_code=500)})
+
+        self.assertIsNone(client.search_tv('演唱会'))
+        self.assertIsNone(client.search_tv('演唱会'))
+
+        self.assertEqual(len(client.session.requests), 2)
+
+    def test_title_variants_share_cache_entry(self):
+        client = self.make_tmdb_client({'/search/tv': FakeResponse({'results': [{'id': 1399, 'name': '权力的游戏'}]})})
+
+        for title in ('权力的游戏', '權力的遊戲', '权力的游戏 ', '權力·的遊戲'):
+            self.assertEqual(client.search_tv(title)['id'], 1399)
+
+        self.assertEqual(len(client.session.requests), 1)
+
+    def test_douban_missing_type_is_cached(self):
+        client = self.make_douban_client({
+            'subject_suggest': FakeResponse([{'title': '演唱会', 'type': 'movie', 'id': '1'}])
+        })
+
+        self.assertIsNone(client.search('演唱会', 'tv'))
+        self.assertIsNone(client.search('演唱会', 'tv'))
+
+        self.assertEqual(len(client.session.requests), 1)
+
+
+class TestLeanMode(MetadataClientTestCase):
+    """精简模式测试"""
+
+    SEARCH = {'results': [{'id': 27205, 'title': '盗梦空间', 'original_title': 'Inception',
+                           'release_date': '2010-07-15', 'genre_ids': [28], 'backdrop_path': '/b.jpg'}]}
+
+    def test_search_hit_is_used_without_detail_request(self):
+        client = self.make_tmdb_client({'/search/movie': FakeResponse(self.SEARCH)})
+
+        result = client.search_movie('盗梦空间')
+
+        self.assertEqual(result['original_title'], 'Inception')
+        self.assertNotIn('genre_ids', result)
+        self.assertEqual(len(client.session.requests), 1)
+
+    def test_detail_uses_append_to_response(self):
+        client = self.make_tmdb_client({
+            '/search/movie': FakeResponse(self.SEARCH),
+            '/movie/27205': FakeResponse({'id': 27205, 'title': '盗梦空间', 'runtime': 148,
+                                          'external_ids': {'imdb_id': 'tt1375666'}})
+        })
+        client.lean = False
+        client.append_to_response = 'external_ids'
+
+        result = client.search_movie('盗梦空间')
+
+        self.assertEqual(result, {'id': 27205, 'title': '盗梦空间', 'external_ids': {'imdb_id': 'tt1375666'},
+                                  'match_confidence': 1.0})
+        self.assertEqual(len(client.session.requests), 2)
+        self.assertEqual(client.session.requests[1][1]['append_to_response'], 'external_ids')
+
+
+class TestSeasonPrefetch(MetadataClientTestCase):
+    """整季剧集预取测试"""
+
+    def test_one_request_per_season(self):
+        episodes = [{'id': 63055 + n, 'name': f"第{n}集", 'episode_number': n, 'season_number': 1,
+                     'air_date': '2011-04-17', 'crew': [{'name': 'x'}]} for n in range(1, 23)]
+        client = self.make_tmdb_client({
+            '/tv/1399/season/1': [FakeResponse({'id': 3624, 'season_number': 1, 'episodes': episodes}),
+                                  FakeResponse({'id': 3624, 'season_number': 1, 'episodes': episodes})]
+        })
+
+        for n in range(1, 23):
+            self.assertEqual(client.get_episode_info(1399, 1, n)['name'], f"第{n}集")
+        self.assertEqual(len(client.session.requests), 1)
+        self.assertNotIn('crew', client.get_episode_info(1399, 1, 1))
+
+        # 季中没有的剧集重新获取一次整季，之后使用否定缓存
+        self.assertIsNone(client.get_episode_info(1399, 1, 23))
+        self.assertIsNone(client.get_episode_info(1399, 1, 23))
+        self.assertEqual(len(client.session.requests), 2)
+
+    def test_legacy_episode_entry_is_used(self):
+        self.store.set('tmdb', 'episode_1399_S02E01', {'name': '北境不忘'})
+        client = self.make_tmdb_client({})
+
+        self.assertEqual(client.get_episode_info(1399, 2, 1)['name'], '北境不忘')
+        self.assertEqual(client.session.requests, [])
+
+
+class TestCandidateRanking(MetadataClientTestCase):
+    """搜索结果候选排序测试"""
+
+    def test_tmdb_picks_best_candidate_not_first(self):
+        client = self.make_tmdb_client({'/search/movie': FakeResponse({'results': [
+            {'id': 1, 'title': '小妇人', 'release_date': '1994-12-21', 'popularity': 20.1},
+            {'id': 2, 'title': '小妇人', 'release_date': '2019-12-25', 'popularity': 41.7},
+            {'id': 3, 'title': '小妇人的故事', 'release_date': '2019-03-01', 'popularity': 2.3}
+        ]})})
+
+        result = client.search_movie('小妇人', '2019')
+
+        self.assertEqual(result['id'], 2)
+        self.assertEqual(result['match_confidence'], 1.0)
+        self.assertEqual(len(client.session.requests), 1)
+
+    def test_douban_ranks_by_title_and_year(self):
+        client = self.make_douban_client({'subject_suggest': FakeResponse([
+            {'id': '1', 'title': '请回答1994', 'year': '2013', 'type': 'tv'},
+            {'id': '2', 'title': '请回答1988', 'year': '2015', 'type': 'tv'},
+            {'id': '3', 'title': '请回答1988', 'year': '2015', 'type': 'movie'}
+        ])})
+
+        result = client.search('請回答1988', 'tv', '2015')
+
+        self.assertEqual(result['id'], '2')
+        self.assertEqual(result['match_confidence'], 1.0)
+
+    def test_media_type_breaks_same_title_tie(self):
+        candidates = [{'id': 1, 'title': '三体', 'release_date': '2023-01-15', 'media_type': 'movie'},
+                      {'id': 2, 'name': '三体', 'first_air_date': '2023-01-15', 'media_type': 'tv'}]
+
+        self.assertEqual(pick_best(candidates, '三体', '2023', 'tv')[0]['id'], 2)
+        self.assertEqual(pick_best(candidates, '三体', '2023', 'movie')[0]['id'], 1)
+
+    def test_weak_match_has_low_score(self):
+        client = self.make_tmdb_client({'/search/tv': FakeResponse({'results': [
+            {'id': 1, 'name': '家有儿女新传', 'first_air_date': '2009-01-01'}
+        ]})})
+
+        self.assertLess(client.search_tv('家有喜事', '1992')['match_confidence'], 0.5)
+
+
+class TestRateLimiter(MetadataClientTestCase):
+    """限速和退避重试测试"""
+
+    def test_token_bucket_spaces_requests(self):
+        bucket = TokenBucket(rate=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 4 / 20 * 0.9)
+        stats = bucket.get_stats()
+        self.assertEqual(stats['acquired'], 5)
+        self.assertEqual(stats['waited'], 4)
+        self.assertGreater(stats['wait_seconds'], 0)
+
+    def test_retry_after_is_honoured(self):
+        limiter = RateLimiter(max_retries=2, base_delay=0.01)
+        client = self.make_tmdb_client({
+            '/search/movie': [
+                FakeResponse(status_code=429, headers={'Retry-After': '0.2'}),
+                FakeResponse({'results': [{'id': 27205}]})
+            ],
+            '/movie/27205': FakeResponse({'id': 27205, 'title': '盗梦空间'})
+        }, rate_limiter=limiter)
+
+        start = time.monotonic()
+        self.assertEqual(client.search_movie('盗梦空间')['id'], 27205)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+        stats = limiter.get_stats()['tmdb']
+        self.assertEqual(stats['throttled'], 1)
+        self.assertEqual(stats['retries'], 1)
+        self.assertEqual(stats['failures'], 0)
+
+    def test_gives_up_after_max_retries(self):
+        limiter = RateLimiter(max_retries=2, base_delay=0.01)
+        client = self.make_douban_client({'subject_suggest': FakeResponse(status_code=503)},
+                                         rate_limiter=limiter)
+
+        self.assertIsNone(client.search('演唱会'))
+        self.assertEqual(len(client.session.requests), 3)
+        self.assertEqual(limiter.get_stats()['douban']['failures'], 1)
+
+    def test_client_errors_are_not_retried(self):
+        limiter = RateLimiter(max_retries=3, base_delay=0.01)
+        client = self.make_tmdb_client({'/search/tv': FakeResponse(status_code=401)}, rate_limiter=limiter)
+
+        self.assertIsNone(client.search_tv('演唱会'))
+        self.assertEqual(len(client.session.requests), 1)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('3'), 3.0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+
+class TestCircuitBreaker(MetadataClientTestCase):
+    """熔断器测试"""
+
+    def test_open_source_is_skipped_without_requests(self):
+        breaker = CircuitBreaker('douban', failure_threshold=2, reset_timeout=60)
+        limiter = RateLimiter(max_retries=0, breakers={'douban': breaker})
+        client = self.make_douban_client({'subject_suggest': FakeResponse(status_code=403)},
+                                         rate_limiter=limiter)
+
+        for title in ('演唱会', '请回答1988', '无间道', '盗梦空间'):
+            self.assertIsNone(client.search(title))
+
+        self.assertEqual(len(client.session.requests), 2)
+        stats = breaker.get_stats()
+        self.assertEqual((stats['state'], stats['rejected']), ('open', 2))
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker('tmdb', failure_threshold=1, reset_timeout=0.05)
+        limiter = RateLimiter(max_retries=0, breakers={'tmdb': breaker})
+        client = self.make_tmdb_client({
+            '/search/tv': [FakeResponse(status_code=503), FakeResponse(status_code=503),
+                           FakeResponse({'results': [{'id': 1399, 'name': '权力的游戏'}]})]
+        }, rate_limiter=limiter)
+
+        self.assertIsNone(client.search_tv('权力的游戏'))
+        self.assertEqual(breaker.state, 'open')
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, 'half_open')
+        # 探测失败重新打开
+        self.assertIsNone(client.search_tv('权力的游戏'))
+        self.assertEqual(breaker.state, 'open')
+        time.sleep(0.06)
+        self.assertEqual(client.search_tv('权力的游戏')['id'], 1399)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_not_found_does_not_count_as_failure(self):
+        breaker = CircuitBreaker('tmdb', failure_threshold=1)
+        limiter = RateLimiter(max_retries=0, breakers={'tmdb': breaker})
+        client = self.make_tmdb_client({}, rate_limiter=limiter)
+
+        self.assertIsNone(client.get_details('movie', 1))
+        self.assertEqual(breaker.state, 'closed')
+
+
+class TestRevalidation(MetadataClientTestCase):
+    """过期条目重新验证测试"""
+
+    SEARCH = {'results': [{'id': 27205, 'title': '盗梦空间', 'original_title': 'Inception'}]}
+
+    def setUp(self):
+        super().setUp()
+        self.store.default_ttl = 0.05
+        self.store.stale_grace = 60
+        self.submitted = []
+        self.store.revalidator = lambda namespace, key, entry: self.submitted.append((namespace, key, entry))
+
+    def make_stale_client(self, revalidate_response):
+        client = self.make_tmdb_client({'/search/movie': [
+            FakeResponse(self.SEARCH, headers={'ETag': '"v1"'}), revalidate_response
+        ]})
+        client.search_movie('盗梦空间')
+        time.sleep(0.1)
+        return client
+
+    def test_stale_entry_is_served_and_submitted(self):
+        client = self.make_stale_client(FakeResponse(status_code=304))
+
+        self.assertEqual(client.search_movie('盗梦空间')['id'], 27205)
+
+        self.assertEqual(len(client.session.requests), 1)
+        self.assertEqual(len(self.submitted), 1)
+        namespace, key, entry = self.submitted[0]
+        self.assertEqual((namespace, entry['etag'], entry['refresh']['kind']), ('tmdb', '"v1"', 'search'))
+
+    def test_not_modified_extends_entry(self):
+        client = self.make_stale_client(FakeResponse(status_code=304))
+        client.search_movie('盗梦空间')
+        _, key, entry = self.submitted[0]
+        self.store.default_ttl = 3600
+
+        self.assertEqual(client.revalidate(key, entry), 'not_modified')
+        self.assertEqual(client.session.sent_headers[1], {'If-None-Match': '"v1"'})
+
+        client.search_movie('盗梦空间')
+        self.assertEqual(len(self.submitted), 1)
+
+    def test_changed_entry_is_refreshed(self):
+        changed = {'results': [{'id': 27205, 'title': '盗梦空间（重映）', 'original_title': 'Inception'}]}
+        client = self.make_stale_client(FakeResponse(changed, headers={'ETag': '"v2"'}))
+        client.search_movie('盗梦空间')
+        _, key, entry = self.submitted[0]
+
+        self.assertEqual(client.revalidate(key, entry), 'refreshed')
+        self.assertEqual(client.search_movie('盗梦空间')['title'], '盗梦空间（重映）')
+
+    def test_detail_refresh_keeps_match_confidence(self):
+        search = {'results': [{'id': 27205, 'title': '盗梦空间', 'release_date': '2010-07-16'}]}
+        client = self.make_tmdb_client({
+            '/search/movie': FakeResponse(search),
+            '/movie/27205': [FakeResponse({'id': 27205, 'title': '盗梦空间'}, headers={'ETag': '"v1"'}),
+                             FakeResponse({'id': 27205, 'title': '盗梦空间（重映）'}, headers={'ETag': '"v2"'})]
+        })
+        client.lean = False
+        confidence = client.search_movie('盗梦空间', '2013')['match_confidence']
+        self.assertLess(confidence, 1.0)
+        time.sleep(0.1)
+        client.search_movie('盗梦空间', '2013')
+        _, key, entry = self.submitted[0]
+        self.assertEqual(entry['refresh']['kind'], 'details')
+
+        self.assertEqual(client.revalidate(key, entry), 'refreshed')
+        result = client.search_movie('盗梦空间', '2013')
+        self.assertEqual((result['title'], result['match_confidence']), ('盗梦空间（重映）', confidence))
+
+    def test_revalidator_runs_in_background(self):
+        client = self.make_stale_client(FakeResponse(status_code=304))
+        revalidator = Revalidator(max_workers=1)
+        revalidator.register('tmdb', client.revalidate)
+        self.store.revalidator = revalidator.submit
+
+        client.search_movie('盗梦空间')
+        client.search_movie('盗梦空间')
+        revalidator.close(wait=True)
+
+        stats = revalidator.get_stats()
+        self.assertEqual(stats['not_modified'], 1)
+        self.assertEqual(len(client.session.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import shutil
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.metadata.metadata_manager import MetadataManager
+from app.metadata.async_client import ASYNC_HTTP_AVAILABLE
+from tests.test_metadata_clients import FakeResponse, FakeSession
+
+if ASYNC_HTTP_AVAILABLE:
+    from aiohttp import web
+
+
+class SlowTMDBClient:
+    """响应较慢、记录调用次数的TMDB客户端"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search_movie(self, title, year=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return {'id': 27205, 'title': title, 'release_date': '2010-07-15'}
+
+    def search_tv(self, title, year=None, **kwargs):
+        return self.search_movie(title, year)
+
+    def close(self):
+        pass
+
+
+class FakeDoubanClient:
+    """立即返回结果、记录调用次数的豆瓣客户端"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, title, media_type=None, year=None):
+        self.calls += 1
+        return {'title': title, 'year': '2010', 'type': media_type, 'id': '3541415'}
+
+    def close(self):
+        pass
+
+
+class MetadataManagerTestCase(unittest.TestCase):
+    """元数据管理器测试基类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = MetadataManager({'cache_dir': self.temp_dir, 'tmdb_api_key': 'test_key'})
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.temp_dir)
+
+
+class TestSingleFlight(MetadataManagerTestCase):
+    """并发查询合并测试"""
+
+    def test_concurrent_identical_requests_share_one_lookup(self):
+        self.manager.tmdb_client = SlowTMDBClient()
+        results = []
+
+        def worker():
+            results.append(self.manager.get_metadata('盗梦空间', 'movie', year='2010'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.manager.tmdb_client.calls, 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r['tmdb_id'] == 27205 for r in results))
+        stats = self.manager.get_stats()['single_flight']
+        self.assertEqual(stats['executed'] + stats['coalesced'], 8)
+        self.assertEqual(stats['coalesced'], 7)
+
+
+class TestHedgedLookup(MetadataManagerTestCase):
+    """并发/对冲查询测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.manager.douban_client = FakeDoubanClient()
+        self.manager.update_config({'lookup_strategy': 'hedged', 'hedge_delay': 0.05,
+                                    'lookup_deadline': 0.2})
+
+    def test_fast_tmdb_does_not_start_douban(self):
+        self.manager.tmdb_client = SlowTMDBClient(delay=0)
+
+        metadata = self.manager.get_metadata('盗梦空间', 'movie')
+
+        self.assertEqual(metadata['tmdb_id'], 27205)
+        self.assertEqual(self.manager.douban_client.calls, 0)
+        self.assertEqual(self.manager.get_stats()['lookup']['hedged'], 0)
+
+    def test_slow_tmdb_falls_back_after_deadline(self):
+        self.manager.tmdb_client = SlowTMDBClient(delay=1.0)
+
+        start = time.monotonic()
+        metadata = self.manager.get_metadata('盗梦空间', 'movie')
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(metadata['douban_id'], '3541415')
+        self.assertLess(elapsed, 0.8)
+        stats = self.manager.get_stats()
+        self.assertEqual(stats['lookup']['hedged'], 1)
+        self.assertEqual(stats['lookup']['douban'], 1)
+        self.assertEqual(stats['latency']['douban']['count'], 1)
+
+    def test_parallel_prefers_tmdb_within_deadline(self):
+        self.manager.update_config({'lookup_strategy': 'parallel'})
+        self.manager.tmdb_client = SlowTMDBClient(delay=0.1)
+
+        metadata = self.manager.get_metadata('盗梦空间', 'movie')
+
+        self.assertEqual(metadata['tmdb_id'], 27205)
+        self.assertEqual(self.manager.douban_client.calls, 1)
+        self.assertIn('p99_ms', self.manager.get_stats()['latency']['tmdb'])
+
+
+class TestOfflineMode(MetadataManagerTestCase):
+    """本地索引和离线模式测试"""
+
+    def setUp(self):
+        super().setUp()
+        dump_file = os.path.join(self.temp_dir, 'movie_ids_05_15_2024.json')
+        with open(dump_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'id': 27205, 'original_title': 'Inception', 'popularity': 80.5}) + '\n')
+        self.assertEqual(self.manager.import_offline_dumps([dump_file]), 1)
+        self.manager.douban_client = FakeDoubanClient()
+
+    def test_offline_mode_uses_index_without_network(self):
+        self.manager.update_config({'offline_mode': True})
+        self.manager.tmdb_client._make_request = None
+
+        metadata = self.manager.get_metadata('Inceptoin', 'movie')
+
+        self.assertEqual(metadata['tmdb_id'], 27205)
+        self.assertEqual(metadata['original_title'], 'Inception')
+        self.assertIsNone(self.manager.get_metadata('Unknown Film', 'movie'))
+        self.assertEqual(self.manager.douban_client.calls, 0)
+
+    def test_exact_match_skips_search(self):
+        calls = []
+
+        def get_details(media_type, tmdb_id, language=None):
+            calls.append((media_type, tmdb_id))
+            return {'id': tmdb_id, 'title': '盗梦空间', 'release_date': '2010-07-15'}
+
+        self.manager.tmdb_client.get_details = get_details
+        self.manager.tmdb_client.search_movie = None
+
+        metadata = self.manager.get_metadata('Inception', 'movie')
+
+        self.assertEqual(metadata['title'], '盗梦空间')
+        self.assertEqual(calls, [('movie', 27205)])
+
+
+class TestAliasIndex(MetadataManagerTestCase):
+    """标题别名学习测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmdb_session = FakeSession({
+            '/search/movie': [
+                FakeResponse({'results': []}),
+                FakeResponse({'results': [{'id': 27205, 'title': '盗梦空间', 'original_title': 'Inception',
+                                           'release_date': '2010-07-15'}]})
+            ],
+            '/movie/27205': FakeResponse({'id': 27205, 'title': '盗梦空间', 'original_title': 'Inception',
+                                          'release_date': '2010-07-15'})
+        })
+        self.douban_session = FakeSession({'subject_suggest': FakeResponse([
+            {'id': '3541415', 'title': '盗梦空间', 'sub_title': 'Inception', 'year': '2010', 'type': 'movie'}
+        ])})
+        self.manager.tmdb_client.session = self.tmdb_session
+        self.manager.douban_client.session = self.douban_session
+
+    def test_douban_original_title_is_learned(self):
+        metadata = self.manager.get_metadata('盗梦空间', 'movie', '2010')
+
+        self.assertEqual(metadata['tmdb_id'], 27205)
+        self.assertEqual([url.rsplit('/', 2)[-2:] for url, _ in self.tmdb_session.requests],
+                         [['search', 'movie'], ['search', 'movie']])
+        self.assertEqual(self.tmdb_session.requests[1][1]['query'], 'Inception')
+        self.assertEqual(self.manager.get_stats()['aliases']['learned'], 2)
+
+        # 之后按任一名称查询都直接获取详情，不再搜索和查询豆瓣
+        for title in ('盗梦空间', 'INCEPTION'):
+            self.assertEqual(self.manager.get_metadata(title, 'movie', '2010')['tmdb_id'], 27205)
+        self.assertEqual(len(self.tmdb_session.requests), 3)
+        self.assertTrue(self.tmdb_session.requests[2][0].endswith('/movie/27205'))
+        self.assertEqual(len(self.douban_session.requests), 1)
+
+    def test_alias_ignored_for_other_year(self):
+        self.manager.get_metadata('盗梦空间', 'movie', '2010')
+
+        self.assertIsNone(self.manager.alias_index.lookup('movie', '盗梦空间', '1987'))
+        self.assertEqual(self.manager.alias_index.lookup('movie', 'Inception'), 27205)
+
+
+class TestGetMetadataMany(MetadataManagerTestCase):
+    """批量异步查询测试"""
+
+    @unittest.skipUnless(ASYNC_HTTP_AVAILABLE, "需要安装 aiohttp")
+    def test_batch_lookup_over_async_pool(self):
+        requests_seen = []
+
+        async def search_movie(request):
+            requests_seen.append(request.path)
+            await asyncio.sleep(0.05)
+            query = request.query['query']
+            if query == '不存在的电影':
+                return web.json_response({'results': []})
+            return web.json_response({'results': [{'id': len(query), 'title': f"电影{len(query)}",
+                                                   'release_date': '2010-07-15'}]})
+
+        async def douban_search(request):
+            requests_seen.append(request.path)
+            return web.json_response([])
+
+        async def scenario():
+            app = web.Application()
+            app.router.add_get('/3/search/movie', search_movie)
+            app.router.add_get('/j/subject_suggest', douban_search)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            self.manager.tmdb_client.BASE_URL = f"http://127.0.0.1:{port}/3"
+            self.manager.douban_client.SEARCH_URL = f"http://127.0.0.1:{port}/j/subject_suggest?q="
+            try:
+                items = [{'title': 'a' * n, 'media_type': 'movie'} for n in range(1, 21)]
+                items.append({'title': 'aaa', 'media_type': '电影'})
+                items.append({'title': '不存在的电影', 'media_type': 'movie'})
+                return await self.manager.get_metadata_many(items, concurrency=10)
+            finally:
+                await runner.cleanup()
+
+        start = time.time()
+        results = asyncio.run(scenario())
+        elapsed = time.time() - start
+
+        self.assertEqual(len(results), 22)
+        self.assertEqual([r['tmdb_id'] for r in results[:20]], list(range(1, 21)))
+        self.assertEqual(results[20]['tmdb_id'], 3)
+        self.assertIsNone(results[21])
+        # 重复的查询只请求一次：20次搜索，加上未找到时的一次搜索和一次豆瓣回退
+        self.assertEqual(len(requests_seen), 22)
+        # 搜索请求并发执行
+        self.assertLess(elapsed, 20 * 0.05)
+        # 结果已写入缓存，同步查询直接命中
+        self.assertEqual(self.manager.get_metadata('aaaaa', 'movie')['tmdb_id'], 5)
+
+    def test_batch_lookup_falls_back_to_threads(self):
+        self.manager.tmdb_client = SlowTMDBClient(delay=0.1)
+        items = [{'title': f"电影{i}", 'media_type': 'movie'} for i in range(5)]
+        items.append({'title': '电影0', 'media_type': 'movie'})
+
+        results = asyncio.run(self.manager.get_metadata_many(items))
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[5], results[0])
+        self.assertEqual(self.manager.tmdb_client.calls, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
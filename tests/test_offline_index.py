@@ -0,0 +1,66 @@
+import os
+import sys
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.metadata.offline_index import OfflineIndex
+
+
+def write_dump(path, records):
+    """写入gzip压缩的JSON Lines导出文件"""
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.write('{"id": 坏行\n')
+
+
+class TestOfflineIndex(unittest.TestCase):
+    """TMDB导出文件本地索引测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index = OfflineIndex(os.path.join(self.temp_dir, 'offline.db'))
+        self.movie_dump = os.path.join(self.temp_dir, 'movie_ids_05_15_2024.json.gz')
+        write_dump(self.movie_dump, [
+            {'adult': False, 'id': 27205, 'original_title': 'Inception', 'popularity': 80.5},
+            {'adult': False, 'id': 11, 'original_title': 'Star Wars', 'popularity': 60.0},
+            {'adult': False, 'id': 12, 'original_title': 'Star Wars', 'popularity': 1.0},
+            {'adult': False, 'id': 1891, 'original_title': 'The Empire Strikes Back', 'popularity': 30.0},
+            {'adult': True, 'id': 99, 'original_title': 'Inception XXX', 'popularity': 1.0},
+        ])
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_import_detects_type_and_skips_bad_lines(self):
+        self.assertEqual(self.index.import_dump(self.movie_dump), 4)
+        self.assertEqual(self.index.get_stats(), {'movie': 4})
+        # 重新导入替换旧记录
+        self.assertEqual(self.index.import_dump(self.movie_dump), 4)
+        self.assertEqual(self.index.get_stats(), {'movie': 4})
+
+    def test_exact_prefix_and_fuzzy_lookup(self):
+        self.index.import_dump(self.movie_dump)
+
+        exact = self.index.lookup('inception', 'movie')
+        self.assertEqual((exact['id'], exact['match'], exact['ambiguous']), (27205, 'exact', False))
+
+        ambiguous = self.index.lookup('Star.Wars', 'movie')
+        self.assertEqual((ambiguous['id'], ambiguous['ambiguous']), (11, True))
+
+        self.assertEqual(self.index.lookup('The Empire', 'movie')['match'], 'prefix')
+        self.assertEqual(self.index.lookup('Incepton', 'movie')['id'], 27205)
+        self.assertIsNone(self.index.lookup('Incepton', 'movie', fuzzy=False))
+        self.assertIsNone(self.index.lookup('Inception', 'tv'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.metadata.cache_store import CacheStore
+from app.metadata.tmdb_client import TMDBClient
+from app.metadata.douban_client import DoubanClient
+from app.metadata.rate_limiter import RateLimiter
+from tests.fixtures.stub_server import StubMetadataServer
+
+
+class StubServerTestCase(unittest.TestCase):
+    """替身服务测试基类"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = CacheStore(self.temp_dir)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.temp_dir)
+
+    def make_tmdb_client(self, server, max_retries=0):
+        return TMDBClient(api_key='test_key', cache_dir=self.temp_dir, cache_store=self.store,
+                          rate_limiter=RateLimiter(max_retries=max_retries, base_delay=0.01),
+                          base_url=server.tmdb_base_url)
+
+
+class TestSyntheticMode(StubServerTestCase):
+    """生成响应模式测试"""
+
+    def test_clients_resolve_against_stub(self):
+        with StubMetadataServer(missing=['不存在的电影']) as server:
+            tmdb = self.make_tmdb_client(server)
+            douban = DoubanClient(cache_dir=self.temp_dir, cache_store=self.store,
+                                  rate_limiter=RateLimiter(max_retries=0), base_url=server.douban_base_url)
+
+            movie = tmdb.search_movie('盗梦空间', '2010')
+            self.assertEqual((movie['title'], movie['release_date']), ('盗梦空间', '2010-01-01'))
+            self.assertEqual(tmdb.search_movie('盗梦空间', '2010'), movie)
+            self.assertIsNone(tmdb.search_movie('不存在的电影'))
+            self.assertEqual(tmdb.get_episode_info(movie['id'], 1, 3)['name'], '第3集')
+            self.assertEqual(douban.search('请回答1988', 'tv')['type'], 'tv')
+
+            self.assertEqual(server.stats['requests'], 4)
+            self.assertEqual(server.stats['paths']['/3/search/movie'], 2)
+
+    def test_throttling_is_retried(self):
+        with StubMetadataServer(throttle_rate=1.0, retry_after=0) as server:
+            client = self.make_tmdb_client(server, max_retries=2)
+
+            self.assertIsNone(client.search_tv('请回答1988'))
+            self.assertEqual(server.stats['status'], {429: 3})
+
+            server.throttle_rate = 0
+            self.assertEqual(client.search_tv('请回答1988')['name'], '请回答1988')
+
+    def test_conditional_request_returns_not_modified(self):
+        with StubMetadataServer() as server:
+            client = self.make_tmdb_client(server)
+            client.search_movie('盗梦空间')
+            key = next(iter(self.store._conn.execute("SELECT key FROM entries WHERE key LIKE 'movie_%'")))[0]
+            etag, refresh = self.store._conn.execute(
+                'SELECT etag, refresh FROM entries WHERE key = ?', (key,)).fetchone()
+
+            result = client.revalidate(key, {'etag': etag, 'last_modified': None, 'refresh': json.loads(refresh)})
+
+            self.assertEqual(result, 'not_modified')
+            self.assertEqual(server.stats['status'], {200: 1, 304: 1})
+
+
+class TestRecordReplay(StubServerTestCase):
+    """录制和回放测试"""
+
+    def test_recorded_responses_replay_offline(self):
+        cassette = Path(self.temp_dir) / 'cassette.json'
+        with StubMetadataServer() as upstream:
+            with StubMetadataServer(mode='record', cassette=cassette,
+                                    upstream={'tmdb': upstream.url, 'douban': upstream.url}) as recorder:
+                recorded = self.make_tmdb_client(recorder).search_movie('盗梦空间')
+        self.assertTrue(cassette.exists())
+
+        # 新的缓存目录，确保回放时结果来自录制文件
+        self.store.close()
+        self.store = CacheStore(Path(self.temp_dir) / 'replay')
+        with StubMetadataServer(mode='replay', cassette=cassette) as server:
+            client = self.make_tmdb_client(server)
+
+            self.assertEqual(client.search_movie('盗梦空间'), recorded)
+            self.assertIsNone(client.search_movie('星际穿越'))
+            self.assertEqual(server.stats['status'], {200: 1, 404: 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
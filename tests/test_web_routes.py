@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config.config_manager import ConfigManager
+from app.config.message_center import MessageCenter
+from app.core.file_processor import FileProcessor
+from app.core.process_result import ProcessOutcome
+from app.web import create_app
+
+
+class LowConfidenceMetadataClient:
+    """总是返回低置信度匹配的元数据客户端"""
+
+    def get_metadata(self, title, media_type=None, year=None, **kwargs):
+        return {'title': 'Another Show', 'year': '1998', 'match_confidence': 0.31, 'low_confidence': True}
+
+
+class TestSharedMetadataManager(unittest.TestCase):
+    """Web路由共享元数据管理器测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        config_file = os.path.join(self.temp_dir, 'config.json')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'cache_dir': os.path.join(self.temp_dir, 'cache'),
+                'redo_dir': os.path.join(self.temp_dir, 'redo'),
+                'default_dest_dir': os.path.join(self.temp_dir, 'dest'),
+                'directory_configs': []
+            }, f)
+        self.config_manager = ConfigManager(config_file)
+        self.message_center = MessageCenter(redo_dir=os.path.join(self.temp_dir, 'redo'),
+                                            message_file=os.path.join(self.temp_dir, 'messages.json'))
+        self.app = create_app(config_manager=self.config_manager, message_center=self.message_center)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        metadata_manager = self.app.config.get('metadata_manager')
+        if metadata_manager:
+            metadata_manager.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_batch_requests_reuse_one_manager(self):
+        source_dir = os.path.join(self.temp_dir, 'source')
+        os.makedirs(source_dir)
+        payload = {'source_dir': source_dir, 'target_dir': os.path.join(self.temp_dir, 'dest')}
+
+        managers = []
+        for _ in range(3):
+            response = self.client.post('/api/run_batch_process', json=payload)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.get_json()['success'])
+            managers.append(self.app.config['metadata_manager'])
+
+        self.assertIs(managers[0], managers[2])
+        self.assertIs(self.app.config['file_processor'].metadata_client, managers[0])
+
+    def test_config_update_applied_to_shared_manager(self):
+        self.client.post('/api/run_batch_process', json={'source_dir': self.temp_dir, 'target_dir': self.temp_dir})
+        metadata_manager = self.app.config['metadata_manager']
+        self.config_manager.add_listener(metadata_manager.update_config)
+
+        response = self.client.post('/api/config', json={'tmdb_base_url': 'http://127.0.0.1:8765/3/',
+                                                         'tmdb_language': 'en-US'})
+
+        self.assertTrue(response.get_json()['success'])
+        self.assertTrue(self.config_manager.has_changed())
+        self.assertIs(self.app.config['metadata_manager'], metadata_manager)
+        self.assertEqual(metadata_manager.tmdb_client.BASE_URL, 'http://127.0.0.1:8765/3')
+        self.assertEqual(metadata_manager.tmdb_client.language, 'en-US')
+
+    def test_health_reports_circuit_breakers(self):
+        self.client.post('/api/run_batch_process', json={'source_dir': self.temp_dir, 'target_dir': self.temp_dir})
+        breaker = self.app.config['metadata_manager'].circuit_breakers['douban']
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+
+        health = self.client.get('/api/health').get_json()
+
+        self.assertEqual(health['status'], 'degraded')
+        self.assertEqual(health['metadata_sources']['douban']['state'], 'open')
+        self.assertEqual(health['metadata_sources']['tmdb']['state'], 'closed')
+
+
+    def test_batch_counts_needs_review_separately(self):
+        source_dir = os.path.join(self.temp_dir, 'source')
+        os.makedirs(source_dir)
+        for name in ('a show.mkv', 'b show.mkv'):
+            with open(os.path.join(source_dir, name), 'w') as f:
+                f.write('dummy content')
+        file_processor = FileProcessor(self.config_manager.get_config())
+        file_processor.set_metadata_client(LowConfidenceMetadataClient())
+        self.app.config['file_processor'] = file_processor
+
+        response = self.client.post('/api/run_batch_process', json={
+            'source_dir': source_dir, 'target_dir': os.path.join(self.temp_dir, 'dest')})
+
+        data = response.get_json()
+        self.assertEqual((data['total'], data['needs_review_count'], data['error_count'], data['skipped_count']),
+                         (2, 2, 0, 0))
+
+    def test_execute_redo_confirms_low_confidence_match(self):
+        source_dir = os.path.join(self.temp_dir, 'source')
+        dest_dir = os.path.join(self.temp_dir, 'dest')
+        os.makedirs(source_dir)
+        source = os.path.join(source_dir, 'some show.mkv')
+        with open(source, 'w') as f:
+            f.write('dummy content')
+        file_processor = FileProcessor(self.config_manager.get_config())
+        file_processor.set_metadata_client(LowConfidenceMetadataClient())
+        self.app.config['file_processor'] = file_processor
+
+        result = file_processor.process_file(source, dest_dir)
+        self.assertIs(result.outcome, ProcessOutcome.NEEDS_REVIEW)
+        self.message_center.add_file_process_message(result.to_dict())
+        redo_id = self.message_center.get_redo_commands()[0]['id']
+
+        response = self.client.post(f'/api/execute_redo/{redo_id}')
+
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(data['result']['success'])
+        self.assertTrue(os.path.exists(data['result']['destination']))
+        self.assertEqual(self.message_center.get_redo_commands(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
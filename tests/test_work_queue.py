@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.work_queue import WorkQueue
+from app.core.file_processor import FileProcessor
+
+
+class TestWorkQueue(unittest.TestCase):
+    """多实例工作队列测试"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'queue.db')
+        self.media_file = os.path.join(self.temp_dir, '盗梦空间.2010.1080p.mkv')
+        with open(self.media_file, 'w') as f:
+            f.write('dummy movie content')
+
+        self.queue_a = WorkQueue(self.db_path, instance_id='a', lease_ttl=60)
+        self.queue_b = WorkQueue(self.db_path, instance_id='b', lease_ttl=60)
+
+    def tearDown(self):
+        self.queue_a.close()
+        self.queue_b.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_claim_is_exclusive(self):
+        """同一文件只能被一个实例申请"""
+        self.assertTrue(self.queue_a.claim(self.media_file))
+        self.assertFalse(self.queue_b.claim(self.media_file))
+
+    def test_done_file_is_skipped_until_changed(self):
+        """处理完成的文件不再被处理，文件变化后可重新申请"""
+        self.assertTrue(self.queue_a.claim(self.media_file))
+        self.queue_a.complete(self.media_file, success=True)
+        self.assertFalse(self.queue_b.claim(self.media_file))
+        self.assertTrue(self.queue_b.claim(self.media_file, force=True))
+        self.queue_b.complete(self.media_file, success=True)
+
+        with open(self.media_file, 'a') as f:
+            f.write('changed')
+        self.assertTrue(self.queue_a.claim(self.media_file))
+
+    def test_failed_file_can_be_retried(self):
+        """处理失败的文件可被其他实例重新申请"""
+        self.assertTrue(self.queue_a.claim(self.media_file))
+        self.queue_a.complete(self.media_file, success=False)
+        self.assertTrue(self.queue_b.claim(self.media_file))
+
+    def test_expired_lease_can_be_taken_over(self):
+        """崩溃实例的租约过期后可被接管"""
+        crashed = WorkQueue(self.db_path, instance_id='crashed', lease_ttl=0.05)
+        self.assertTrue(crashed.claim(self.media_file))
+        self.assertFalse(self.queue_a.claim(self.media_file))
+        time.sleep(0.1)
+        self.assertTrue(self.queue_a.claim(self.media_file))
+        crashed.close()
+
+    def test_file_processor_skips_claimed_file(self):
+        """文件处理器跳过其他实例持有的文件"""
+        self.assertTrue(self.queue_b.claim(self.media_file))
+
+        processor = FileProcessor(config={})
+        processor.set_work_queue(self.queue_a)
+        result = processor.process_file(self.media_file, os.path.join(self.temp_dir, 'dest'))
+
+        self.assertFalse(result['success'])
+        self.assertTrue(result.get('skipped'))
+
+
+if __name__ == '__main__':
+    unittest.main()